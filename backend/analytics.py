@@ -0,0 +1,261 @@
+"""
+Índice analítico de todas las correcciones, para informes de curso.
+
+Cada sesión guarda solo su examen (metrics.json, grades.npz). Para saber cómo
+ha ido la pregunta P7 en todos los grupos del cuatrimestre, o cómo han
+evolucionado las notas de un alumno, habría que leer todas las sesiones. En
+su lugar, al terminar cada corrección se añaden sus resultados a una base de
+datos SQLite (ANALYTICS_DB):
+
+- examenes: una fila por corrección (grupo, fecha y resumen de notas).
+- preguntas: media, respondidas y % de aciertos de cada opción de cada
+  pregunta.
+- notas: nota de cada alumno (sin los "S/DNI").
+
+Los DNI no se guardan: notas tiene un HMAC-SHA256 del DNI con una clave
+propia (ANALYTICS_DNI_KEY), de modo que se puede buscar un alumno conociendo
+su DNI pero la base de datos sola no los revela. Los session_id tampoco salen
+en las consultas: son la única protección de /preview, /download y /metrics.
+
+Una corrección se añade una vez y no se modifica. Al borrar su sesión por
+caducidad (SESSION_MAX_AGE_SECONDS) se borran también sus notas
+(olvidar_sesion); los resúmenes del examen y de sus preguntas, sin datos de
+alumnos, se conservan para el histórico. Las consultas van por índices y
+tardan milisegundos con miles de exámenes.
+
+Se escribe desde el pool de trabajadores (también en modo "process"): SQLite
+en modo WAL admite un escritor y lectores a la vez, y cada inserción es una
+sola transacción. El índice es local: con varias réplicas (SESSION_STORAGE
+"object") cada una tiene el suyo.
+"""
+import hashlib
+import hmac
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+from grading import LETRAS_POSIBLES
+
+_OPCIONES_SQL = ", ".join(f"{letra} REAL" for letra in LETRAS_POSIBLES)
+
+ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS examenes (
+    session_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    grupo TEXT,
+    n_preguntas INTEGER NOT NULL,
+    n_opciones INTEGER NOT NULL,
+    alumnos_totales INTEGER NOT NULL,
+    presentados INTEGER NOT NULL,
+    media REAL NOT NULL,
+    aprobados INTEGER NOT NULL,
+    suspensos INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS examenes_fecha ON examenes (created_at);
+CREATE INDEX IF NOT EXISTS examenes_grupo ON examenes (grupo, created_at);
+
+-- Una fila por pregunta de cada examen, con la fecha, el grupo y los alumnos
+-- del examen repetidos para agregar sin JOIN. A..H: % de aciertos de cada
+-- opción (NULL si el examen no tiene esa opción).
+CREATE TABLE IF NOT EXISTS preguntas (
+    question TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    session_id TEXT NOT NULL,
+    grupo TEXT,
+    alumnos_totales INTEGER NOT NULL,
+    avg_score REAL NOT NULL,
+    total_answered INTEGER NOT NULL,
+    {_OPCIONES_SQL},
+    PRIMARY KEY (question, created_at, session_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS preguntas_grupo ON preguntas (grupo, question, created_at);
+
+CREATE TABLE IF NOT EXISTS notas (
+    dni_hmac TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    nota REAL NOT NULL,
+    presentado INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notas_dni ON notas (dni_hmac);
+CREATE INDEX IF NOT EXISTS notas_sesion ON notas (session_id);
+"""
+
+# Columnas de examenes que se devuelven en las consultas (sin session_id)
+COLUMNAS_EXAMEN = [
+    "created_at", "grupo", "n_preguntas", "n_opciones",
+    "alumnos_totales", "presentados", "media", "aprobados", "suspensos",
+]
+
+# Sumas para el % de aciertos de cada opción ponderado por alumnos
+_SUMAS_OPCIONES = ", ".join(
+    f"SUM({letra} * alumnos_totales) AS {letra}_ponderado, "
+    f"SUM(CASE WHEN {letra} IS NOT NULL THEN alumnos_totales END) AS {letra}_alumnos"
+    for letra in LETRAS_POSIBLES
+)
+
+
+def _filtro(desde=None, hasta=None, grupo=None):
+    """Condición SQL por fecha y grupo (columnas de examenes y de preguntas)."""
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append("created_at >= ?")
+        parametros.append(desde)
+    if hasta is not None:
+        condiciones.append("created_at < ?")
+        parametros.append(hasta)
+    if grupo is not None:
+        condiciones.append("grupo = ?")
+        parametros.append(grupo)
+    return (" AND ".join(condiciones) or "1"), parametros
+
+
+def _orden_pregunta(question: str):
+    # P1, P2, ..., P10 en orden numérico
+    return len(question), question
+
+
+class AnalyticsIndex:
+    def __init__(self, path: Path, clave_dni: str):
+        self.path = Path(path)
+        self._clave_dni = clave_dni.encode("utf-8")
+        self._lock = threading.Lock()
+        self._creado = False
+
+    def _conectar(self) -> sqlite3.Connection:
+        # El archivo y las tablas se crean en el primer uso, no al importar
+        if not self._creado:
+            with self._lock:
+                if not self._creado:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with closing(sqlite3.connect(self.path, timeout=30)) as conexion:
+                        conexion.execute("PRAGMA journal_mode=WAL")
+                        conexion.executescript(ESQUEMA)
+                    self._creado = True
+        conexion = sqlite3.connect(self.path, timeout=30)
+        conexion.row_factory = sqlite3.Row
+        return conexion
+
+    def _seudonimo(self, dni: str) -> str:
+        return hmac.new(self._clave_dni, dni.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    # ===== ESCRITURA =====
+
+    def registrar(self, session_id: str, grupo, dnis, notas, presentados, metrics: dict):
+        """
+        Añade una corrección terminada. Si la sesión ya estaba en el índice no
+        se modifica nada.
+        """
+        question_data = metrics.get("question_data", [])
+        n_opciones = metrics["n_opciones"]
+        alumnos = metrics.get("alumnos_totales", 0)
+        creado = time.time()
+
+        with closing(self._conectar()) as conexion, conexion:
+            nueva = conexion.execute(
+                "INSERT OR IGNORE INTO examenes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, creado, grupo, len(question_data), n_opciones,
+                 alumnos, metrics.get("presentados", 0), metrics.get("media", 0),
+                 metrics.get("aprobados", 0), metrics.get("suspensos", 0)),
+            ).rowcount
+            if not nueva:
+                return
+            conexion.executemany(
+                f"INSERT INTO preguntas VALUES ({', '.join('?' * (7 + len(LETRAS_POSIBLES)))})",
+                [
+                    (q["question"], creado, session_id, grupo, alumnos, q["avg_score"], q["total_answered"],
+                     *(q.get(letra) for letra in LETRAS_POSIBLES))
+                    for q in question_data
+                ],
+            )
+            conexion.executemany(
+                "INSERT INTO notas VALUES (?, ?, ?, ?)",
+                [(self._seudonimo(dni), session_id, nota, int(presentado))
+                 for dni, nota, presentado in zip(dnis, notas, presentados) if dni != "S/DNI"],
+            )
+
+    def olvidar_sesion(self, session_id: str):
+        """Borra las notas de los alumnos de una sesión (al caducar la sesión)."""
+        with closing(self._conectar()) as conexion, conexion:
+            conexion.execute("DELETE FROM notas WHERE session_id = ?", (session_id,))
+
+    # ===== CONSULTAS =====
+
+    def examenes(self, desde=None, hasta=None, grupo=None):
+        """Exámenes corregidos en el periodo, del más antiguo al más reciente."""
+        condicion, parametros = _filtro(desde, hasta, grupo)
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                f"SELECT {', '.join(COLUMNAS_EXAMEN)} FROM examenes WHERE {condicion} ORDER BY created_at",
+                parametros,
+            ).fetchall()
+        return [dict(fila) for fila in filas]
+
+    def preguntas(self, desde=None, hasta=None, grupo=None, question=None):
+        """
+        Estadísticas de cada pregunta (o solo de question) sumando todos los
+        exámenes del periodo. avg_score se pondera por total_answered y el %
+        de aciertos de cada opción por los alumnos de cada examen, de modo que
+        equivalen (salvo redondeo) a corregir todos los grupos como un único
+        examen.
+        """
+        condicion, parametros = _filtro(desde, hasta, grupo)
+        if question is not None:
+            condicion += " AND question = ?"
+            parametros.append(question)
+
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                f"""
+                SELECT question, COUNT(*) AS examenes, SUM(total_answered) AS total_answered,
+                       SUM(avg_score * total_answered) AS puntos, {_SUMAS_OPCIONES}
+                FROM preguntas WHERE {condicion} GROUP BY question
+                """,
+                parametros,
+            ).fetchall()
+
+        resultado = []
+        for fila in filas:
+            respondidas = fila["total_answered"]
+            pregunta = {
+                "question": fila["question"],
+                "examenes": fila["examenes"],
+                "total_answered": respondidas,
+                "avg_score": round(fila["puntos"] / respondidas, 2) if respondidas else 0,
+            }
+            for letra in LETRAS_POSIBLES:
+                if fila[f"{letra}_alumnos"] is not None:
+                    alumnos = fila[f"{letra}_alumnos"]
+                    pregunta[letra] = round(fila[f"{letra}_ponderado"] / alumnos, 1) if alumnos else 0
+            resultado.append(pregunta)
+        return sorted(resultado, key=lambda pregunta: _orden_pregunta(pregunta["question"]))
+
+    def pregunta_por_examen(self, question: str, desde=None, hasta=None, grupo=None):
+        """Estadísticas de una pregunta en cada examen del periodo."""
+        condicion, parametros = _filtro(desde, hasta, grupo)
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                f"""
+                SELECT created_at, grupo, alumnos_totales, avg_score, total_answered,
+                       {", ".join(LETRAS_POSIBLES)}
+                FROM preguntas WHERE question = ? AND {condicion} ORDER BY created_at
+                """,
+                [question] + parametros,
+            ).fetchall()
+        return [{clave: fila[clave] for clave in fila.keys() if fila[clave] is not None or clave == "grupo"}
+                for fila in filas]
+
+    def notas_alumno(self, dni: str):
+        """Notas de un DNI en todos los exámenes, de la más antigua a la más reciente."""
+        with closing(self._conectar()) as conexion:
+            filas = conexion.execute(
+                """
+                SELECT e.created_at, e.grupo, n.nota, n.presentado
+                FROM notas n JOIN examenes e ON e.session_id = n.session_id
+                WHERE n.dni_hmac = ?
+                ORDER BY e.created_at
+                """,
+                (self._seudonimo(dni),),
+            ).fetchall()
+        return [dict(fila, presentado=bool(fila["presentado"])) for fila in filas]
@@ -0,0 +1,115 @@
+"""
+Benchmark del índice analítico (analytics.py).
+
+Llena un índice nuevo con --exams exámenes sintéticos (cada uno con
+--students alumnos y --questions preguntas; los DNI se repiten entre
+exámenes, como los de un mismo curso) y mide:
+
+- registrar: tiempo por examen de la inserción al terminar una corrección.
+- Consultas (mediana de --repeats): exámenes de un periodo, todas las
+  preguntas sumadas, una pregunta con su detalle por examen y la evolución
+  de un alumno.
+
+Uso (desde backend/):
+    python benchmarks/bench_analytics.py
+    python benchmarks/bench_analytics.py --exams 5000 --students 200 --questions 50
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from analytics import AnalyticsIndex  # noqa: E402
+from grading import LETRAS_POSIBLES  # noqa: E402
+
+
+def examen_sintetico(rnd, n_alumnos: int, n_preguntas: int, n_opciones: int, dnis_curso):
+    dnis = rnd.sample(dnis_curso, n_alumnos)
+    notas = [round(rnd.uniform(0, 10), 2) for _ in range(n_alumnos)]
+    presentados = [rnd.random() > 0.05 for _ in range(n_alumnos)]
+    question_data = [
+        {
+            "question": f"P{i + 1}",
+            "avg_score": round(rnd.random(), 2),
+            "total_answered": rnd.randint(0, n_alumnos),
+            **{letra: round(rnd.uniform(0, 100), 1) for letra in LETRAS_POSIBLES[:n_opciones]},
+        }
+        for i in range(n_preguntas)
+    ]
+    metrics = {
+        "alumnos_totales": n_alumnos,
+        "presentados": sum(presentados),
+        "media": round(sum(notas) / n_alumnos, 2),
+        "aprobados": sum(1 for nota in notas if nota >= 5),
+        "suspensos": sum(1 for nota in notas if nota < 5),
+        "question_data": question_data,
+        "n_opciones": n_opciones,
+    }
+    return dnis, notas, presentados, metrics
+
+
+def mediana_ms(repeticiones: int, funcion):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return round(statistics.median(tiempos) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exams", type=int, default=2000)
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--options", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", type=Path, help="Guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    dnis_curso = [f"{n:08d}X" for n in rnd.sample(range(10**7, 10**8), args.students * 20)]
+    grupos = [f"grupo{i}.xlsx" for i in range(20)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        indice = AnalyticsIndex(Path(tmp) / "index.sqlite3", "clave-de-prueba")
+        tiempos = []
+        for n in range(args.exams):
+            dnis, notas, presentados, metrics = examen_sintetico(
+                rnd, args.students, args.questions, args.options, dnis_curso
+            )
+            inicio = time.perf_counter()
+            indice.registrar(f"sesion-{n}", grupos[n % len(grupos)], dnis, notas, presentados, metrics)
+            tiempos.append(time.perf_counter() - inicio)
+
+        ahora = time.time()
+        resultado = {
+            "exams": args.exams,
+            "students": args.students,
+            "questions": args.questions,
+            "db_mb": round((Path(tmp) / "index.sqlite3").stat().st_size / 2**20, 1),
+            "register_ms": round(statistics.median(tiempos) * 1000, 2),
+            "exams_query_ms": mediana_ms(args.repeats, lambda: indice.examenes(ahora - 3600, None, "grupo3.xlsx")),
+            "questions_query_ms": mediana_ms(args.repeats, lambda: indice.preguntas()),
+            "questions_group_query_ms": mediana_ms(args.repeats, lambda: indice.preguntas(grupo="grupo3.xlsx")),
+            "question_query_ms": mediana_ms(args.repeats, lambda: (
+                indice.preguntas(question="P7"), indice.pregunta_por_examen("P7")
+            )),
+            "student_query_ms": mediana_ms(args.repeats, lambda: indice.notas_alumno(dnis_curso[0])),
+        }
+
+    for clave, valor in resultado.items():
+        print(f"{clave:<26} {valor}")
+    if args.output:
+        args.output.write_text(json.dumps(resultado, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark del arranque en frío: lo que paga cada proceso de uvicorn nuevo
+(la plataforma escala los contenedores a cero, así que el primer usuario
+tras un periodo sin tráfico espera al arranque).
+
+Cada medida se hace en un subproceso nuevo, con el directorio de trabajo
+vacío, y mide:
+
+- import: tiempo de `import main` y RSS del proceso justo después.
+- health: tiempo desde el inicio hasta la primera respuesta de /health
+  (importación + arranque de la aplicación) y RSS en ese momento.
+- corregir: tiempo de la primera corrección (/corregir de un examen pequeño
+  y /download del Excel), que se pide --delay segundos después de /health,
+  y RSS después. Con --delay 0 la petición llega mientras la precarga está en
+  marcha (el caso del primer usuario que despierta el contenedor); con unos
+  segundos, cuando ya ha terminado (el usuario abre la web y luego sube).
+- Qué librerías pesadas (pandas, openpyxl, reportlab, matplotlib) están
+  cargadas tras la importación.
+
+Se mide con la precarga en segundo plano activada y desactivada
+(PREWARM_ON_STARTUP). El RSS es el actual del proceso (VmRSS), no el pico.
+
+Uso (desde backend/):
+    python benchmarks/bench_arranque.py
+    python benchmarks/bench_arranque.py --repeats 5 --modes lazy --delay 2
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARKS_DIR.parent
+
+MODOS = {"prewarm": "1", "lazy": "0"}
+LIBRERIAS = ["pandas", "openpyxl", "reportlab", "matplotlib"]
+
+
+def rss_actual_mb() -> float:
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return round(int(linea.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # Sin /proc (macOS): el pico, que en el arranque es casi el actual
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 / 1024, 1)
+
+
+def examen_csv(n_alumnos: int = 100, n_preguntas: int = 20, n_opciones: int = 5) -> bytes:
+    sys.path.insert(0, str(BENCHMARKS_DIR))
+    from bench_ingestion import filas_sinteticas
+
+    salida = io.StringIO()
+    for fila in filas_sinteticas(n_alumnos, n_preguntas, n_opciones):
+        salida.write(",".join("" if valor is None else f'"{valor}"' for valor in fila) + "\n")
+    return salida.getvalue().encode("utf-8")
+
+
+def medir(espera: float):
+    """Se ejecuta dentro del subproceso, justo al arrancar."""
+    inicio = time.perf_counter()
+    sys.path.insert(0, str(BACKEND_DIR))
+    import main  # noqa: E402
+    importacion = time.perf_counter() - inicio
+    resultado = {
+        "import_seconds": round(importacion, 3),
+        "import_rss_mb": rss_actual_mb(),
+        "loaded_after_import": [nombre for nombre in LIBRERIAS if nombre in sys.modules],
+    }
+
+    from fastapi.testclient import TestClient
+
+    contenido = examen_csv()
+    with TestClient(main.app) as cliente:
+        cliente.get("/health").raise_for_status()
+        resultado["health_seconds"] = round(time.perf_counter() - inicio, 3)
+        resultado["health_rss_mb"] = rss_actual_mb()
+
+        time.sleep(espera)
+        inicio_correccion = time.perf_counter()
+        respuesta = cliente.post(
+            "/corregir", files={"file": ("examen.csv", contenido)}, data={"n_opciones": 5, "n_preguntas": 20}
+        )
+        respuesta.raise_for_status()
+        cliente.get(f"/download/{respuesta.json()['session_id']}").raise_for_status()
+        resultado["first_correction_seconds"] = round(time.perf_counter() - inicio_correccion, 3)
+        resultado["first_correction_rss_mb"] = rss_actual_mb()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=list(MODOS), default=list(MODOS))
+    parser.add_argument("--repeats", type=int, default=3, help="Procesos por modo (se da la mediana)")
+    parser.add_argument("--delay", type=float, default=0, help="Segundos entre /health y la primera corrección")
+    parser.add_argument("--output", type=Path, help="Guardar los resultados en JSON")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(medir(args.delay)))
+        return
+
+    resultados = []
+    for modo in args.modes:
+        entorno = dict(os.environ, PREWARM_ON_STARTUP=MODOS[modo])
+        medidas = []
+        for _ in range(args.repeats):
+            with tempfile.TemporaryDirectory() as tmp:
+                salida = subprocess.run(
+                    [sys.executable, str(Path(__file__).resolve()), "--worker", "--delay", str(args.delay)],
+                    cwd=tmp, env=entorno, capture_output=True, text=True, check=True,
+                )
+            medidas.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+        resultado = {"mode": modo, "delay_seconds": args.delay, "loaded_after_import": medidas[0]["loaded_after_import"]}
+        for clave in medidas[0]:
+            if clave != "loaded_after_import":
+                resultado[clave] = round(statistics.median(medida[clave] for medida in medidas), 3)
+        resultados.append(resultado)
+        print(f"{modo:<8} import {resultado['import_seconds']:>6.3f} s  {resultado['import_rss_mb']:>6.1f} MB  "
+              f"/health {resultado['health_seconds']:>6.3f} s  {resultado['health_rss_mb']:>6.1f} MB  "
+              f"1.ª corrección {resultado['first_correction_seconds']:>6.3f} s  "
+              f"{resultado['first_correction_rss_mb']:>6.1f} MB  "
+              f"cargadas: {', '.join(resultado['loaded_after_import']) or '-'}")
+
+    if args.output:
+        args.output.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark de exámenes grandes: cientos de preguntas y hasta 8 opciones.
+
+Para cada tamaño (alumnos×preguntas) mide por separado lectura y
+codificación (leer_examen, desde CSV y desde .xlsx), corrección
+(corregir_matriz) y estadísticas (estadisticas_preguntas), y la corrección
+completa a través de /corregir con TestClient. Muestra también el coste por
+celda (µs), que debe mantenerse aproximadamente constante (coste
+lineal en el número de celdas).
+
+Uso (desde backend/):
+    python benchmarks/bench_examen_grande.py
+    python benchmarks/bench_examen_grande.py --sizes 5000x200 10000x200 --options 8 --no-xlsx
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARKS_DIR.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from bench_ingestion import escribir_archivos, filas_sinteticas  # noqa: E402
+
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def medir(n_alumnos: int, n_preguntas: int, n_opciones: int, con_xlsx: bool, cliente):
+    from grading import corregir_matriz, estadisticas_preguntas
+    from ingestion import leer_examen
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rutas = escribir_archivos(filas_sinteticas(n_alumnos, n_preguntas, n_opciones), Path(tmp))
+        contenido_csv = rutas["csv"].read_bytes()
+        contenido_xlsx = rutas["xlsx"].read_bytes()
+
+    celdas = n_alumnos * n_preguntas
+    examen, lectura_csv = cronometrar(leer_examen, contenido_csv, n_preguntas, n_opciones)
+    (notas, presentados, por_pregunta), correccion = cronometrar(
+        corregir_matriz, examen.mascaras, examen.respondidas, examen.clave, n_opciones
+    )
+    _, estadisticas = cronometrar(
+        estadisticas_preguntas, examen.mascaras, examen.respondidas, examen.clave, por_pregunta, n_opciones
+    )
+
+    inicio = time.perf_counter()
+    respuesta = cliente.post(
+        "/corregir",
+        files={"file": ("examen.csv", contenido_csv)},
+        data={"n_opciones": n_opciones, "n_preguntas": n_preguntas},
+    )
+    respuesta.raise_for_status()
+    extremo_a_extremo = time.perf_counter() - inicio
+
+    resultado = {
+        "students": n_alumnos,
+        "questions": n_preguntas,
+        "options": n_opciones,
+        "cells": celdas,
+        "ingest_csv_seconds": round(lectura_csv, 3),
+        "grade_seconds": round(correccion, 3),
+        "stats_seconds": round(estadisticas, 3),
+        "end_to_end_csv_seconds": round(extremo_a_extremo, 3),
+        "end_to_end_us_per_cell": round(extremo_a_extremo / celdas * 1e6, 3),
+        "mask_bytes": examen.mascaras.nbytes,
+    }
+    if con_xlsx:
+        _, lectura_xlsx = cronometrar(leer_examen, contenido_xlsx, n_preguntas, n_opciones)
+        resultado["ingest_xlsx_seconds"] = round(lectura_xlsx, 3)
+    resultado["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["5000x50", "5000x100", "5000x200", "10000x200"],
+                        help="Tamaños como ALUMNOSxPREGUNTAS")
+    parser.add_argument("--options", type=int, default=8)
+    parser.add_argument("--no-xlsx", action="store_true", help="No medir la lectura del .xlsx (lenta)")
+    parser.add_argument("--output", type=Path, help="Guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    # Sesiones, logs y caché en un directorio temporal
+    os.chdir(tempfile.mkdtemp())
+    from fastapi.testclient import TestClient
+    import main as app_main
+
+    resultados = []
+    with TestClient(app_main.app) as cliente:
+        for tamano in args.sizes:
+            n_alumnos, n_preguntas = (int(x) for x in tamano.lower().split("x"))
+            resultado = medir(n_alumnos, n_preguntas, args.options, not args.no_xlsx, cliente)
+            resultados.append(resultado)
+            xlsx = f"  xlsx {resultado['ingest_xlsx_seconds']:>6.2f} s" if "ingest_xlsx_seconds" in resultado else ""
+            print(f"{n_alumnos:>6}x{n_preguntas:<4} ({resultado['cells'] / 1e6:.1f} M celdas)  "
+                  f"lectura csv {resultado['ingest_csv_seconds']:>6.3f} s  "
+                  f"corrección {resultado['grade_seconds']:>6.3f} s  "
+                  f"estadísticas {resultado['stats_seconds']:>6.3f} s  "
+                  f"/corregir {resultado['end_to_end_csv_seconds']:>6.3f} s "
+                  f"({resultado['end_to_end_us_per_cell']:.2f} µs/celda){xlsx}")
+
+    if args.output:
+        args.output.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
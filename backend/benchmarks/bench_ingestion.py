@@ -0,0 +1,165 @@
+"""
+Benchmark de ingestión: lectura, validación y codificación del mismo examen
+sintético guardado como Excel (.xlsx), CSV, Parquet y Arrow (Feather).
+
+Para cada formato mide el tiempo de leer_examen (mejor de --repeats), el
+rendimiento en alumnos/s y MB/s y el pico de memoria (RSS). Cada formato se
+mide en un subproceso propio, porque el pico de RSS de un proceso solo puede
+crecer. También comprueba que los cuatro formatos dan exactamente el mismo
+resultado (DNI, máscaras y celdas respondidas).
+
+Uso (desde backend/):
+    python benchmarks/bench_ingestion.py
+    python benchmarks/bench_ingestion.py --students 10000 50000 --questions 20
+"""
+import argparse
+import csv
+import hashlib
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+FORMATOS = ["xlsx", "csv", "parquet", "arrow"]
+
+
+def filas_sinteticas(n_alumnos: int, n_preguntas: int, n_opciones: int, seed: int = 0):
+    """Cabecera, clave y alumnos con DNI, respuestas múltiples y celdas vacías."""
+    rnd = random.Random(seed)
+    letras = "ABCDEFGH"[:n_opciones]
+
+    def respuesta():
+        return ",".join(sorted(rnd.sample(letras, rnd.randint(1, 2))))
+
+    filas = [["DNI"] + [f"P{i + 1}" for i in range(n_preguntas)]]
+    clave = [respuesta() for _ in range(n_preguntas)]
+    clave[0] = letras[-1]
+    filas.append(["CLAVE"] + clave)
+    for _ in range(n_alumnos):
+        filas.append(
+            [f"{rnd.randint(10**7, 10**8 - 1)}X"]
+            + [respuesta() if rnd.random() > 0.15 else None for _ in range(n_preguntas)]
+        )
+    return filas
+
+
+def escribir_archivos(filas, directorio: Path):
+    """Guarda las filas en los cuatro formatos. Devuelve {formato: ruta}."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    from openpyxl import Workbook
+
+    rutas = {formato: directorio / f"examen.{formato}" for formato in FORMATOS}
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for fila in filas:
+        ws.append(fila)
+    wb.save(rutas["xlsx"])
+
+    with open(rutas["csv"], "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for fila in filas:
+            writer.writerow(["" if valor is None else valor for valor in fila])
+
+    tabla = pa.table({
+        nombre: [fila[i] for fila in filas[1:]] for i, nombre in enumerate(filas[0])
+    })
+    pq.write_table(tabla, rutas["parquet"])
+    feather.write_feather(tabla, rutas["arrow"])
+    return rutas
+
+
+def medir(formato: str, ruta: Path, n_preguntas: int, n_opciones: int, repeticiones: int):
+    """Se ejecuta dentro del subproceso: lee el archivo y devuelve las medidas."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    from ingestion import leer_examen
+
+    contenido = ruta.read_bytes()
+    rss_inicial_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        examen = leer_examen(contenido, n_preguntas, n_opciones)
+        tiempos.append(time.perf_counter() - inicio)
+
+    rss_pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    firma = hashlib.sha256()
+    firma.update("\n".join(examen.dnis).encode("utf-8"))
+    firma.update(examen.clave.tobytes())
+    firma.update(examen.mascaras.tobytes())
+    firma.update(examen.respondidas.tobytes())
+
+    segundos = min(tiempos)
+    n_alumnos = len(examen.dnis)
+    return {
+        "format": formato,
+        "students": n_alumnos,
+        "questions": n_preguntas,
+        "file_bytes": len(contenido),
+        "seconds": round(segundos, 4),
+        "students_per_second": round(n_alumnos / segundos),
+        "mb_per_second": round(len(contenido) / segundos / 2**20, 1),
+        "peak_rss_mb": round(rss_pico_kb / 1024, 1),
+        "rss_delta_mb": round((rss_pico_kb - rss_inicial_kb) / 1024, 1),
+        "digest": firma.hexdigest(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--options", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Guardar los resultados en JSON")
+    parser.add_argument("--worker", nargs=2, metavar=("FORMATO", "RUTA"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        formato, ruta = args.worker
+        print(json.dumps(medir(formato, Path(ruta), args.questions, args.options, args.repeats)))
+        return
+
+    resultados = []
+    for n in args.students:
+        with tempfile.TemporaryDirectory() as tmp:
+            rutas = escribir_archivos(filas_sinteticas(n, args.questions, args.options), Path(tmp))
+            por_formato = []
+            for formato, ruta in rutas.items():
+                salida = subprocess.run(
+                    [sys.executable, str(Path(__file__).resolve()), "--worker", formato, str(ruta),
+                     "--questions", str(args.questions), "--options", str(args.options),
+                     "--repeats", str(args.repeats)],
+                    cwd=tmp, capture_output=True, text=True, check=True,
+                )
+                por_formato.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+        referencia = por_formato[0]
+        for resultado in por_formato:
+            resultado["same_as_xlsx"] = resultado["digest"] == referencia["digest"]
+            resultado["speedup_vs_xlsx"] = round(referencia["seconds"] / resultado["seconds"], 1)
+            resultados.append(resultado)
+            print(f"{n:>7} alumnos  {resultado['format']:<8} {resultado['seconds']:>8.3f} s  "
+                  f"{resultado['students_per_second']:>9} alumnos/s  {resultado['mb_per_second']:>6.1f} MB/s  "
+                  f"x{resultado['speedup_vs_xlsx']:<5} pico RSS {resultado['peak_rss_mb']:>6.1f} MB  "
+                  f"{resultado['file_bytes'] / 1024:>7.0f} KB  "
+                  f"{'idéntico' if resultado['same_as_xlsx'] else 'DISTINTO'}")
+
+        if not all(resultado["same_as_xlsx"] for resultado in por_formato):
+            sys.exit(f"Los formatos dan resultados distintos con {n} alumnos")
+
+    if args.output:
+        args.output.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark del análisis de ítems (item_analysis.analisis_items): dificultad,
+discriminación, biserial puntual, distractores y alfa/KR-20 sobre la matriz
+alumnos×preguntas.
+
+Genera la matriz de máscaras directamente (alumnos con distinta habilidad,
+para que los índices no salgan todos a cero), la corrige con
+corregir_matriz y mide el mejor tiempo de --repeats de analisis_items, junto
+al de estadisticas_preguntas como referencia. Termina con error si el
+análisis tarda más de --max-seconds en algún tamaño.
+
+Uso (desde backend/):
+    python benchmarks/bench_item_analysis.py
+    python benchmarks/bench_item_analysis.py --students 1000 10000 50000 --questions 100 --options 8
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from grading import corregir_matriz, estadisticas_preguntas  # noqa: E402
+from item_analysis import analisis_items  # noqa: E402
+
+
+def matriz_sintetica(n_alumnos: int, n_preguntas: int, n_opciones: int, seed: int = 0):
+    rnd = np.random.default_rng(seed)
+    todas = (1 << n_opciones) - 1
+    clave = rnd.integers(1, todas + 1, n_preguntas).astype(np.uint8)
+    habilidad = rnd.random(n_alumnos)
+    azar = rnd.integers(0, todas + 1, (n_alumnos, n_preguntas)).astype(np.uint8)
+    mascaras = np.where(rnd.random((n_alumnos, n_preguntas)) < habilidad[:, None], clave, azar).astype(np.uint8)
+    # Un 3 % de no presentados
+    mascaras[rnd.random(n_alumnos) < 0.03] = 0
+    return mascaras, mascaras != 0, clave
+
+
+def mejor_tiempo(repeticiones: int, funcion) -> float:
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return round(mejor, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--options", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    parser.add_argument("--output", type=Path, help="Guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    resultados = []
+    for n_alumnos in args.students:
+        mascaras, respondidas, clave = matriz_sintetica(n_alumnos, args.questions, args.options)
+        _, _, por_pregunta = corregir_matriz(mascaras, respondidas, clave, args.options)
+        items, fiabilidad = analisis_items(mascaras, respondidas, clave, por_pregunta, args.options)
+
+        resultado = {
+            "students": n_alumnos,
+            "questions": args.questions,
+            "options": args.options,
+            "item_analysis_seconds": mejor_tiempo(args.repeats, lambda: analisis_items(
+                mascaras, respondidas, clave, por_pregunta, args.options
+            )),
+            "stats_seconds": mejor_tiempo(args.repeats, lambda: estadisticas_preguntas(
+                mascaras, respondidas, clave, por_pregunta, args.options
+            )),
+            **fiabilidad,
+        }
+        resultados.append(resultado)
+        print(f"{n_alumnos:>7} alumnos × {args.questions} preguntas  "
+              f"análisis de ítems {resultado['item_analysis_seconds']:.3f} s  "
+              f"estadísticas {resultado['stats_seconds']:.3f} s  "
+              f"alfa {fiabilidad['alfa_cronbach']}  KR-20 {fiabilidad['kr20']}")
+
+    if args.output:
+        args.output.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+
+    lentos = [r for r in resultados if r["item_analysis_seconds"] > args.max_seconds]
+    if lentos:
+        print(f"Más de {args.max_seconds} s: {', '.join(str(r['students']) for r in lentos)} alumnos")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark del informe PDF: tiempo de generación y pico de memoria (RSS)
+para sesiones sintéticas de distinto tamaño.
+
+Cada tamaño se mide en un subproceso propio, porque el pico de RSS de un
+proceso solo puede crecer.
+
+Uso (desde backend/):
+    python benchmarks/bench_pdf.py
+    python benchmarks/bench_pdf.py --sizes 100 1000 10000 --rows-per-page 0
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def crear_sesion_sintetica(sesion, n_alumnos: int, n_preguntas: int = 20, seed: int = 0):
+    rnd = random.Random(seed)
+    preview = [
+        {"dni": f"{rnd.randint(10**7, 10**8 - 1)}X", "nota": round(rnd.uniform(0, n_preguntas), 2), "presentado": True}
+        for _ in range(n_alumnos)
+    ]
+    question_data = [
+        {"question": f"P{i + 1}", "avg_score": round(rnd.random(), 2), "total_answered": n_alumnos,
+         **{opt: round(rnd.uniform(0, 100), 1) for opt in "ABCDE"}}
+        for i in range(n_preguntas)
+    ]
+    notas = [row["nota"] for row in preview]
+    metrics = {
+        "alumnos_totales": n_alumnos, "presentados": n_alumnos, "no_presentados": 0,
+        "media": round(sum(notas) / len(notas), 2), "max": max(notas), "min": min(notas),
+        "aprobados": sum(1 for n in notas if n >= 5), "suspensos": sum(1 for n in notas if n < 5),
+        "porcentaje_aprobados": 0, "question_data": question_data, "n_opciones": 5,
+    }
+    sys.path.insert(0, str(BACKEND_DIR))
+    from session_store import guardar_resultados
+    guardar_resultados(
+        sesion,
+        [row["dni"] for row in preview], notas, [row["presentado"] for row in preview], metrics,
+    )
+
+
+def medir(n_alumnos: int):
+    """Se ejecuta dentro del subproceso: genera un PDF y devuelve las medidas."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import main  # noqa: E402  (importa con el directorio de trabajo temporal)
+
+    sesion = main.storage.crear_sesion(str(uuid.uuid4()))
+    crear_sesion_sintetica(sesion, n_alumnos)
+    pdf_path = Path("reporte.pdf")
+    rss_inicial_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    inicio = time.perf_counter()
+    main.generar_pdf(sesion, pdf_path)
+    segundos = time.perf_counter() - inicio
+
+    rss_pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "students": n_alumnos,
+        "rows_per_page": main.PDF_TABLE_ROWS_PER_PAGE,
+        "render_seconds": round(segundos, 3),
+        "peak_rss_mb": round(rss_pico_kb / 1024, 1),
+        "render_rss_delta_mb": round((rss_pico_kb - rss_inicial_kb) / 1024, 1),
+        "pdf_bytes": pdf_path.stat().st_size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--rows-per-page", type=int, default=None,
+                        help="Valor de PDF_TABLE_ROWS_PER_PAGE (0 = una sola tabla)")
+    parser.add_argument("--output", type=Path, help="Guardar los resultados en JSON")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(medir(args.worker)))
+        return
+
+    env = dict(os.environ)
+    if args.rows_per_page is not None:
+        env["PDF_TABLE_ROWS_PER_PAGE"] = str(args.rows_per_page)
+
+    resultados = []
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            salida = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), "--worker", str(n)],
+                cwd=tmp, env=env, capture_output=True, text=True, check=True,
+            )
+        resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+        resultados.append(resultado)
+        print(f"{n:>7} alumnos  {resultado['render_seconds']:>8.3f} s  "
+              f"pico RSS {resultado['peak_rss_mb']:>7.1f} MB  (+{resultado['render_rss_delta_mb']} MB)  "
+              f"{resultado['pdf_bytes'] / 1024:.0f} KB")
+
+    if args.output:
+        args.output.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
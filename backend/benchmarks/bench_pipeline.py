@@ -0,0 +1,237 @@
+"""
+Benchmark del flujo completo de corrección, etapa a etapa y de extremo a
+extremo, con resultados de referencia para detectar regresiones.
+
+Genera exámenes sintéticos (.xlsx) del tamaño indicado y mide, cada etapa
+en un subproceso propio (el pico de RSS de un proceso solo puede crecer):
+
+- ingest: lectura, validación y codificación (leer_examen).
+- grade:  corrección sobre las máscaras (corregir_matriz).
+- stats:  estadísticas por pregunta y opción (estadisticas_preguntas).
+- excel:  Excel corregido con sus gráficos (construir_excel).
+- pdf:    informe PDF (generar_pdf).
+- e2e:    /validate + /corregir con el upload_token + /download +
+          /export-pdf a través de TestClient.
+
+De cada etapa se guarda el tiempo (mejor de --repeats), el rendimiento en
+alumnos/s y el pico de RSS. Con --save-baseline los resultados se guardan
+como referencia en benchmarks/baselines/pipeline.json; con --check se
+comparan con ella y el script termina con error si alguna etapa es más
+lenta o usa más memoria de lo tolerado. La referencia depende de la
+máquina: hay que regenerarla al cambiar de servidor.
+
+Uso (desde backend/):
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --students 1000 10000 --questions 20 --save-baseline
+    python benchmarks/bench_pipeline.py --check --time-tolerance 1.5
+    python benchmarks/bench_pipeline.py --stages ingest e2e --students 50000
+"""
+import argparse
+import io
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARKS_DIR.parent
+BASELINE_PATH = BENCHMARKS_DIR / "baselines" / "pipeline.json"
+
+ETAPAS = ["ingest", "grade", "stats", "excel", "pdf", "e2e"]
+
+
+def examen_xlsx(n_alumnos: int, n_preguntas: int, n_opciones: int, seed: int = 0) -> bytes:
+    """Examen sintético en .xlsx (mismas filas que bench_ingestion)."""
+    from openpyxl import Workbook
+
+    sys.path.insert(0, str(BENCHMARKS_DIR))
+    from bench_ingestion import filas_sinteticas
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for fila in filas_sinteticas(n_alumnos, n_preguntas, n_opciones, seed):
+        ws.append(fila)
+    salida = io.BytesIO()
+    wb.save(salida)
+    return salida.getvalue()
+
+
+def mejor_de(repeticiones: int, funcion):
+    """Ejecuta funcion() repeticiones veces y devuelve el menor tiempo."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def medir(etapa: str, n_alumnos: int, n_preguntas: int, n_opciones: int, repeticiones: int):
+    """Se ejecuta dentro del subproceso: prepara la etapa y la mide."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import main  # noqa: E402  (importa con el directorio de trabajo temporal)
+    from grading import corregir_matriz, estadisticas_preguntas
+    from ingestion import leer_examen, leer_tabla
+    from session_store import cargar_metrics, cargar_notas
+
+    contenido = examen_xlsx(n_alumnos, n_preguntas, n_opciones)
+    rss_inicial_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if etapa in ("ingest", "grade", "stats"):
+        examen = leer_examen(contenido, n_preguntas, n_opciones)
+        _, _, por_pregunta = corregir_matriz(examen.mascaras, examen.respondidas, examen.clave, n_opciones)
+        rss_inicial_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        funciones = {
+            "ingest": lambda: leer_examen(contenido, n_preguntas, n_opciones),
+            "grade": lambda: corregir_matriz(examen.mascaras, examen.respondidas, examen.clave, n_opciones),
+            "stats": lambda: estadisticas_preguntas(
+                examen.mascaras, examen.respondidas, examen.clave, por_pregunta, n_opciones
+            ),
+        }
+        segundos = mejor_de(repeticiones, funciones[etapa])
+
+    elif etapa in ("excel", "pdf"):
+        session_id = main.procesar_correccion(contenido, n_opciones, n_preguntas)
+        sesion = main.storage.sesion(session_id)
+        if etapa == "excel":
+            metrics = cargar_metrics(sesion)
+            df_original = leer_tabla(sesion.leer("original.xlsx"))
+            notas = cargar_notas(sesion).notas.tolist()
+            rss_inicial_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            segundos = mejor_de(repeticiones, lambda: main.construir_excel(
+                df_original, df_original.iloc[1:].copy(), notas, metrics, metrics["question_data"]
+            ))
+        else:
+            rss_inicial_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            segundos = mejor_de(repeticiones, lambda: main.generar_pdf(sesion, Path(f"{uuid.uuid4()}.pdf")))
+
+    else:
+        from fastapi.testclient import TestClient
+
+        # Un archivo distinto en cada repetición para no medir la caché de resultados
+        archivos = [contenido] + [
+            examen_xlsx(n_alumnos, n_preguntas, n_opciones, seed) for seed in range(1, repeticiones)
+        ]
+        datos = {"n_opciones": n_opciones, "n_preguntas": n_preguntas}
+        tiempos = []
+        with TestClient(main.app) as cliente:
+            rss_inicial_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            for archivo in archivos:
+                inicio = time.perf_counter()
+                validacion = cliente.post("/validate", files={"file": ("examen.xlsx", archivo)}, data=datos)
+                validacion.raise_for_status()
+                correccion = cliente.post("/corregir", data={"upload_token": validacion.json()["upload_token"]})
+                correccion.raise_for_status()
+                session_id = correccion.json()["session_id"]
+                cliente.get(f"/download/{session_id}").raise_for_status()
+                cliente.get(f"/export-pdf/{session_id}").raise_for_status()
+                tiempos.append(time.perf_counter() - inicio)
+        segundos = min(tiempos)
+
+    rss_pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "stage": etapa,
+        "students": n_alumnos,
+        "questions": n_preguntas,
+        "options": n_opciones,
+        "seconds": round(segundos, 4),
+        "students_per_second": round(n_alumnos / segundos),
+        "peak_rss_mb": round(rss_pico_kb / 1024, 1),
+        "rss_delta_mb": round((rss_pico_kb - rss_inicial_kb) / 1024, 1),
+    }
+
+
+def comparar(resultados, referencia, tolerancia_tiempo: float, tolerancia_memoria: float, margen_segundos: float):
+    """
+    Lista de regresiones respecto a la referencia (vacía si no hay). Las
+    diferencias de tiempo menores que margen_segundos se ignoran: en las
+    etapas de milisegundos son ruido.
+    """
+    por_clave = {(r["stage"], r["students"], r["questions"], r["options"]): r for r in referencia["results"]}
+    regresiones = []
+    for resultado in resultados:
+        base = por_clave.get((resultado["stage"], resultado["students"], resultado["questions"], resultado["options"]))
+        if base is None:
+            continue
+        nombre = f"{resultado['stage']} ({resultado['students']} alumnos)"
+        if (resultado["seconds"] > base["seconds"] * tolerancia_tiempo
+                and resultado["seconds"] - base["seconds"] > margen_segundos):
+            regresiones.append(f"{nombre}: {resultado['seconds']:.3f} s frente a {base['seconds']:.3f} s")
+        if resultado["peak_rss_mb"] > base["peak_rss_mb"] * tolerancia_memoria:
+            regresiones.append(f"{nombre}: pico RSS {resultado['peak_rss_mb']} MB frente a {base['peak_rss_mb']} MB")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--options", type=int, default=5)
+    parser.add_argument("--stages", nargs="+", choices=ETAPAS, default=ETAPAS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Guardar los resultados en JSON")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Guardar como referencia en {BASELINE_PATH.name}")
+    parser.add_argument("--check", action="store_true", help="Comparar con la referencia y fallar si hay regresiones")
+    parser.add_argument("--time-tolerance", type=float, default=1.5,
+                        help="Regresión si el tiempo supera la referencia por este factor")
+    parser.add_argument("--memory-tolerance", type=float, default=1.25,
+                        help="Regresión si el pico de RSS supera la referencia por este factor")
+    parser.add_argument("--min-delta", type=float, default=0.05,
+                        help="Diferencia de tiempo mínima (s) para contar como regresión")
+    parser.add_argument("--worker", nargs=2, metavar=("ETAPA", "ALUMNOS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        etapa, n_alumnos = args.worker
+        print(json.dumps(medir(etapa, int(n_alumnos), args.questions, args.options, args.repeats)))
+        return
+
+    resultados = []
+    for n in args.students:
+        for etapa in args.stages:
+            with tempfile.TemporaryDirectory() as tmp:
+                salida = subprocess.run(
+                    [sys.executable, str(Path(__file__).resolve()), "--worker", etapa, str(n),
+                     "--questions", str(args.questions), "--options", str(args.options),
+                     "--repeats", str(args.repeats)],
+                    cwd=tmp, capture_output=True, text=True, check=True,
+                )
+            resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+            resultados.append(resultado)
+            print(f"{n:>7} alumnos  {etapa:<7} {resultado['seconds']:>8.3f} s  "
+                  f"{resultado['students_per_second']:>10} alumnos/s  "
+                  f"pico RSS {resultado['peak_rss_mb']:>7.1f} MB  (+{resultado['rss_delta_mb']} MB)")
+
+    if args.output:
+        args.output.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        BASELINE_PATH.parent.mkdir(exist_ok=True)
+        BASELINE_PATH.write_text(json.dumps({
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": sys.version.split()[0],
+            "results": resultados,
+        }, indent=2) + "\n", encoding="utf-8")
+        print(f"Referencia guardada en {BASELINE_PATH}")
+
+    if args.check:
+        if not BASELINE_PATH.exists():
+            sys.exit(f"No hay referencia en {BASELINE_PATH}: ejecútalo antes con --save-baseline")
+        regresiones = comparar(
+            resultados, json.loads(BASELINE_PATH.read_text(encoding="utf-8")),
+            args.time_tolerance, args.memory_tolerance, args.min_delta,
+        )
+        if regresiones:
+            print("Regresiones respecto a la referencia:")
+            for regresion in regresiones:
+                print(f"  - {regresion}")
+            sys.exit(1)
+        print("Sin regresiones respecto a la referencia")
+
+
+if __name__ == "__main__":
+    main()
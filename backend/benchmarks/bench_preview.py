@@ -0,0 +1,129 @@
+"""
+Benchmark de la respuesta de /preview (session_store.preview_json): lista de
+{dni, nota, presentado} en JSON a partir de las columnas guardadas en
+grades.npz.
+
+Compara, con el mismo resultado byte a byte, tres formas de serializarla:
+
+- filas:     un dict por alumno y orjson.dumps de la lista (la de
+             preview_json).
+- plantilla: el JSON de cada alumno compuesto a mano con una plantilla de
+             bytes, sin dicts.
+- columnas:  las piezas de cada columna (DNI, nota, presentado) como arrays
+             de texto y unidas con np.char.add, sin recorrer filas en Python
+             salvo para escapar los DNI.
+
+Mide el mejor tiempo de --repeats de cada una y, aparte, el de preview_json
+completo (lectura de grades.npz incluida). Termina con error si preview_json
+tarda más de --max-seconds en algún tamaño.
+
+Uso (desde backend/):
+    python benchmarks/bench_preview.py
+    python benchmarks/bench_preview.py --students 1000 10000 100000
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import orjson
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from session_store import cargar_notas, guardar_resultados, preview_json  # noqa: E402
+from storage import LocalShardedStorage  # noqa: E402
+
+
+def notas_sinteticas(n_alumnos: int, seed: int = 0):
+    rnd = np.random.default_rng(seed)
+    dnis = [f"{dni}{chr(65 + i % 26)}" for i, dni in enumerate(rnd.integers(10**7, 10**8, n_alumnos))]
+    notas = rnd.integers(0, 1001, n_alumnos) / 100
+    presentados = rnd.random(n_alumnos) > 0.05
+    return dnis, notas, presentados
+
+
+def por_filas(notas) -> bytes:
+    return orjson.dumps([
+        {"dni": dni, "nota": nota, "presentado": presentado}
+        for dni, nota, presentado in notas.filas()
+    ])
+
+
+def por_plantilla(notas) -> bytes:
+    presentados = [b"true" if p else b"false" for p in notas.presentados.tolist()]
+    return b"[" + b",".join(
+        b'{"dni":%s,"nota":%s,"presentado":%s}' % (orjson.dumps(dni), orjson.dumps(nota), presentado)
+        for dni, nota, presentado in zip(notas.dnis, notas.notas.tolist(), presentados)
+    ) + b"]"
+
+
+def por_columnas(notas) -> bytes:
+    if not notas.dnis:
+        return b"[]"
+    dnis = np.array([orjson.dumps(dni) for dni in notas.dnis])
+    valores = np.array([orjson.dumps(nota) for nota in notas.notas.tolist()])
+    piezas = np.char.add(np.char.add(b'{"dni":', dnis), b',"nota":')
+    piezas = np.char.add(piezas, valores)
+    piezas = np.char.add(piezas, np.where(notas.presentados, b',"presentado":true}', b',"presentado":false}'))
+    return b"[" + b",".join(piezas.tolist()) + b"]"
+
+
+def mejor_tiempo(repeticiones: int, funcion) -> float:
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return round(mejor, 5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--max-seconds", type=float, default=0.5)
+    parser.add_argument("--output", type=Path, help="Guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    variantes = {"filas": por_filas, "plantilla": por_plantilla, "columnas": por_columnas}
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        storage = LocalShardedStorage(Path(directorio))
+        for n_alumnos in args.students:
+            sesion = storage.crear_sesion(str(uuid.uuid4()))
+            guardar_resultados(sesion, *notas_sinteticas(n_alumnos), {})
+            notas = cargar_notas(sesion)
+
+            esperado = preview_json(sesion)
+            for nombre, variante in variantes.items():
+                if variante(notas) != esperado:
+                    sys.exit(f"{nombre}: el JSON no coincide con el de preview_json")
+
+            resultado = {
+                "students": n_alumnos,
+                "preview_json_seconds": mejor_tiempo(args.repeats, lambda: preview_json(sesion)),
+                **{
+                    f"{nombre}_seconds": mejor_tiempo(args.repeats, lambda variante=variante: variante(notas))
+                    for nombre, variante in variantes.items()
+                },
+            }
+            resultados.append(resultado)
+            print(f"{n_alumnos:>7} alumnos  preview_json {resultado['preview_json_seconds']:.4f} s  "
+                  + "  ".join(f"{nombre} {resultado[f'{nombre}_seconds']:.4f} s" for nombre in variantes))
+
+    if args.output:
+        args.output.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+
+    lentos = [r for r in resultados if r["preview_json_seconds"] > args.max_seconds]
+    if lentos:
+        print(f"Más de {args.max_seconds} s: {', '.join(str(r['students']) for r in lentos)} alumnos")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
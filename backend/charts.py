@@ -0,0 +1,99 @@
+"""
+Gráficos de matplotlib para el informe PDF.
+
+Crear una Figure, su canvas y sus ejes, y cargar las fuentes la primera vez
+que se dibuja texto, cuesta más que dibujar las propias barras. Por eso cada
+hilo trabajador conserva sus figuras como plantillas y solo limpia y vuelve a
+dibujar los ejes en cada informe. Se usa Figure sin pyplot porque el estado
+global de pyplot no es seguro entre hilos.
+"""
+import io
+import threading
+
+import matplotlib
+matplotlib.use('Agg') # Usar backend no interactivo
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from grading import LETRAS_POSIBLES, OPCIONES_CLASICAS
+
+COLORES_OPCIONES = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F', '#BB8FCE', '#82E0AA']
+
+# Con más preguntas, solo se rotula una de cada tantas en el eje X
+MAX_ETIQUETAS_PREGUNTAS = 40
+
+_local = threading.local()
+
+
+def _plantilla(nombre: str, figsize):
+    """Figura y ejes reutilizables de este hilo, con los ejes ya limpios."""
+    plantillas = getattr(_local, "plantillas", None)
+    if plantillas is None:
+        plantillas = _local.plantillas = {}
+
+    if nombre not in plantillas:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        plantillas[nombre] = (fig, fig.subplots())
+
+    fig, ax = plantillas[nombre]
+    ax.cla()
+    return fig, ax
+
+
+def _a_png(fig) -> io.BytesIO:
+    img_buffer = io.BytesIO()
+    fig.savefig(img_buffer, format='png', bbox_inches='tight')
+    img_buffer.seek(0)
+    return img_buffer
+
+
+def _etiquetas_preguntas(ax, posiciones, questions):
+    paso = -(-len(questions) // MAX_ETIQUETAS_PREGUNTAS)
+    ax.set_xticks(list(posiciones)[::paso], questions[::paso])
+
+
+def grafico_puntuacion_media(question_data) -> io.BytesIO:
+    fig, ax = _plantilla("puntuacion_media", (6, 4))
+    questions = [q["question"] for q in question_data]
+    avg_scores = [q["avg_score"] for q in question_data]
+
+    ax.bar(questions, avg_scores, color='#45B7D1')
+    if len(questions) > MAX_ETIQUETAS_PREGUNTAS:
+        _etiquetas_preguntas(ax, range(len(questions)), questions)
+    ax.set_title("Puntuación media por pregunta")
+    ax.set_ylim(0, 1.1)
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    return _a_png(fig)
+
+
+def grafico_aciertos_opcion(question_data) -> io.BytesIO:
+    fig, ax = _plantilla("aciertos_opcion", (8, 5))
+    questions = [q["question"] for q in question_data]
+    x = range(len(questions))
+    # Hueco para A-E como siempre; más ancho si el examen tiene más opciones
+    n_opciones = max([OPCIONES_CLASICAS] + [
+        LETRAS_POSIBLES.index(opt) + 1 for q in question_data for opt in LETRAS_POSIBLES if opt in q
+    ])
+    opciones = LETRAS_POSIBLES[:n_opciones]
+    width = min(0.15, 0.8 / n_opciones)
+
+    for idx, opt in enumerate(opciones):
+        # Solo pintar si al menos una pregunta tiene esta opción (evita errores si n_opciones < 5)
+        vals = [q.get(opt, 0) for q in question_data]
+        if any(v > 0 for v in vals):
+            ax.bar([p + (idx * width) for p in x], vals, width, label=opt, color=COLORES_OPCIONES[idx])
+
+    ax.set_title("Porcentaje de aciertos por opción (%)")
+    _etiquetas_preguntas(ax, [p + (n_opciones - 1) / 2 * width for p in x], questions)
+    ax.set_ylim(0, 105)
+    ax.legend()
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    return _a_png(fig)
+
+
+def precalentar_graficos():
+    """Dibuja una vez con datos de ejemplo para cargar fuentes y plantillas."""
+    ejemplo = [{"question": "P1", "avg_score": 0.5, "A": 50.0}]
+    grafico_puntuacion_media(ejemplo)
+    grafico_aciertos_opcion(ejemplo)
@@ -0,0 +1,161 @@
+"""
+Motor de corrección vectorizado.
+
+Cada celda de respuesta se codifica como una máscara de bits sobre las opciones
+configuradas (bit 0 = A, bit 1 = B, ...). Con la matriz alumnos×preguntas ya
+codificada, las notas se calculan con operaciones sobre arrays de NumPy en lugar
+de recorrer el DataFrame fila a fila.
+"""
+import numpy as np
+
+# pandas se importa dentro de las funciones que lo usan, para no cargarlo al
+# importar el módulo
+
+# Alfabeto de opciones: el examen usa las n_opciones primeras letras. Cada
+# celda se codifica en un uint8, así que caben hasta 8 opciones.
+LETRAS_POSIBLES = ["A", "B", "C", "D", "E", "F", "G", "H"]
+MAX_OPCIONES = len(LETRAS_POSIBLES)
+
+# Letras que se buscan en las celdas para avisar de un n_opciones equivocado.
+# Hasta 5 opciones son A-E, como siempre (una "F" suelta no cuenta como
+# opción); con más opciones, las de todo el alfabeto.
+OPCIONES_CLASICAS = 5
+
+
+def letras_reconocidas(n_opciones: int):
+    return LETRAS_POSIBLES[:max(OPCIONES_CLASICAS, n_opciones)]
+
+
+def parse_respuesta(valor):
+    import pandas as pd
+
+    if pd.isna(valor) or str(valor).strip() == "":
+        return set()
+    return set(v.strip().upper() for v in str(valor).split(","))
+
+
+def _popcount(mascara: int) -> int:
+    return bin(mascara).count("1")
+
+
+def mascara_opciones(seleccionadas, n_opciones: int) -> int:
+    """Máscara de bits de un conjunto de letras ya interpretado con parse_respuesta."""
+    mascara = 0
+    for bit, letra in enumerate(LETRAS_POSIBLES[:n_opciones]):
+        if letra in seleccionadas:
+            mascara |= 1 << bit
+    return mascara
+
+
+def codificar_valor(valor, n_opciones: int):
+    """(máscara, respondida) de una sola celda, con la semántica de parse_respuesta."""
+    seleccionadas = parse_respuesta(valor)
+    return mascara_opciones(seleccionadas, n_opciones), bool(seleccionadas)
+
+
+def pesos_pregunta(mascara_clave: int, n_opciones: int):
+    """Valor de cada opción correcta e incorrecta marcada para una pregunta."""
+    todas = (1 << n_opciones) - 1
+    n_correctas = _popcount(mascara_clave & todas)
+    n_incorrectas = _popcount(todas & ~mascara_clave)
+    valor_correcta = 1 / n_correctas if n_correctas else 0
+    valor_incorrecta = 1 / n_incorrectas if n_incorrectas else 0
+    return valor_correcta, valor_incorrecta
+
+
+def puntuaciones_brutas(mascaras: np.ndarray, clave: np.ndarray, n_opciones: int):
+    """
+    Puntos (sin redondear ni recortar) de cada alumno.
+
+    Devuelve (total, por_pregunta): el total por alumno y la matriz
+    alumnos×preguntas con la puntuación de cada pregunta. Se acumula pregunta a
+    pregunta y opción a opción, en el mismo orden en que lo hace la corrección
+    clásica, para que el resultado en coma flotante sea exactamente el mismo.
+    """
+    n_alumnos, n_preguntas = mascaras.shape
+    total = np.zeros(n_alumnos, dtype=np.float64)
+    por_pregunta = np.zeros((n_alumnos, n_preguntas), dtype=np.float64)
+
+    for i in range(n_preguntas):
+        mascara_clave = int(clave[i])
+        valor_correcta, valor_incorrecta = pesos_pregunta(mascara_clave, n_opciones)
+        columna = mascaras[:, i]
+        puntos = por_pregunta[:, i]
+        for bit in range(n_opciones):
+            marcada = (columna & (1 << bit)) != 0
+            if mascara_clave & (1 << bit):
+                aporte = np.where(marcada, valor_correcta, 0.0)
+                total += aporte
+                puntos += aporte
+            else:
+                aporte = np.where(marcada, valor_incorrecta, 0.0)
+                total -= aporte
+                puntos -= aporte
+
+    return total, por_pregunta
+
+
+def corregir_matriz(mascaras: np.ndarray, respondidas: np.ndarray, clave: np.ndarray, n_opciones: int):
+    """
+    Aplica la fórmula de penalización a todos los alumnos a la vez.
+
+    Devuelve (notas, presentados, por_pregunta). Las notas siguen la regla
+    round(max(0, total), 2) alumno a alumno; por_pregunta se reutiliza para
+    las estadísticas sin volver a recorrer las respuestas.
+    """
+    total, por_pregunta = puntuaciones_brutas(mascaras, clave, n_opciones)
+    presentados = respondidas.any(axis=1)
+    notas = [round(max(0, t), 2) for t in total.tolist()]
+    return notas, presentados.tolist(), por_pregunta
+
+
+def estadisticas_preguntas(mascaras: np.ndarray, respondidas: np.ndarray, clave: np.ndarray,
+                           por_pregunta: np.ndarray, n_opciones: int):
+    """
+    Estadísticas por pregunta y por opción a partir de la matriz codificada.
+
+    - avg_score: media de max(0, puntuación) entre quienes respondieron.
+    - total_answered: alumnos con la celda no vacía.
+    - Por opción, % de aciertos sobre todos los alumnos, donde
+      acierto = (opción correcta Y marcada) O (opción incorrecta Y NO marcada).
+    """
+    n_alumnos, n_preguntas = mascaras.shape
+    letras = LETRAS_POSIBLES[:n_opciones]
+
+    total_answered = respondidas.sum(axis=0)
+    # Suma acumulada (secuencial por filas) para reproducir el redondeo de la
+    # suma alumno a alumno; np.sum usaría suma por pares.
+    puntos = np.where(respondidas, np.maximum(por_pregunta, 0.0), 0.0)
+    total_score = np.cumsum(puntos, axis=0)[-1] if n_alumnos else np.zeros(n_preguntas)
+
+    aciertos = np.empty((len(letras), n_preguntas), dtype=np.int64)
+    for bit in range(len(letras)):
+        marcada = (mascaras & (1 << bit)) != 0
+        en_clave = (clave & (1 << bit)) != 0
+        aciertos[bit] = (marcada == en_clave).sum(axis=0)
+
+    question_stats = []
+    for i in range(n_preguntas):
+        answered = int(total_answered[i])
+        avg_score = round(float(total_score[i]) / answered, 2) if answered > 0 else 0
+
+        option_data = {}
+        for bit, opt in enumerate(letras):
+            porcentaje = round((int(aciertos[bit, i]) / n_alumnos * 100), 1) if n_alumnos > 0 else 0
+            option_data[opt] = porcentaje
+
+        question_stats.append({
+            "question": f"P{i + 1}",
+            "avg_score": avg_score,
+            "total_answered": answered,
+            **option_data  # A, B, C, D, E como claves directas
+        })
+
+    return question_stats
+
+
+def sanitizar_dnis(columna):
+    import pandas as pd
+
+    # Sanitizar DNI para evitar errores de JSON (nan)
+    return ["S/DNI" if pd.isna(dni) else str(dni) for dni in columna]
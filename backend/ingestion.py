@@ -0,0 +1,642 @@
+"""
+Lectura en streaming del Excel de examen.
+
+En lugar de cargar la hoja entera en un DataFrame y validarla después, se
+recorre con openpyxl en modo read_only fila a fila:
+
+1. Cabecera (fila 1): número de columnas.
+2. Clave (fila 2): que no esté vacía y que cada pregunta tenga opciones válidas.
+3. Alumnos (fila 3 en adelante): se codifican directamente como máscaras de
+   bits para el motor de corrección, sin DataFrame intermedio.
+
+Se revisa el archivo entero y se informa de todos los errores a la vez, con
+la celda de cada uno (ErroresValidacion), para que un archivo mal formado
+pueda arreglarse con una sola subida. Las letras de cada valor distinto se
+buscan una sola vez con una expresión regular precompilada, y las celdas con
+letras de más se localizan al final indexando la matriz de códigos.
+
+Además de Excel se admiten CSV (leído fila a fila con el módulo csv, sin
+descomprimir ni parsear XML) y Parquet/Arrow (leídos por bloques de filas con
+pyarrow). El formato se detecta por el contenido, no por la extensión, y las
+filas de cualquier formato pasan por la misma validación y codificación.
+En CSV, los números se convierten como los guardaría Excel (enteros como int,
+decimales como float), de modo que las notas son las mismas que con el Excel
+equivalente.
+
+Los valores de las celdas se interpretan igual que pandas.read_excel (motor
+openpyxl): números enteros como int, los textos NA por defecto ("", "NA",
+"N/A", ...) como vacíos, filas vacías intermedias como alumnos sin datos y
+filas vacías finales descartadas. Así las notas coinciden con las de la lectura
+con pandas.
+"""
+import csv
+import functools
+from array import array
+import io
+import logging
+import math
+import re
+import time
+import zipfile
+from dataclasses import dataclass
+
+import numpy as np
+from fastapi import HTTPException
+
+# pandas y openpyxl se importan dentro de las funciones que los usan: importar
+# este módulo (lo hace main al arrancar) no debe cargarlos
+import telemetry
+from grading import (
+    LETRAS_POSIBLES,
+    MAX_OPCIONES,
+    codificar_valor,
+    letras_reconocidas,
+    mascara_opciones,
+    parse_respuesta,
+    sanitizar_dnis,
+)
+
+logger = logging.getLogger("corrector")
+
+EXTENSIONES_ADMITIDAS = ('.xlsx', '.xls', '.csv', '.parquet', '.arrow', '.feather')
+MENSAJE_EXTENSION = "El archivo debe ser un Excel (.xlsx o .xls), un CSV o un Parquet/Arrow (.parquet, .arrow o .feather)"
+
+# Tamaño de los bloques de filas al leer Parquet/Arrow
+TAMANO_BLOQUE_ARROW = 8192
+
+_NUMERO_CSV = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_ENTERO_CSV = re.compile(r"[+-]?\d+")
+
+
+# Letras reconocidas con cada número de opciones, como una sola clase de
+# caracteres: se buscan todas en una pasada por valor distinto
+_PATRONES_LETRAS = {
+    n: re.compile(f"[{''.join(letras_reconocidas(n))}]") for n in range(1, MAX_OPCIONES + 1)
+}
+
+# Errores detallados como máximo en una respuesta (del resto, solo el número)
+MAX_ERRORES_DETALLADOS = 50
+
+
+class ErrorLecturaExcel(Exception):
+    """El archivo no se puede abrir o leer (Excel, CSV o Parquet/Arrow)."""
+
+
+# Detalle del 400 cuando el archivo no se puede leer, sea del formato que sea
+MENSAJE_ARCHIVO_ILEGIBLE = (
+    "No se pudo leer el archivo. Asegúrate de que no esté corrupto y de que su extensión corresponde a su formato."
+)
+
+
+class ErroresValidacion(HTTPException):
+    """
+    El archivo no es válido (400). errores es la lista de todos los errores
+    encontrados, cada uno {"celda": "C2" o None, "mensaje": ...}; total es el
+    número de errores si la lista se ha recortado. detail los resume en un
+    texto: con un solo error, es su mensaje tal cual.
+    """
+
+    def __init__(self, errores, total=None):
+        self.errores = errores
+        self.total = len(errores) if total is None else total
+        if len(errores) == 1 and self.total == 1:
+            detail = errores[0]["mensaje"]
+        else:
+            lineas = [f"Se han encontrado {self.total} errores en el archivo:"]
+            lineas += [
+                f"- {error['celda']}: {error['mensaje']}" if error["celda"] else f"- {error['mensaje']}"
+                for error in errores
+            ]
+            if self.total > len(errores):
+                lineas.append(f"- ... y {self.total - len(errores)} más.")
+            detail = "\n".join(lineas)
+        super().__init__(status_code=400, detail=detail)
+
+    def __reduce__(self):
+        # Para devolverla tal cual desde el pool de procesos
+        return (ErroresValidacion, (self.errores, self.total))
+
+
+@dataclass
+class ExamenLeido:
+    columnas: list            # Cabecera (fila 1)
+    clave: np.ndarray         # Máscara de la clave por pregunta
+    dnis: list                # DNI saneados ("S/DNI" si vacío)
+    mascaras: np.ndarray      # alumnos×preguntas, uint8
+    respondidas: np.ndarray   # alumnos×preguntas, bool
+
+
+@functools.cache
+def _textos_na() -> frozenset:
+    """Textos que pandas lee como NA ("", "NA", "N/A", ...)."""
+    from pandas._libs.parsers import STR_NA_VALUES
+    return frozenset(STR_NA_VALUES)
+
+
+@functools.cache
+def _textos_vacios() -> frozenset:
+    """Textos NA y códigos de error de Excel (#N/A, #DIV/0!...): celdas vacías."""
+    from openpyxl.cell.cell import ERROR_CODES
+    return _textos_na() | frozenset(ERROR_CODES)
+
+
+def _convertir_celda(valor):
+    """Valor de celda como lo deja pandas.read_excel, o None si es vacío/NA."""
+    if valor is None:
+        return None
+    tipo = type(valor)
+    if tipo is str:
+        if valor in _textos_vacios():
+            return None
+        return valor
+    if tipo is float:
+        if valor != valor:  # NaN (lectura desde DataFrame)
+            return None
+        entero = int(valor)
+        return entero if entero == valor else valor
+    return valor
+
+
+def _ancho(fila) -> int:
+    """Longitud de la fila sin las celdas vacías del final."""
+    ancho = len(fila)
+    while ancho and (fila[ancho - 1] is None or fila[ancho - 1] == ""):
+        ancho -= 1
+    return ancho
+
+
+def _filas_xlsx(contenido: bytes):
+    from openpyxl import load_workbook
+
+    # Igual que pandas.read_excel: primera hoja, sin fórmulas ni vínculos
+    wb = load_workbook(io.BytesIO(contenido), read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()
+        for fila in ws.iter_rows(values_only=True):
+            yield fila
+    finally:
+        wb.close()
+
+
+def _filas_dataframe(df):
+    import pandas as pd
+
+    yield list(df.columns)
+    for fila in df.itertuples(index=False, name=None):
+        yield tuple(None if pd.isna(v) else v for v in fila)
+
+
+def formato_archivo(contenido: bytes) -> str:
+    """"xlsx", "xls", "parquet", "arrow" o "csv", según el contenido."""
+    if zipfile.is_zipfile(io.BytesIO(contenido)):
+        return "xlsx"
+    if contenido[:4] == b"PAR1":
+        return "parquet"
+    if contenido[:6] == b"ARROW1" or contenido[:4] == b"\xff\xff\xff\xff":
+        return "arrow"
+    if contenido[:2] in (b"\xff\xfe", b"\xfe\xff"):
+        return "csv"  # Texto UTF-16 ("Texto Unicode" de Excel)
+    # Los binarios (.xls incluido) tienen bytes nulos; un CSV no
+    if b"\x00" in contenido[:8192]:
+        return "xls"
+    return "csv"
+
+
+def _valor_csv(texto: str):
+    """Campo de CSV con el tipo que tendría la celda en Excel."""
+    if texto in _textos_na():
+        return None
+    if _NUMERO_CSV.fullmatch(texto):
+        if _ENTERO_CSV.fullmatch(texto):
+            return int(texto)
+        valor = float(texto)
+        return valor if math.isfinite(valor) else texto
+    return texto
+
+
+class _ConversionesCSV(dict):
+    """Campo de CSV -> valor convertido, calculado la primera vez que aparece."""
+
+    def __missing__(self, campo):
+        valor = self[campo] = _valor_csv(campo)
+        return valor
+
+
+def _filas_csv(contenido: bytes):
+    try:
+        if contenido[:2] in (b"\xff\xfe", b"\xfe\xff"):
+            texto = contenido.decode("utf-16")
+        else:
+            texto = contenido.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Exportaciones de Excel en Windows
+        texto = contenido.decode("cp1252", errors="replace")
+
+    # Separador: el más frecuente en la cabecera (Excel en español usa ";")
+    cabecera = texto[:texto.find("\n")] if "\n" in texto else texto
+    delimitador = max(";\t,", key=cabecera.count) if any(d in cabecera for d in ";\t,") else ","
+
+    # Cada valor distinto se convierte una vez
+    convertir = _ConversionesCSV().__getitem__
+    for campos in csv.reader(io.StringIO(texto, newline=""), delimiter=delimitador):
+        yield tuple(map(convertir, campos))
+
+
+def _filas_arrow(contenido: bytes):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if contenido[:4] == b"PAR1":
+        archivo = pq.ParquetFile(io.BytesIO(contenido))
+        esquema = archivo.schema_arrow
+        bloques = archivo.iter_batches(batch_size=TAMANO_BLOQUE_ARROW)
+    else:
+        fuente = pa.BufferReader(contenido)
+        if contenido[:6] == b"ARROW1":
+            lector = pa.ipc.open_file(fuente)
+            bloques = (lector.get_batch(i) for i in range(lector.num_record_batches))
+        else:
+            lector = pa.ipc.open_stream(fuente)
+            bloques = iter(lector)
+        esquema = lector.schema
+
+    # El índice de un DataFrame guardado con pandas no es una columna del examen
+    metadatos = esquema.pandas_metadata or {}
+    indices = {col for col in metadatos.get("index_columns", []) if isinstance(col, str)}
+    columnas = [i for i, nombre in enumerate(esquema.names) if nombre not in indices]
+
+    yield tuple(esquema.names[i] for i in columnas)
+    for bloque in bloques:
+        yield from zip(*(bloque.column(i).to_pylist() for i in columnas))
+
+
+def iterar_filas(contenido: bytes):
+    """
+    Filas crudas del archivo: streaming para .xlsx, CSV y Parquet/Arrow,
+    pandas para .xls.
+    """
+    formato = formato_archivo(contenido)
+    if formato == "xlsx":
+        return _filas_xlsx(contenido)
+    if formato == "csv":
+        return _filas_csv(contenido)
+    if formato in ("parquet", "arrow"):
+        return _filas_arrow(contenido)
+    import pandas as pd
+
+    return _filas_dataframe(pd.read_excel(io.BytesIO(contenido)))
+
+
+def leer_tabla(contenido: bytes, hoja=0):
+    """
+    El archivo como DataFrame, igual que pandas.read_excel (para la hoja
+    ORIGINAL del Excel corregido). Para CSV y Parquet/Arrow se construye con
+    el mismo TextParser que usa read_excel sobre las filas de la hoja.
+    """
+    import pandas as pd
+    from pandas.io.parsers import TextParser
+
+    if formato_archivo(contenido) in ("xlsx", "xls"):
+        return pd.read_excel(io.BytesIO(contenido), sheet_name=hoja)
+
+    datos = []
+    for fila in iterar_filas(contenido):
+        fila = ["" if valor is None or valor != valor else valor for valor in fila]
+        while fila and fila[-1] == "":
+            fila.pop()
+        datos.append(fila)
+    while datos and not datos[-1]:
+        datos.pop()
+    ancho = max((len(fila) for fila in datos), default=0)
+    datos = [fila + [""] * (ancho - len(fila)) for fila in datos]
+    return TextParser(datos, header=0, skip_blank_lines=False).read()
+
+
+def leer_examen(contenido: bytes, n_preguntas: int, n_opciones: int, progreso=None) -> ExamenLeido:
+    """
+    Lee, valida y codifica el examen en una sola pasada.
+
+    Lanza ErroresValidacion (400) con todos los errores encontrados, y
+    ErrorLecturaExcel si el archivo no se puede leer.
+    progreso(etapa) se llama con "validate" al terminar de leer las filas.
+    """
+    try:
+        return _leer_examen(iterar_filas(contenido), n_preguntas, n_opciones, progreso)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise ErrorLecturaExcel(str(e)) from e
+
+
+def _hojas_xlsx(contenido: bytes, hojas):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(contenido), read_only=True, data_only=True, keep_links=False)
+    try:
+        nombres = wb.sheetnames if hojas is None else hojas
+        _comprobar_hojas(nombres, wb.sheetnames)
+        for nombre in nombres:
+            ws = wb[nombre]
+            ws.reset_dimensions()
+            yield nombre, ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _hojas_dataframe(contenido: bytes, hojas):
+    import pandas as pd
+
+    excel = pd.ExcelFile(io.BytesIO(contenido))
+    nombres = excel.sheet_names if hojas is None else hojas
+    _comprobar_hojas(nombres, excel.sheet_names)
+    for nombre in nombres:
+        yield nombre, _filas_dataframe(excel.parse(nombre))
+
+
+def _comprobar_hojas(nombres, existentes):
+    faltan = [nombre for nombre in nombres if nombre not in existentes]
+    if faltan:
+        logger.error(f"Hojas inexistentes: {faltan}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"El Excel no tiene las hojas {', '.join(faltan)}. Hojas disponibles: {', '.join(existentes)}."
+        )
+
+
+def leer_examenes(contenido: bytes, configuracion, hojas=None):
+    """
+    Lee varias hojas del mismo libro (una por grupo o versión del examen)
+    abriendo el archivo una sola vez.
+
+    configuracion(hoja) devuelve (n_preguntas, n_opciones) de cada hoja; hojas
+    es la lista de hojas a leer (por defecto, todas). Devuelve una lista de
+    (hoja, resultado), donde resultado es el ExamenLeido o la HTTPException
+    con el error de esa hoja: un grupo mal formado no impide corregir el resto.
+
+    Lanza HTTPException(400) si falta alguna hoja de la lista y
+    ErrorLecturaExcel si el archivo no se puede leer.
+    """
+    formato = formato_archivo(contenido)
+    if formato not in ("xlsx", "xls"):
+        raise HTTPException(status_code=400, detail="Solo los archivos Excel tienen varias hojas")
+    if formato == "xlsx":
+        recorrido = _hojas_xlsx(contenido, hojas)
+    else:
+        recorrido = _hojas_dataframe(contenido, hojas)
+
+    resultados = []
+    try:
+        for hoja, filas in recorrido:
+            n_preguntas, n_opciones = configuracion(hoja)
+            try:
+                resultados.append((hoja, _leer_examen(iter(filas), n_preguntas, n_opciones)))
+            except HTTPException as e:
+                resultados.append((hoja, e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise ErrorLecturaExcel(str(e)) from e
+    return resultados
+
+
+def _error(mensaje: str, celda=None) -> dict:
+    return {"celda": celda, "mensaje": mensaje}
+
+
+def _celda(fila: int, pregunta: int) -> str:
+    """Coordenada de la celda de la pregunta (1 = columna B) en la fila dada."""
+    from openpyxl.utils import get_column_letter
+
+    return f"{get_column_letter(pregunta + 1)}{fila}"
+
+
+def _lanzar_errores(errores, omitidos: int = 0):
+    total = len(errores) + omitidos
+    logger.error(f"Archivo no válido: {total} errores de validación")
+    if total > MAX_ERRORES_DETALLADOS:
+        errores = errores[:MAX_ERRORES_DETALLADOS]
+    raise ErroresValidacion(errores, total)
+
+
+def _error_vacio():
+    logger.error("El archivo Excel está vacío")
+    raise ErroresValidacion([_error("El archivo Excel está vacío. Sube un archivo con datos.")])
+
+
+def _error_columnas(n_columnas: int, n_preguntas: int) -> dict:
+    logger.error(f"Número de columnas incorrecto: {n_columnas}")
+    return _error(f"El Excel debe tener exactamente {n_preguntas + 1} columnas (1 para DNI y {n_preguntas} para preguntas). Se detectaron {n_columnas}.")
+
+
+def _error_sin_clave(pregunta: int) -> dict:
+    return _error(
+        f"La pregunta P{pregunta} en la CLAVE (fila 2) no tiene ninguna respuesta seleccionada.",
+        _celda(2, pregunta),
+    )
+
+
+def _comprobar_letras(letra_mas_alta: int, n_opciones: int) -> list:
+    """Errores si la letra más alta usada (1 = A, 0 = ninguna) no cuadra con n_opciones."""
+    if not letra_mas_alta:
+        return []
+
+    max_letra_detectada = LETRAS_POSIBLES[letra_mas_alta - 1]
+
+    if letra_mas_alta > n_opciones:
+        logger.error(f"Mismatch opciones: detectada {max_letra_detectada} pero configuradas {n_opciones}")
+        return [_error(f"Has configurado el examen con {n_opciones} opciones, pero he detectado respuestas con la letra '{max_letra_detectada}'. Por favor, selecciona {letra_mas_alta} opciones en el menú desplegable.")]
+
+    if letra_mas_alta < n_opciones:
+        logger.error(f"Mismatch opciones: detectada max {max_letra_detectada} pero configuradas {n_opciones}")
+        return [_error(f"Parece que el examen es de {letra_mas_alta} opciones (la letra más alta es '{max_letra_detectada}'), pero has seleccionado {n_opciones}. Esto causaría errores en el cálculo de la penalización. Por favor, corrígelo.")]
+
+    return []
+
+
+def _letra_mas_alta(valor, patron) -> int:
+    """Posición (1 = A) de la letra reconocida más alta de la celda, o 0 si no hay."""
+    encontradas = patron.findall(str(valor).upper())
+    return LETRAS_POSIBLES.index(max(encontradas)) + 1 if encontradas else 0
+
+
+def _leer_examen(filas, n_preguntas: int, n_opciones: int, progreso=None) -> ExamenLeido:
+    inicio = time.perf_counter()
+    opciones_actuales = set(LETRAS_POSIBLES[:n_opciones])
+    patron_letras = _PATRONES_LETRAS[n_opciones]
+    # Se revisa el archivo entero y se informa de todos los errores a la vez;
+    # solo un archivo vacío o sin clave se rechaza en cuanto se detecta
+    errores = []
+
+    # ===== CABECERA =====
+    cabecera = next(filas, None)
+    if cabecera is None:
+        _error_vacio()
+    ancho_cabecera = _ancho(cabecera)
+
+    # ===== CLAVE (fila 2) =====
+    fila_clave = next(filas, None)
+    if fila_clave is None:
+        _error_vacio()
+    ancho_clave = _ancho(fila_clave)
+    if ancho_clave == 0:
+        # Una fila 2 vacía seguida solo de filas vacías es un archivo vacío
+        if all(_ancho(fila) == 0 for fila in filas):
+            _error_vacio()
+
+    clave_valores = [_convertir_celda(v) for v in fila_clave[:ancho_clave]]
+    if all(v is None for v in clave_valores):
+        logger.error("Fila 2 vacía")
+        raise ErroresValidacion([_error("La fila 2 (clave de respuestas) está totalmente vacía. No puedo corregir sin soluciones.")])
+    clave_valores += [None] * (n_preguntas + 1 - len(clave_valores))
+
+    clave = np.zeros(n_preguntas, dtype=np.uint8)
+    letra_mas_alta = 0
+    # Preguntas sin clave en columnas que aún no existen: si ninguna fila
+    # completa la tabla, el error real es el número de columnas
+    sin_clave_fuera_de_tabla = []
+    for i in range(n_preguntas):
+        valor = clave_valores[i + 1]
+        clave_set = parse_respuesta(valor) if valor is not None else set()
+
+        if not clave_set:
+            if i + 1 >= max(ancho_cabecera, ancho_clave):
+                sin_clave_fuera_de_tabla.append(i + 1)
+            else:
+                errores.append(_error_sin_clave(i + 1))
+            continue
+
+        letra_mas_alta = max(letra_mas_alta, _letra_mas_alta(valor, patron_letras))
+        if not clave_set.issubset(opciones_actuales):
+            opciones_invalidas = clave_set - opciones_actuales
+            errores.append(_error(
+                f"En la P{i+1} de la CLAVE (fila 2) has puesto '{','.join(opciones_invalidas)}', pero has configurado el examen para tener solo {n_opciones} opciones.",
+                _celda(2, i + 1),
+            ))
+            continue
+
+        clave[i] = mascara_opciones(clave_set, n_opciones)
+
+    # ===== ALUMNOS (fila 3 en adelante) =====
+    # Cada valor distinto se codifica y se escanea en busca de letras una vez
+    # y recibe un índice; por celda solo se guarda ese índice. Las máscaras se
+    # obtienen al final indexando la tabla de códigos con NumPy.
+    # Celda vacía = índice 0.
+    tabla_codigos = [(0, False)]
+    # Por código: valor convertido y letra más alta, para señalar las celdas
+    # con letras de más sin volver a recorrer el archivo
+    valores_codigos = [None]
+    letras_codigos = [0]
+    # Por (tipo, valor) convertido: 1 y True valen igual como clave de dict,
+    # pero no como respuesta ("1" frente a "True")
+    indice_convertido = {}
+    # Atajo por valor crudo, solo para texto (casi todas las celdas) y vacías
+    indice_crudo = {None: 0}
+    indices = array("i")
+    dnis_crudos = [clave_valores[0]]
+    fila_vacia = array("i", bytes(4 * n_preguntas))
+    filas_vacias_pendientes = 0
+    max_ancho = max(ancho_cabecera, ancho_clave)
+
+    def indice_de(crudo):
+        valor = _convertir_celda(crudo)
+        if valor is None:
+            indice = 0
+        else:
+            clave_cache = (type(valor), valor)
+            indice = indice_convertido.get(clave_cache)
+            if indice is None:
+                indice = indice_convertido[clave_cache] = len(tabla_codigos)
+                tabla_codigos.append(codificar_valor(valor, n_opciones))
+                valores_codigos.append(valor)
+                letras_codigos.append(_letra_mas_alta(valor, patron_letras))
+        if type(crudo) is str:
+            indice_crudo[crudo] = indice
+        return indice
+
+    for fila in filas:
+        ancho = _ancho(fila)
+        if ancho == 0:
+            # Las filas vacías solo cuentan como alumnos si hay datos después
+            filas_vacias_pendientes += 1
+            continue
+        for _ in range(filas_vacias_pendientes):
+            dnis_crudos.append(None)
+            indices.extend(fila_vacia)
+        filas_vacias_pendientes = 0
+        max_ancho = max(max_ancho, ancho)
+
+        dnis_crudos.append(_convertir_celda(fila[0]))
+        celdas = fila[1:n_preguntas + 1]
+        indices_fila = list(map(indice_crudo.get, celdas))
+        if None in indices_fila:
+            # Valores nuevos o que no son texto
+            indices_fila = [
+                indice if indice is not None else indice_de(crudo)
+                for indice, crudo in zip(indices_fila, celdas)
+            ]
+        indices.extend(indices_fila)
+        if len(celdas) < n_preguntas:
+            indices.extend(fila_vacia[:n_preguntas - len(celdas)])
+
+    # parse: lectura y codificación de las filas; validate: el resto
+    fin_lectura = time.perf_counter()
+    telemetry.observar("stage_seconds", fin_lectura - inicio, "parse")
+    if progreso is not None:
+        progreso("validate")
+
+    errores.extend(_error_sin_clave(pregunta) for pregunta in sin_clave_fuera_de_tabla if pregunta < max_ancho)
+
+    # Los errores de todo el archivo van delante de los de cada celda
+    n_alumnos = len(dnis_crudos) - 1
+    indices = np.frombuffer(indices, dtype=np.int32).reshape(n_alumnos, n_preguntas)
+    letras_codigos = np.array(letras_codigos, dtype=np.uint8)
+    letra_mas_alta = max(letra_mas_alta, int(letras_codigos.max()))
+    generales = _comprobar_letras(letra_mas_alta, n_opciones)
+    if max_ancho != n_preguntas + 1:
+        generales.insert(0, _error_columnas(max_ancho, n_preguntas))
+    errores = generales + errores
+
+    # Celdas de alumnos con letras de más, localizadas con un solo índice;
+    # solo se detallan las primeras, del resto se cuenta cuántas son
+    omitidos = 0
+    if letra_mas_alta > n_opciones:
+        filas_malas, columnas_malas = np.nonzero((letras_codigos > n_opciones)[indices])
+        omitidos = max(0, len(filas_malas) - MAX_ERRORES_DETALLADOS)
+        for fila, columna in zip(filas_malas[:MAX_ERRORES_DETALLADOS], columnas_malas[:MAX_ERRORES_DETALLADOS]):
+            valor = valores_codigos[indices[fila, columna]]
+            errores.append(_error(
+                f"La respuesta '{valor}' usa letras de más para un examen de {n_opciones} opciones.",
+                _celda(int(fila) + 3, int(columna) + 1),
+            ))
+
+    if n_alumnos == 0:
+        logger.error("No hay alumnos")
+        errores.append(_error("No hay datos de alumnos. Asegúrate de listarlos a partir de la fila 3."))
+    elif all(dni is None for dni in dnis_crudos[1:]):
+        logger.error("Columna DNI totalmente vacía")
+        errores.append(_error("La columna de DNI está vacía. No puedo identificar a los alumnos."))
+
+    if errores:
+        _lanzar_errores(errores, omitidos)
+
+    from pandas.io.parsers import TextParser
+
+    # El tipo de la columna DNI (texto, entero o decimal si hay huecos) se
+    # infiere como en pandas para que el DNI mostrado sea el mismo.
+    # La segunda columna evita que las filas vacías se descarten.
+    columna_dni = TextParser(
+        [["DNI", "_"]] + [["" if dni is None else dni, ""] for dni in dnis_crudos], header=0
+    ).read().iloc[:, 0]
+    dnis = sanitizar_dnis(columna_dni.iloc[1:])
+
+    codigos = np.array(tabla_codigos, dtype=np.uint8)
+    examen = ExamenLeido(
+        columnas=list(cabecera[:ancho_cabecera]),
+        clave=clave,
+        dnis=dnis,
+        mascaras=codigos[:, 0][indices],
+        respondidas=codigos[:, 1][indices].astype(bool),
+    )
+    telemetry.observar("stage_seconds", time.perf_counter() - fin_lectura, "validate")
+    return examen
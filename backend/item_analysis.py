@@ -0,0 +1,124 @@
+"""
+Análisis psicométrico de los ítems (preguntas) de un examen.
+
+Se calcula de una vez sobre la matriz alumnos×preguntas ya corregida
+(máscaras y puntuación de cada pregunta), sin recorrer alumnos ni preguntas:
+
+- difficulty: índice de dificultad, proporción de alumnos que aciertan la
+  pregunta entera (marcan exactamente las opciones de la clave).
+- discrimination: índice de discriminación, proporción de aciertos del 27 %
+  con mejor puntuación total menos la del 27 % con peor puntuación.
+- point_biserial: correlación biserial puntual entre acertar la pregunta y la
+  puntuación del resto del examen (sin esa pregunta, para no inflarla).
+- distractors: por cada opción incorrecta, % de alumnos que la marcan y su
+  discriminación (lo normal es que sea negativa: la marcan más los del grupo
+  inferior).
+- alfa_cronbach (sobre la puntuación de cada pregunta, con penalizaciones) y
+  kr20 (sobre acierto/fallo): fiabilidad del examen entero.
+
+Solo cuentan los presentados: quien no respondió nada no aporta información
+sobre las preguntas. Los índices que no se pueden calcular (menos de dos
+alumnos o preguntas, o varianza nula) quedan a None.
+"""
+import numpy as np
+
+from grading import LETRAS_POSIBLES
+
+# Proporción de alumnos de los grupos superior e inferior (Kelley)
+PROPORCION_GRUPOS = 0.27
+
+
+def _redondear(valores, decimales: int):
+    # + 0.0 convierte -0.0 en 0.0
+    return [None if np.isnan(valor) else round(valor, decimales) + 0.0 for valor in valores]
+
+
+def _dividir(numerador, denominador):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominador > 0, numerador / np.where(denominador > 0, denominador, 1), np.nan)
+
+
+def _fiabilidad(puntos: np.ndarray) -> float:
+    """k/(k-1) · (1 - Σ varianza de cada pregunta / varianza del total)."""
+    n_alumnos, n_preguntas = puntos.shape
+    if n_alumnos < 2 or n_preguntas < 2:
+        return np.nan
+    varianza_total = puntos.sum(axis=1).var()
+    if varianza_total <= 0:
+        return np.nan
+    return float(n_preguntas / (n_preguntas - 1) * (1 - puntos.var(axis=0).sum() / varianza_total))
+
+
+def analisis_items(mascaras: np.ndarray, respondidas: np.ndarray, clave: np.ndarray,
+                   por_pregunta: np.ndarray, n_opciones: int):
+    """
+    Devuelve (items, fiabilidad):
+    - items: una lista con difficulty, discrimination, point_biserial y
+      distractors de cada pregunta, en el orden de question_data.
+    - fiabilidad: {"alfa_cronbach", "kr20"} del examen.
+    """
+    todas = (1 << n_opciones) - 1
+    clave = np.asarray(clave, dtype=np.uint8) & todas
+    presentados = respondidas.any(axis=1)
+    mascaras = mascaras[presentados]
+    puntos = por_pregunta[presentados]
+    n_alumnos, n_preguntas = mascaras.shape
+
+    aciertos = (mascaras == clave).astype(np.float64)
+    totales = puntos.sum(axis=1)
+
+    # Grupos superior e inferior por puntuación total
+    n_grupo = max(1, int(round(n_alumnos * PROPORCION_GRUPOS))) if n_alumnos >= 2 else 0
+    orden = np.argsort(totales, kind="stable")
+    inferior, superior = orden[:n_grupo], orden[n_alumnos - n_grupo:]
+
+    def discriminacion(matriz):
+        if not n_grupo:
+            return np.full(n_preguntas, np.nan)
+        return matriz[superior].mean(axis=0) - matriz[inferior].mean(axis=0)
+
+    difficulty = aciertos.mean(axis=0) if n_alumnos else np.full(n_preguntas, np.nan)
+    discrimination = discriminacion(aciertos)
+
+    # Correlación de Pearson, columna a columna, entre acierto y resto del examen
+    resto = totales[:, None] - puntos
+    aciertos_c = aciertos - aciertos.mean(axis=0) if n_alumnos else aciertos
+    resto_c = resto - resto.mean(axis=0) if n_alumnos else resto
+    point_biserial = _dividir(
+        (aciertos_c * resto_c).sum(axis=0),
+        np.sqrt((aciertos_c ** 2).sum(axis=0) * (resto_c ** 2).sum(axis=0)),
+    )
+
+    # Marcas de cada opción: % de alumnos y discriminación, todas las preguntas a la vez
+    porcentaje_opcion = np.empty((n_opciones, n_preguntas))
+    discriminacion_opcion = np.empty((n_opciones, n_preguntas))
+    for bit in range(n_opciones):
+        marcada = ((mascaras & (1 << bit)) != 0).astype(np.float64)
+        porcentaje_opcion[bit] = marcada.mean(axis=0) * 100 if n_alumnos else np.nan
+        discriminacion_opcion[bit] = discriminacion(marcada)
+
+    difficulty = _redondear(difficulty.tolist(), 3)
+    discrimination = _redondear(discrimination.tolist(), 3)
+    point_biserial = _redondear(point_biserial.tolist(), 3)
+    porcentaje_opcion = [_redondear(fila, 1) for fila in porcentaje_opcion.tolist()]
+    discriminacion_opcion = [_redondear(fila, 3) for fila in discriminacion_opcion.tolist()]
+    clave = clave.tolist()
+
+    items = []
+    for i in range(n_preguntas):
+        items.append({
+            "difficulty": difficulty[i],
+            "discrimination": discrimination[i],
+            "point_biserial": point_biserial[i],
+            "distractors": {
+                letra: {"pct_selected": porcentaje_opcion[bit][i], "discrimination": discriminacion_opcion[bit][i]}
+                for bit, letra in enumerate(LETRAS_POSIBLES[:n_opciones])
+                if not clave[i] & (1 << bit)
+            },
+        })
+
+    fiabilidad = {
+        "alfa_cronbach": _redondear([_fiabilidad(puntos)], 3)[0],
+        "kr20": _redondear([_fiabilidad(aciertos)], 3)[0],
+    }
+    return items, fiabilidad
@@ -0,0 +1,31 @@
+"""
+Configuración de los logs del backend: consola y logs/corrector_backend.log.
+
+No se hace al importar main, sino al arrancar la aplicación (y en cada
+proceso del pool en modo "process"), para que importar el módulo no cree
+directorios ni abra archivos.
+"""
+import logging
+import os
+
+LOG_DIR = "logs"
+LOG_FILE = os.path.join(LOG_DIR, "corrector_backend.log")
+
+_configurado = False
+
+
+def configurar_logs():
+    """Configura los logs una sola vez por proceso."""
+    global _configurado
+    if _configurado:
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(LOG_FILE)
+        ]
+    )
+    _configurado = True
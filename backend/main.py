@@ -1,74 +1,218 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import Depends, FastAPI, UploadFile, File, Form, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-import pandas as pd
+from fastapi.responses import JSONResponse, Response
 import io
 import logging
-from openpyxl import load_workbook
-from openpyxl.chart import BarChart, Reference
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg') # Usar backend no interactivo
 import os
 import uuid
 from pathlib import Path
 import json
 import time
+import hashlib
+import hmac
+import tempfile
+import zipfile
+import zlib
+import orjson
+import asyncio
+from datetime import datetime
+
+from grading import (
+    LETRAS_POSIBLES,
+    MAX_OPCIONES,
+    OPCIONES_CLASICAS,
+    corregir_matriz,
+    estadisticas_preguntas,
+    letras_reconocidas,
+)
+from analytics import AnalyticsIndex
+from item_analysis import analisis_items
+from logging_config import configurar_logs
+from ingestion import (
+    EXTENSIONES_ADMITIDAS,
+    MENSAJE_ARCHIVO_ILEGIBLE,
+    MENSAJE_EXTENSION,
+    ErrorLecturaExcel,
+    ErroresValidacion,
+    leer_examen,
+    leer_examenes,
+    leer_tabla,
+)
+from session_cache import SessionCache
+from session_gc import SessionSweeper
+from storage import crear_storage
+from session_store import (
+    cargar_metrics, cargar_notas, firma_resultados, guardar_resultados,
+    metrics_json, preview_json, tiene_resultados,
+)
+from result_cache import ResultCache, clave_contenido
+import telemetry
+from transferencias import LimiteSubidas, coincide_etag, respuesta_archivo, respuesta_bytes
+from uploads import UPLOAD_TOKEN_TTL_SECONDS, cargar_subida, guardar_subida, leer_meta
+from workers import comprobar_capacidad, run_in_worker, shutdown_workers, start_in_worker, workers_status
 
 ENV = os.getenv("ENV", "dev")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 ROOT_PATH = os.getenv("ROOT_PATH", "")
 
+# Tamaño máximo de examen admitido
+MAX_PREGUNTAS = int(os.getenv("MAX_PREGUNTAS", "500"))
 
 SESSIONS_DIR = Path("sessions")
-SESSIONS_DIR.mkdir(exist_ok=True)
-SESSION_MAX_AGE_SECONDS = 60 * 60 * 24 * 365  # 1 año
-
-# Configuración de logs
-if not os.path.exists("logs"):
-    os.makedirs("logs")
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("logs/corrector_backend.log")
-    ]
-)
+# Dónde se guardan los archivos de sesión: local, object u object-local (ver storage.py)
+SESSION_STORAGE = os.getenv("SESSION_STORAGE", "local")
+storage = crear_storage(SESSION_STORAGE, SESSIONS_DIR)
+# Retención de sesiones y limpieza periódica en segundo plano (ver session_gc.py)
+SESSION_MAX_AGE_SECONDS = int(os.getenv("SESSION_MAX_AGE_SECONDS", str(60 * 60 * 24 * 365)))  # 1 año
+SESSION_GC_INTERVAL_SECONDS = int(os.getenv("SESSION_GC_INTERVAL_SECONDS", "60"))
+SESSION_GC_BATCH_SIZE = int(os.getenv("SESSION_GC_BATCH_SIZE", "500"))
+
+# Tamaño máximo del cuerpo de una subida: se rechaza con 413 según llegan los
+# bytes, sin guardarla antes en memoria ni en disco (0 = sin límite)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+# Corrección por lotes (/corregir-lote)
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "50"))
+BATCH_MAX_UNZIPPED_BYTES = int(os.getenv("BATCH_MAX_UNZIPPED_BYTES", str(200 * 1024 * 1024)))
+
+# Filas de la tabla de notas por página del PDF (0 = una sola tabla)
+PDF_TABLE_ROWS_PER_PAGE = int(os.getenv("PDF_TABLE_ROWS_PER_PAGE", "30"))
+
+# Caché de resultados por contenido del archivo (ver result_cache.py)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000"))
+RESULT_CACHE_MAX_AGE_SECONDS = int(os.getenv("RESULT_CACHE_MAX_AGE_SECONDS", str(60 * 60 * 24 * 7)))
+result_cache = ResultCache(storage, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_AGE_SECONDS)
+
+# Índice analítico de todas las correcciones (ver analytics.py). Desactivado
+# salvo que se configure ANALYTICS_API_KEY: las rutas /analytics/* piden esa
+# clave (Authorization: Bearer ...). ANALYTICS_DNI_KEY es la clave con la que
+# se guardan los DNI como HMAC; si cambia, las notas ya guardadas dejan de
+# encontrarse por DNI.
+ANALYTICS_DB = os.getenv("ANALYTICS_DB", "analytics/index.sqlite3")
+ANALYTICS_API_KEY = os.getenv("ANALYTICS_API_KEY", "")
+ANALYTICS_DNI_KEY = os.getenv("ANALYTICS_DNI_KEY", "")
+analytics_index = None
+if ANALYTICS_API_KEY and ANALYTICS_DB:
+    if not ANALYTICS_DNI_KEY:
+        raise RuntimeError("ANALYTICS_API_KEY necesita ANALYTICS_DNI_KEY (clave para guardar los DNI cifrados)")
+    analytics_index = AnalyticsIndex(Path(ANALYTICS_DB), ANALYTICS_DNI_KEY)
+
+# Caché en memoria de las sesiones recientes (ver session_cache.py)
+SESSION_CACHE_MAX_BYTES = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSION_CACHE_TTL_SECONDS = int(os.getenv("SESSION_CACHE_TTL_SECONDS", str(60 * 60)))
+SESSION_CACHE_MAX_BLOB_BYTES = int(os.getenv("SESSION_CACHE_MAX_BLOB_BYTES", str(1024 * 1024)))
+session_cache = SessionCache(SESSION_CACHE_MAX_BYTES, SESSION_CACHE_TTL_SECONDS, SESSION_CACHE_MAX_BLOB_BYTES)
+
+# Precargar en segundo plano, al arrancar, las librerías de informes (pandas,
+# openpyxl, reportlab, matplotlib). Importar main no las carga: así /health
+# responde antes tras un arranque en frío. Con 0 se cargan en el primer uso.
+PREWARM_ON_STARTUP = os.getenv("PREWARM_ON_STARTUP", "1") not in ("0", "false", "False")
+
+# Los logs se configuran al arrancar la aplicación (ver logging_config.py)
 logger = logging.getLogger("corrector")
 
-def cleanup_old_sessions():
-    now = time.time()
-    removed = 0
 
-    for session_dir in SESSIONS_DIR.iterdir():
-        if not session_dir.is_dir():
-            continue
 
+def sesion_borrada(session_id: str):
+    """Al caducar una sesión: fuera de la caché y sus notas fuera del índice analítico."""
+    session_cache.invalidate(session_id)
+    if analytics_index is not None:
         try:
-            # Usamos la fecha de creación/modificación del directorio
-            last_modified = session_dir.stat().st_mtime
-            age = now - last_modified
-
-            if age > SESSION_MAX_AGE_SECONDS:
-                for file in session_dir.iterdir():
-                    file.unlink()
-                session_dir.rmdir()
-                removed += 1
-        except Exception as e:
-            logger.warning(f"No se pudo limpiar la sesión {session_dir.name}: {e}")
+            analytics_index.olvidar_sesion(session_id)
+        except Exception:
+            logger.exception(f"No se pudieron borrar del índice analítico las notas de {session_id}")
 
-    if removed > 0:
-        logger.info(f"Limpieza de sesiones antiguas: {removed} sesiones eliminadas")
+
+session_sweeper = SessionSweeper(
+    storage, SESSION_MAX_AGE_SECONDS, SESSION_GC_BATCH_SIZE, on_removed=sesion_borrada
+)
 
 app = FastAPI(root_path=ROOT_PATH)
 
-cleanup_old_sessions()
+
+@app.exception_handler(ErroresValidacion)
+async def errores_validacion(request: Request, exc: ErroresValidacion):
+    # detail resume los errores en texto; errores los da uno a uno con su celda
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail, "errores": exc.errores, "total_errores": exc.total},
+    )
+
+
+async def limpiar_sesiones_periodicamente():
+    while True:
+        try:
+            examinadas = await asyncio.to_thread(session_sweeper.tick)
+        except Exception:
+            logger.exception("Error en la limpieza de sesiones")
+            examinadas = 0
+        # Lote completo: probablemente queda trabajo, se sigue enseguida
+        espera = 1 if examinadas >= SESSION_GC_BATCH_SIZE else SESSION_GC_INTERVAL_SECONDS
+        await asyncio.sleep(espera)
+
+
+def precargar_lectura():
+    import pandas  # noqa: F401
+    import openpyxl.chart  # noqa: F401
+
+
+def precargar_pdf():
+    import reportlab.platypus  # noqa: F401
+    from charts import precalentar_graficos
+
+    # Carga fuentes y plantillas de matplotlib antes del primer informe
+    precalentar_graficos()
+
+
+# Primero lo que usa cualquier corrección (lectura y Excel); luego el PDF
+PASOS_PRECARGA = [precargar_lectura, precargar_pdf]
+
+
+async def precalentar_dependencias():
+    """
+    Carga en el pool, paso a paso, las librerías que importar main no carga.
+    Cada paso espera a que el pool esté libre, para no quitar CPU a las
+    peticiones que lleguen mientras el contenedor arranca.
+    """
+    for paso in PASOS_PRECARGA:
+        while workers_status()["active_jobs"] > 0:
+            await asyncio.sleep(0.1)
+        try:
+            with telemetry.span("prewarm"):
+                await run_in_worker(paso)
+        except Exception:
+            logger.exception("Error en la precarga de librerías")
+            return
+
+
+_tareas_de_fondo = set()
+
+
+@app.on_event("startup")
+async def configurar_logs_al_arrancar():
+    configurar_logs()
+
+
+@app.on_event("startup")
+async def precalentar_pool():
+    if PREWARM_ON_STARTUP:
+        tarea = asyncio.get_running_loop().create_task(precalentar_dependencias())
+        _tareas_de_fondo.add(tarea)
+
+
+@app.on_event("startup")
+async def iniciar_limpieza_sesiones():
+    tarea = asyncio.get_running_loop().create_task(limpiar_sesiones_periodicamente())
+    _tareas_de_fondo.add(tarea)
+
+
+@app.on_event("shutdown")
+def cerrar_pool_trabajadores():
+    for tarea in _tareas_de_fondo:
+        tarea.cancel()
+    shutdown_workers()
+
+app.add_middleware(LimiteSubidas, max_bytes=MAX_UPLOAD_BYTES)
 
 app.add_middleware(
     CORSMiddleware,
@@ -81,10 +225,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 
-OPCIONES_TOTALES = {"A", "B", "C", "D", "E"}
+@app.middleware("http")
+async def perfil_peticion(request: Request, call_next):
+    """
+    Perfil opcional por petición: con la cabecera X-Profile: 1 la respuesta
+    lleva en Server-Timing la duración de cada etapa (ms) y el total.
+    """
+    if request.headers.get("x-profile", "").lower() not in ("1", "true", "yes"):
+        return await call_next(request)
+
+    inicio = time.perf_counter()
+    with telemetry.perfilar() as etapas:
+        response = await call_next(request)
+    desglose = telemetry.server_timing(etapas, time.perf_counter() - inicio)
+    response.headers["Server-Timing"] = desglose
+    logger.info(f"Perfil de {request.method} {request.url.path}: {desglose}")
+    return response
+
+
+def validar_configuracion(n_opciones: int, n_preguntas: int, prefijo: str = ""):
+    """Comprueba n_opciones y n_preguntas; prefijo identifica el grupo en un lote."""
+    if not (5 <= n_preguntas <= MAX_PREGUNTAS):
+        raise HTTPException(status_code=400, detail=f"{prefijo}El número de preguntas debe estar entre 5 y {MAX_PREGUNTAS}")
+    if not (2 <= n_opciones <= MAX_OPCIONES):
+        raise HTTPException(status_code=400, detail=f"{prefijo}El número de opciones debe estar entre 2 y {MAX_OPCIONES}")
+
 
 def calculate_metrics_logic(preview_list):
     if not preview_list:
@@ -121,358 +290,894 @@ def calculate_metrics_logic(preview_list):
     }
 
 
-def parse_respuesta(valor):
-    if pd.isna(valor) or str(valor).strip() == "":
-        return set()
-    return set(v.strip().upper() for v in str(valor).split(","))
+ETAPAS_CORRECCION = ["parse", "validate", "grade", "stats", "save"]
+
+
+def escribir_estado(sesion, status: str, stage=None, detail=None, status_code=None, errores=None):
+    """
+    Guarda el estado de la corrección en status.json dentro de la sesión.
+    status: queued | running | done | error. stage: etapa en curso.
+    errores: lista de errores de validación con su celda, si los hay.
+    """
+    if status == "done":
+        completadas = list(ETAPAS_CORRECCION)
+    elif stage in ETAPAS_CORRECCION:
+        completadas = ETAPAS_CORRECCION[:ETAPAS_CORRECCION.index(stage)]
+    else:
+        completadas = []
+
+    estado = {
+        "status": status,
+        "stage": stage,
+        "stages": ETAPAS_CORRECCION,
+        "stages_completed": completadas,
+        "progress": round(len(completadas) / len(ETAPAS_CORRECCION) * 100),
+        "updated_at": time.time(),
+    }
+    if detail is not None:
+        estado["detail"] = detail
+        estado["status_code"] = status_code
+    if errores is not None:
+        estado["errores"] = errores
+
+    # Escritura atómica: /status puede estar leyendo el fichero a la vez
+    sesion.escribir("status.json", json.dumps(estado, ensure_ascii=False).encode("utf-8"))
+
+
+def nueva_sesion(session_id: str, status=None):
+    """
+    Crea la sesión y la añade al índice de caducidad; con status, escribe
+    también su estado. Bloqueante: desde un endpoint, en un hilo.
+    """
+    sesion = storage.crear_sesion(session_id)
+    session_sweeper.registrar(session_id)
+    if status is not None:
+        escribir_estado(sesion, status)
+    return sesion
+
 
+def construir_excel(df_original, df_alumnos, notas, metrics, question_stats) -> bytes:
+    """Genera el Excel corregido (ORIGINAL, CORREGIDO y MÉTRICAS con gráficos)."""
+    import pandas as pd
+
+    output = io.BytesIO()
+    with telemetry.span("excel"), pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df_original.to_excel(writer, sheet_name="ORIGINAL", index=False)
+        escribir_hojas_resultado(writer, df_alumnos, notas, metrics, question_stats)
 
+    return output.getvalue()
 
 
-def validate_excel_logic(df: pd.DataFrame, n_preguntas: int, n_opciones: int):
+def construir_excel_grupos(grupos) -> bytes:
     """
-    Función centralizada para validar un DataFrame de examen.
-    Lanza HTTPException(400) si encuentra cualquier error.
+    Excel corregido de varios grupos: una hoja CORREGIDO y otra MÉTRICAS por
+    grupo. grupos es una lista de (nombre, df_alumnos, notas, metrics).
     """
-    if df.empty:
-        logger.error("El archivo Excel está vacío")
-        raise HTTPException(status_code=400, detail="El archivo Excel está vacío. Sube un archivo con datos.")
+    import pandas as pd
+
+    output = io.BytesIO()
+    usados = set()
+    with telemetry.span("excel"), pd.ExcelWriter(output, engine="openpyxl") as writer:
+        for nombre, df_alumnos, notas, metrics in grupos:
+            escribir_hojas_resultado(
+                writer, df_alumnos, notas, metrics, metrics.get("question_data", []),
+                hoja_corregido=nombre_hoja("CORREGIDO", nombre, usados),
+                hoja_metricas=nombre_hoja("MÉTRICAS", nombre, usados),
+            )
+
+    return output.getvalue()
+
 
-    if len(df.columns) != n_preguntas + 1:
-        logger.error(f"Número de columnas incorrecto: {len(df.columns)}")
-        raise HTTPException(status_code=400, detail=f"El Excel debe tener exactamente {n_preguntas + 1} columnas (1 para DNI y {n_preguntas} para preguntas). Se detectaron {len(df.columns)}.")
+def nombre_hoja(prefijo: str, grupo: str, usados: set) -> str:
+    """Nombre de hoja válido en Excel (31 caracteres, sin []:*?/\\) y no repetido."""
+    grupo = "".join("_" if char in "[]:*?/\\" else char for char in Path(grupo).stem)
+    nombre = f"{prefijo} {grupo}"[:31]
+    sufijo = 2
+    while nombre.lower() in usados:
+        marca = f" ({sufijo})"
+        nombre = f"{prefijo} {grupo}"[:31 - len(marca)] + marca
+        sufijo += 1
+    usados.add(nombre.lower())
+    return nombre
 
-    # VALIDACIÓN: Fila de respuestas correctas
-    if df.iloc[0].isna().all():
-        logger.error("Fila 2 vacía")
-        raise HTTPException(status_code=400, detail="La fila 2 (clave de respuestas) está totalmente vacía. No puedo corregir sin soluciones.")
 
-    LETRAS_POSIBLES = ["A", "B", "C", "D", "E"]
-    OPCIONES_ACTUALES = set(LETRAS_POSIBLES[:n_opciones])
+def escribir_hojas_resultado(writer, df_alumnos, notas, metrics, question_stats,
+                             hoja_corregido="CORREGIDO", hoja_metricas="MÉTRICAS"):
+    """Añade a writer las hojas CORREGIDO y MÉTRICAS (con gráficos) de un grupo."""
+    df_corregido = df_alumnos.copy()
+    df_corregido["Nota"] = notas
+    df_corregido.to_excel(writer, sheet_name=hoja_corregido, index=False)
 
-    # --- ESCANEO INTELIGENTE DE OPCIONES EN EL EXCEL ---
-    all_text_in_questions = []
-    for col in range(1, n_preguntas + 1):
-        all_text_in_questions.extend(df.iloc[:, col].astype(str).tolist())
+    # Nueva hoja de MÉTRICAS
+    metrics_data = [
+        ["Métrica", "Valor"],
+        ["Alumnos totales", metrics["alumnos_totales"]],
+        ["Presentados", metrics["presentados"]],
+        ["No presentados", metrics["no_presentados"]],
+        ["Nota media", metrics["media"]],
+        ["Nota máxima", metrics["max"]],
+        ["Nota mínima", metrics["min"]],
+        ["Aprobados", metrics["aprobados"]],
+        ["Suspensos", metrics["suspensos"]],
+        ["% Aprobados", f"{metrics['porcentaje_aprobados']}%"],
+    ]
+    # Sesiones corregidas antes del análisis de ítems no tienen fiabilidad
+    if "alfa_cronbach" in metrics:
+        metrics_data.append(["Alfa de Cronbach", metrics["alfa_cronbach"]])
+        metrics_data.append(["KR-20", metrics["kr20"]])
+    import pandas as pd
+
+    df_metrics = pd.DataFrame(metrics_data[1:], columns=metrics_data[0])
+    df_metrics.to_excel(writer, sheet_name=hoja_metricas, index=False)
     
-    letras_detectadas = set()
-    for text in all_text_in_questions:
-        if pd.isna(text) or text.lower() == 'nan': continue
-        for char in text.upper():
-            if char in LETRAS_POSIBLES:
-                letras_detectadas.add(char)
+    # Añadir gráficos de barras
+    workbook = writer.book
+    worksheet = writer.sheets[hoja_metricas]
+    from openpyxl.chart import BarChart, Reference
+    inicio_graficos = time.perf_counter()
     
-    if letras_detectadas:
-        max_letra_detectada = max(letras_detectadas)
-        idx_max_detectada = LETRAS_POSIBLES.index(max_letra_detectada) + 1
-        
-        if idx_max_detectada > n_opciones:
-            logger.error(f"Mismatch opciones: detectada {max_letra_detectada} pero configuradas {n_opciones}")
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Has configurado el examen con {n_opciones} opciones, pero he detectado respuestas con la letra '{max_letra_detectada}'. Por favor, selecciona {idx_max_detectada} opciones en el menú desplegable."
-            )
-        
-        if idx_max_detectada < n_opciones:
-            logger.error(f"Mismatch opciones: detectada max {max_letra_detectada} pero configuradas {n_opciones}")
-            raise HTTPException(
-                status_code=400,
-                detail=f"Parece que el examen es de {idx_max_detectada} opciones (la letra más alta es '{max_letra_detectada}'), pero has seleccionado {n_opciones}. Esto causaría errores en el cálculo de la penalización. Por favor, corrígelo."
-            )
+    # Preparar datos para los gráficos
+    # 1. Puntuación media por pregunta
+    question_chart_data = [["Pregunta", "Puntuación media"]]
+    for q_data in question_stats:
+        question_chart_data.append([q_data["question"], q_data["avg_score"]])
+    
+    # Escribir datos del gráfico de preguntas
+    start_row = len(df_metrics) + 4
+    for i, row_data in enumerate(question_chart_data):
+        for j, value in enumerate(row_data):
+            worksheet.cell(row=start_row + i, column=j + 1, value=value)
+    
+    # Crear gráfico de puntuación media por pregunta
+    chart1 = BarChart()
+    chart1.type = "col"
+    chart1.style = 10
+    chart1.title = "Puntuación media por pregunta"
+    chart1.y_axis.title = "Puntuación"
+    chart1.x_axis.title = "Pregunta"
+    
+    data1 = Reference(worksheet, min_col=2, min_row=start_row, max_row=start_row + len(question_stats))
+    cats1 = Reference(worksheet, min_col=1, min_row=start_row + 1, max_row=start_row + len(question_stats))
+    chart1.add_data(data1, titles_from_data=True)
+    chart1.set_categories(cats1)
+    
+    worksheet.add_chart(chart1, "H2")
+    
+    # 2. Porcentaje de aciertos por opción
+    letras = letras_reconocidas(metrics.get("n_opciones", OPCIONES_CLASICAS))
+    option_chart_data = [["Pregunta", *letras]]
+    for q_data in question_stats:
+        option_chart_data.append([q_data["question"], *(q_data.get(letra, 0) for letra in letras)])
+    
+    # Escribir datos del gráfico de opciones
+    start_row2 = start_row + len(question_chart_data) + 3
+    for i, row_data in enumerate(option_chart_data):
+        for j, value in enumerate(row_data):
+            worksheet.cell(row=start_row2 + i, column=j + 1, value=value)
+    
+    # Crear gráfico de porcentaje de aciertos por opción
+    chart2 = BarChart()
+    chart2.type = "col"
+    chart2.style = 11
+    chart2.title = "Porcentaje de aciertos por opción (%)"
+    chart2.y_axis.title = "% Aciertos"
+    chart2.x_axis.title = "Pregunta"
+    chart2.grouping = "clustered"
+    
+    data2 = Reference(worksheet, min_col=2, min_row=start_row2, max_row=start_row2 + len(question_stats), max_col=len(letras) + 1)
+    cats2 = Reference(worksheet, min_col=1, min_row=start_row2 + 1, max_row=start_row2 + len(question_stats))
+    chart2.add_data(data2, titles_from_data=True)
+    chart2.set_categories(cats2)
+    
+    worksheet.add_chart(chart2, "H18")
+
+    # 3. Análisis de ítems: dificultad, discriminación y distractores
+    if question_stats and "difficulty" in question_stats[0]:
+        opciones = LETRAS_POSIBLES[:metrics.get("n_opciones", OPCIONES_CLASICAS)]
+        cabecera = ["Pregunta", "Dificultad", "Discriminación", "Biserial puntual"]
+        for letra in opciones:
+            cabecera += [f"% marcan {letra}", f"Discriminación {letra}"]
+        item_data = [cabecera]
+        for q_data in question_stats:
+            fila = [q_data["question"], q_data["difficulty"], q_data["discrimination"], q_data["point_biserial"]]
+            for letra in opciones:
+                # Solo los distractores: las opciones correctas quedan en blanco
+                distractor = q_data["distractors"].get(letra, {})
+                fila += [distractor.get("pct_selected"), distractor.get("discrimination")]
+            item_data.append(fila)
+
+        # Debajo de los datos y de los gráficos (el de H18 llega hasta la fila ~33)
+        start_row3 = max(start_row2 + len(option_chart_data) + 3, 36)
+        worksheet.cell(row=start_row3 - 1, column=1, value="Análisis de ítems (solo presentados)")
+        for i, row_data in enumerate(item_data):
+            for j, value in enumerate(row_data):
+                worksheet.cell(row=start_row3 + i, column=j + 1, value=value)
+    telemetry.observar("stage_seconds", time.perf_counter() - inicio_graficos, "excel_charts")
+
 
-    # Validar clave
-    for i in range(n_preguntas):
-        col_idx = i + 1
-        original_val = df.iloc[0, col_idx]
-        clave_set = parse_respuesta(original_val)
-        
-        if not clave_set:
-            logger.error(f"Pregunta P{i+1} sin clave")
-            raise HTTPException(status_code=400, detail=f"La pregunta P{i+1} en la CLAVE (fila 2) no tiene ninguna respuesta seleccionada.")
-
-        if not clave_set.issubset(OPCIONES_ACTUALES):
-            opciones_invalidas = clave_set - OPCIONES_ACTUALES
-            logger.error(f"Opción inválida en clave P{i+1}: {opciones_invalidas}")
-            raise HTTPException(
-                status_code=400, 
-                detail=f"En la P{i+1} de la CLAVE (fila 2) has puesto '{','.join(opciones_invalidas)}', pero has configurado el examen para tener solo {n_opciones} opciones."
+def _pipeline_correccion(contenido, n_opciones: int, n_preguntas: int, sesion, upload_token=None, grupo=None):
+    escribir_estado(sesion, "running", "parse")
+    try:
+        if upload_token is not None:
+            # Archivo ya leído y validado en /validate: se reutiliza tal cual
+            examen, meta, original = cargar_subida(storage, upload_token)
+            grupo = grupo or meta.get("filename")
+        else:
+            # Lectura, validación y codificación en una sola pasada por el archivo
+            original = contenido
+            examen = leer_examen(
+                contenido, n_preguntas, n_opciones,
+                progreso=lambda etapa: escribir_estado(sesion, "running", etapa),
             )
+    except ErrorLecturaExcel as e:
+        logger.error(f"Error al leer el archivo: {str(e)}")
+        raise HTTPException(status_code=400, detail=MENSAJE_ARCHIVO_ILEGIBLE)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.exception("Error crítico en corrección")
+        raise HTTPException(status_code=500, detail=f"Error inesperado al procesar el archivo: {str(e)}")
+
+    _corregir_y_guardar(examen, n_opciones, sesion, original, grupo=grupo)
+
+
+def _corregir_y_guardar(examen, n_opciones: int, sesion, original, hoja=None, grupo=None):
+    """
+    Corrige un examen ya leído y guarda sus resultados en la sesión.
+    original es el archivo subido (bytes o ruta); hoja, la hoja del libro de
+    la que sale el examen si no es la primera; grupo, el nombre con el que
+    aparece en el índice analítico (archivo u hoja).
+    """
+    escribir_estado(sesion, "running", "grade")
+    telemetry.observar("exam_students", len(examen.dnis))
+    telemetry.observar("exam_questions", len(examen.clave))
+
+    with telemetry.span("grade"):
+        # Corregir en bloque sobre las máscaras de bits
+        notas, presentados, por_pregunta = corregir_matriz(
+            examen.mascaras, examen.respondidas, examen.clave, n_opciones
+        )
+
+        preview = [
+            {"dni": dni, "nota": nota, "presentado": presentado}
+            for dni, nota, presentado in zip(examen.dnis, notas, presentados)
+        ]
+
+        metrics = calculate_metrics_logic(preview)
+
+    escribir_estado(sesion, "running", "stats")
+
+    with telemetry.span("stats"):
+        # Estadísticas por pregunta y por opción en una sola pasada sobre la matriz
+        question_stats = estadisticas_preguntas(
+            examen.mascaras, examen.respondidas, examen.clave, por_pregunta, n_opciones
+        )
+
+    with telemetry.span("item_analysis"):
+        # Dificultad, discriminación, distractores y fiabilidad sobre la misma matriz
+        items, fiabilidad = analisis_items(
+            examen.mascaras, examen.respondidas, examen.clave, por_pregunta, n_opciones
+        )
+        for q_data, item in zip(question_stats, items):
+            q_data.update(item)
+
+    escribir_estado(sesion, "running", "save")
+    inicio_guardado = time.perf_counter()
+
+    # El Excel corregido no se genera aquí: se construye en el primer /download
+    # a partir del archivo original y de los resultados guardados.
+    # original.xlsx guarda el archivo tal como se subió (Excel, CSV o Parquet/Arrow).
+    if isinstance(original, Path):
+        sesion.escribir_archivo("original.xlsx", original)
+    else:
+        sesion.escribir("original.xlsx", original)
+
+    # Guardar notas (por columnas) y métricas completas
+    metrics_full = metrics.copy()
+    metrics_full["question_data"] = question_stats
+    metrics_full["n_opciones"] = n_opciones
+    metrics_full.update(fiabilidad)
+    if hoja is not None:
+        metrics_full["hoja"] = hoja
+
+    guardar_resultados(sesion, examen.dnis, notas, presentados, metrics_full)
+    telemetry.observar("stage_seconds", time.perf_counter() - inicio_guardado, "save")
+
+    if analytics_index is not None:
+        # Un fallo del índice no invalida la corrección, que ya está guardada
+        try:
+            with telemetry.span("analytics"):
+                analytics_index.registrar(
+                    sesion.session_id, grupo, examen.dnis, notas, presentados, metrics_full
+                )
+        except Exception:
+            logger.exception(f"No se pudo añadir la sesión {sesion.session_id} al índice analítico")
+
+    escribir_estado(sesion, "done")
+
+
+def _etapa_actual(sesion):
+    try:
+        return json.loads(sesion.leer("status.json")).get("stage")
+    except (OSError, ValueError):
+        return None
+
+
+def procesar_correccion(contenido, n_opciones: int, n_preguntas: int, session_id=None, upload_token=None,
+                        grupo=None) -> str:
+    """
+    Pipeline completo de corrección (lectura, validación, notas, estadísticas,
+    Excel y ficheros de sesión). Es código bloqueante: se ejecuta en el pool de
+    trabajadores, nunca directamente en el bucle de eventos.
+
+    Recibe el contenido del archivo o, en su lugar, el upload_token de una
+    subida ya validada en /validate. grupo es el nombre del examen en el
+    índice analítico (por defecto, el del archivo validado). Si no se indica
+    session_id se crea una sesión nueva. El avance y los errores quedan registrados en status.json.
+    Devuelve el session_id.
+    """
+    if session_id is None:
+        session_id = str(uuid.uuid4())
+        sesion = nueva_sesion(session_id)
+    else:
+        sesion = storage.sesion(session_id)
+
+    try:
+        _pipeline_correccion(contenido, n_opciones, n_preguntas, sesion, upload_token, grupo)
+    except HTTPException as e:
+        escribir_estado(sesion, "error", _etapa_actual(sesion), e.detail, e.status_code, getattr(e, "errores", None))
+        raise
+    except Exception as e:
+        logger.exception("Error crítico en corrección")
+        escribir_estado(sesion, "error", _etapa_actual(sesion),
+                        f"Error inesperado al corregir: {str(e)}", 500)
+        raise
+
+    return session_id
+
 
-    df_alumnos = df.iloc[1:].copy()
-    if df_alumnos.empty:
-        logger.error("No hay alumnos")
-        raise HTTPException(status_code=400, detail="No hay datos de alumnos. Asegúrate de listarlos a partir de la fila 3.")
+async def leer_subida(file: UploadFile, endpoint: str) -> bytes:
+    """Contenido del archivo subido; registra su tamaño y el tiempo de lectura."""
+    with telemetry.span("upload_read"):
+        contenido = await file.read()
+    telemetry.observar("upload_bytes", len(contenido), endpoint)
+    return contenido
 
-    if df_alumnos.iloc[:, 0].isna().all():
-        logger.error("Columna DNI totalmente vacía")
-        raise HTTPException(status_code=400, detail="La columna de DNI está vacía. No puedo identificar a los alumnos.")
+
+async def recibir_examen(file, upload_token, n_opciones: int, n_preguntas: int, endpoint: str):
+    """
+    Datos de entrada comunes a /corregir y /corregir-async: o bien un archivo,
+    o bien el upload_token devuelto por /validate (en ese caso n_opciones y
+    n_preguntas son los que se validaron).
+    Devuelve (contenido, n_opciones, n_preguntas, clave de caché).
+    """
+    if upload_token:
+        meta = await asyncio.to_thread(leer_meta, storage, upload_token)
+        return None, meta["n_opciones"], meta["n_preguntas"], meta["cache_key"]
+
+    if file is None:
+        raise HTTPException(status_code=400, detail="Sube un archivo de examen o indica el upload_token devuelto por /validate")
+
+    validar_configuracion(n_opciones, n_preguntas)
+
+    if not file.filename.lower().endswith(EXTENSIONES_ADMITIDAS):
+        raise HTTPException(status_code=400, detail=MENSAJE_EXTENSION)
+
+    contenido = await leer_subida(file, endpoint)
+    clave = await asyncio.to_thread(clave_contenido, contenido, n_opciones, n_preguntas)
+    return contenido, n_opciones, n_preguntas, clave
 
 
 @app.post("/corregir")
 async def corregir_examen(
-    file: UploadFile = File(...),
+    file: UploadFile = File(None),
+    upload_token: str = Form(None),
+    n_opciones: int = Form(5),
+    n_preguntas: int = Form(10)
+):
+    nombre = file.filename if file is not None else f"token {upload_token}"
+    logger.info(f"Iniciando corrección de archivo: {nombre} con {n_opciones} opciones y {n_preguntas} preguntas")
+
+    contenido, n_opciones, n_preguntas, clave = await recibir_examen(file, upload_token, n_opciones, n_preguntas, "/corregir")
+
+    session_id = await asyncio.to_thread(result_cache.get_session, clave)
+    if session_id:
+        logger.info(f"Corrección reutilizada desde caché: sesión {session_id}")
+        return {"session_id": session_id}
+
+    session_id = await run_in_worker(
+        corregir_y_registrar, clave, contenido, n_opciones, n_preguntas, upload_token=upload_token,
+        grupo=file.filename if file is not None else None,
+    )
+
+    return {"session_id": session_id}
+
+
+@app.post("/corregir-async", status_code=202)
+async def corregir_examen_async(
+    file: UploadFile = File(None),
+    upload_token: str = Form(None),
     n_opciones: int = Form(5),
     n_preguntas: int = Form(10)
 ):
+    """
+    Igual que /corregir, pero responde en cuanto el archivo queda en cola.
+    El avance se consulta en /status/{session_id}; al terminar funcionan
+    /preview, /metrics y /download con el mismo session_id.
+    """
+    nombre = file.filename if file is not None else f"token {upload_token}"
+    logger.info(f"Encolando corrección de archivo: {nombre} con {n_opciones} opciones y {n_preguntas} preguntas")
+
+    contenido, n_opciones, n_preguntas, clave = await recibir_examen(file, upload_token, n_opciones, n_preguntas, "/corregir-async")
+
+    session_id, status = await encolar_correccion(
+        contenido, n_opciones, n_preguntas, clave, upload_token, file.filename if file is not None else None
+    )
+    return {"session_id": session_id, "status": status}
+
+
+def corregir_y_registrar(clave: str, *args, **kwargs) -> str:
+    """
+    procesar_correccion y, si termina bien, la sesión queda en la caché de
+    resultados con su clave. Bloqueante: se ejecuta en el pool de trabajadores.
+    """
+    session_id = procesar_correccion(*args, **kwargs)
+    result_cache.put_session(clave, session_id)
+    return session_id
+
+
+async def encolar_correccion(contenido, n_opciones: int, n_preguntas: int, clave: str, upload_token=None, grupo=None):
+    """
+    Crea la sesión y encola su corrección, o reutiliza la de la caché.
+    Devuelve (session_id, status) con status "queued" o "done".
+    """
+    session_id = await asyncio.to_thread(result_cache.get_session, clave)
+    if session_id:
+        logger.info(f"Corrección reutilizada desde caché: sesión {session_id}")
+        return session_id, "done"
+
     session_id = str(uuid.uuid4())
-    session_path = SESSIONS_DIR / session_id
-    session_path.mkdir()
+    await asyncio.to_thread(nueva_sesion, session_id, "queued")
 
-    logger.info(f"Iniciando corrección de archivo: {file.filename} con {n_opciones} opciones y {n_preguntas} preguntas")
-    
     try:
-        if not (5 <= n_preguntas <= 20):
-            raise HTTPException(status_code=400, detail="El número de preguntas debe estar entre 5 y 20")
+        start_in_worker(
+            corregir_y_registrar, clave, contenido, n_opciones, n_preguntas, session_id, upload_token, grupo
+        )
+    except HTTPException:
+        await asyncio.to_thread(storage.borrar_sesion, session_id)
+        raise
+    return session_id, "queued"
+
+
+def leer_configuracion(config):
+    """config de un lote: JSON {nombre: {"n_opciones": ..., "n_preguntas": ...}}."""
+    try:
+        configuracion = json.loads(config) if config else {}
+        if not isinstance(configuracion, dict) or not all(isinstance(v, dict) for v in configuracion.values()):
+            raise ValueError
+    except ValueError:
+        raise HTTPException(400, "config debe ser un objeto JSON con la configuración de cada grupo por nombre")
+    return configuracion
+
 
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(status_code=400, detail="El archivo debe ser un Excel (.xlsx o .xls)")
+def ajustes_grupo(nombre: str, configuracion: dict, n_opciones: int, n_preguntas: int):
+    """(n_opciones, n_preguntas) de un grupo del lote, validados."""
+    ajustes = configuracion.get(nombre, {})
+    try:
+        opciones = int(ajustes.get("n_opciones", n_opciones))
+        preguntas = int(ajustes.get("n_preguntas", n_preguntas))
+    except (TypeError, ValueError):
+        raise HTTPException(400, f"{nombre}: n_opciones y n_preguntas deben ser números enteros")
+    validar_configuracion(opciones, preguntas, prefijo=f"{nombre}: ")
+    return opciones, preguntas
+
+
+def archivos_del_lote(nombre: str, contenido: bytes):
+    """
+    (nombre, contenido) de cada examen: el propio archivo o los de dentro de
+    un .zip. Bloqueante (descomprime): se llama en un hilo.
+    """
+    if not nombre.lower().endswith(".zip"):
+        return [(nombre, contenido)]
 
+    zip_no_valido = HTTPException(400, f"El archivo {nombre} no es un .zip válido")
+    try:
+        zf = zipfile.ZipFile(io.BytesIO(contenido))
+    except zipfile.BadZipFile:
+        raise zip_no_valido
+
+    with zf:
+        miembros = [
+            info for info in zf.infolist()
+            if not info.is_dir()
+            and not Path(info.filename).name.startswith(".")
+            and not info.filename.startswith("__MACOSX/")
+        ]
+        if sum(info.file_size for info in miembros) > BATCH_MAX_UNZIPPED_BYTES:
+            raise HTTPException(400, f"El contenido de {nombre} es demasiado grande")
         try:
-            df_original = pd.read_excel(file.file)
-        except Exception as e:
-            logger.error(f"Error al leer el Excel: {str(e)}")
-            raise HTTPException(status_code=400, detail="No se pudo leer el archivo Excel. Asegúrate de que no esté corrupto.")
+            return [(Path(info.filename).name, zf.read(info)) for info in miembros]
+        except (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError):
+            # Miembro dañado (CRC o datos comprimidos), truncado, cifrado o
+            # con un método de compresión no admitido
+            raise zip_no_valido
 
-        # VALIDACIÓN COMPLETA
-        validate_excel_logic(df_original, n_preguntas, n_opciones)
 
-        LETRAS_POSIBLES = ["A", "B", "C", "D", "E"]
-        OPCIONES_ACTUALES = set(LETRAS_POSIBLES[:n_opciones])
+@app.post("/corregir-lote", status_code=202)
+async def corregir_lote(
+    files: list[UploadFile] = File(...),
+    config: str = Form(None),
+    n_opciones: int = Form(5),
+    n_preguntas: int = Form(10)
+):
+    """
+    Corrige varios exámenes (varios Excel o un .zip con ellos) en paralelo.
 
-        respuestas_correctas = {}
-        for i in range(n_preguntas):
-            col_idx = i + 1
-            original_val = df_original.iloc[0, col_idx]
-            respuestas_correctas[f"P{i+1}"] = parse_respuesta(original_val)
+    config es un JSON opcional con la configuración de cada archivo por
+    nombre: {"grupo1.xlsx": {"n_opciones": 4, "n_preguntas": 20}, ...}. Los
+    archivos que no aparecen usan n_opciones y n_preguntas.
 
-        df_alumnos = df_original.iloc[1:].copy()
+    Devuelve un job_id y un session_id por archivo. El avance y, al terminar,
+    el resumen conjunto de todos los grupos se consultan en /lote/{job_id}.
+    """
+    configuracion = leer_configuracion(config)
+
+    examenes = []
+    for file in files:
+        contenido = await leer_subida(file, "/corregir-lote")
+        examenes.extend(await asyncio.to_thread(archivos_del_lote, file.filename, contenido))
+
+    if not examenes:
+        raise HTTPException(400, f"El lote no contiene ningún archivo de examen ({', '.join(EXTENSIONES_ADMITIDAS)})")
+    if len(examenes) > BATCH_MAX_FILES:
+        raise HTTPException(400, f"Un lote admite como máximo {BATCH_MAX_FILES} archivos")
+
+    trabajos = []
+    for nombre, contenido in examenes:
+        if not nombre.lower().endswith(EXTENSIONES_ADMITIDAS):
+            raise HTTPException(400, f"{nombre}: {MENSAJE_EXTENSION}")
+        opciones, preguntas = ajustes_grupo(nombre, configuracion, n_opciones, n_preguntas)
+        trabajos.append((nombre, contenido, opciones, preguntas))
+
+    logger.info(f"Encolando lote de {len(trabajos)} exámenes")
+
+    # Todo el lote o nada: no se encola la mitad si el pool está lleno
+    comprobar_capacidad(len(trabajos))
+
+    items = []
+    for nombre, contenido, opciones, preguntas in trabajos:
+        clave = await asyncio.to_thread(clave_contenido, contenido, opciones, preguntas)
+        session_id, status = await encolar_correccion(contenido, opciones, preguntas, clave, grupo=nombre)
+        items.append({
+            "name": nombre, "session_id": session_id, "status": status,
+            "n_opciones": opciones, "n_preguntas": preguntas,
+        })
+
+    job_id = str(uuid.uuid4())
+    await asyncio.to_thread(guardar_lote, job_id, items)
+
+    return {"job_id": job_id, "status": "queued", "items": items}
+
+
+def guardar_lote(job_id: str, items):
+    """Crea la sesión del lote con su lote.json. Bloqueante: se llama en un hilo."""
+    lote = nueva_sesion(job_id)
+    lote.escribir("lote.json", orjson.dumps({"job_id": job_id, "created_at": time.time(), "items": items}))
+
+
+@app.post("/corregir-hojas", status_code=202)
+async def corregir_hojas(
+    file: UploadFile = File(...),
+    hojas: str = Form(None),
+    config: str = Form(None),
+    n_opciones: int = Form(5),
+    n_preguntas: int = Form(10)
+):
+    """
+    Corrige varias hojas de un mismo Excel (una por grupo o versión del
+    examen) con una sola lectura del libro.
+
+    hojas es una lista JSON con los nombres de las hojas a corregir (por
+    defecto, todas). config, como en /corregir-lote, es un JSON con la
+    configuración de cada hoja por nombre.
+
+    Devuelve un job_id que se consulta en /lote/{job_id} como cualquier lote:
+    cuando el libro se ha leído aparece un session_id por hoja. El Excel con
+    las hojas CORREGIDO y MÉTRICAS de todos los grupos se descarga en
+    /lote/{job_id}/download.
+    """
+    configuracion = leer_configuracion(config)
+    try:
+        seleccion = json.loads(hojas) if hojas else None
+        if seleccion is not None and (
+            not isinstance(seleccion, list) or not seleccion
+            or not all(isinstance(hoja, str) for hoja in seleccion)
+        ):
+            raise ValueError
+    except ValueError:
+        raise HTTPException(400, "hojas debe ser una lista JSON con los nombres de las hojas")
+
+    if not file.filename.lower().endswith(('.xlsx', '.xls')):
+        raise HTTPException(status_code=400, detail="El archivo debe ser un Excel (.xlsx o .xls)")
+
+    # Errores de configuración antes de encolar
+    ajustes_grupo(file.filename, {}, n_opciones, n_preguntas)
+    for hoja in configuracion:
+        ajustes_grupo(hoja, configuracion, n_opciones, n_preguntas)
+
+    contenido = await leer_subida(file, "/corregir-hojas")
+
+    job_id = str(uuid.uuid4())
+    await asyncio.to_thread(nueva_sesion, job_id, "queued")
+
+    try:
+        start_in_worker(
+            procesar_libro, contenido, n_opciones, n_preguntas, configuracion, seleccion, job_id
+        )
+    except HTTPException:
+        await asyncio.to_thread(storage.borrar_sesion, job_id)
+        raise
+
+    return {"job_id": job_id, "status": "queued"}
 
-    except HTTPException as he:
-        raise he
-    except Exception as e:
-        logger.exception("Error crítico en corrección")
-        raise HTTPException(status_code=500, detail=f"Error inesperado al procesar el Excel: {str(e)}")
 
-    notas = []
-    preview = []
+def procesar_libro(contenido, n_opciones: int, n_preguntas: int, configuracion: dict, hojas, job_id: str):
+    """
+    Corrige las hojas de un libro: lo lee una vez, crea una sesión por hoja y
+    corrige y calcula las estadísticas de todas, una tras otra. Bloqueante:
+    se ejecuta en el pool de trabajadores.
+    """
+    lote = storage.sesion(job_id)
 
-    for idx, row in df_alumnos.iterrows():
-        puntaje_total = 0.0
-        presentado = False
+    def configuracion_hoja(hoja):
+        opciones, preguntas = ajustes_grupo(hoja, configuracion, n_opciones, n_preguntas)
+        return preguntas, opciones
 
-        # Sanitizar DNI para evitar errores de JSON (nan)
-        dni_alumno = row.iloc[0]
-        if pd.isna(dni_alumno):
-            dni_alumno = "S/DNI"
+    escribir_estado(lote, "running", "parse")
+    try:
+        examenes = leer_examenes(contenido, configuracion_hoja, hojas)
+    except ErrorLecturaExcel as e:
+        logger.error(f"Error al leer el archivo: {str(e)}")
+        escribir_estado(lote, "error", "parse", MENSAJE_ARCHIVO_ILEGIBLE, 400)
+        raise HTTPException(status_code=400, detail=MENSAJE_ARCHIVO_ILEGIBLE)
+    except HTTPException as e:
+        escribir_estado(lote, "error", "parse", e.detail, e.status_code, getattr(e, "errores", None))
+        raise
+
+    # El libro se guarda una vez; en disco local las hojas lo enlazan
+    lote.escribir("original.xlsx", contenido)
+    original = lote.ruta_local("original.xlsx") or contenido
+
+    items = []
+    pendientes = []
+    for hoja, resultado in examenes:
+        session_id = str(uuid.uuid4())
+        sesion = nueva_sesion(session_id)
+        opciones, preguntas = ajustes_grupo(hoja, configuracion, n_opciones, n_preguntas)
+        if isinstance(resultado, HTTPException):
+            escribir_estado(sesion, "error", "validate", resultado.detail, resultado.status_code,
+                            getattr(resultado, "errores", None))
         else:
-            dni_alumno = str(dni_alumno)
+            escribir_estado(sesion, "queued")
+            pendientes.append((resultado, opciones, sesion, hoja))
+        items.append({"name": hoja, "session_id": session_id, "n_opciones": opciones, "n_preguntas": preguntas})
+
+    lote.escribir("lote.json", orjson.dumps({
+        "job_id": job_id, "created_at": time.time(), "workbook": True, "items": items,
+    }))
+    logger.info(f"Libro con {len(items)} hojas: corrigiendo {len(pendientes)}")
+
+    def corregir_hoja(trabajo):
+        examen, opciones, sesion, hoja = trabajo
+        try:
+            _corregir_y_guardar(examen, opciones, sesion, original, hoja, grupo=hoja)
+        except Exception as e:
+            logger.exception(f"Error crítico corrigiendo la hoja {hoja}")
+            escribir_estado(sesion, "error", _etapa_actual(sesion),
+                            f"Error inesperado al corregir: {str(e)}", 500)
 
-        for i, correctas in enumerate(respuestas_correctas.values()):
-            incorrectas = OPCIONES_ACTUALES - correctas
-            seleccionadas = parse_respuesta(row.iloc[i + 1])
+    # Una hoja tras otra dentro de este trabajo: el libro ocupa un solo hueco
+    # del pool, como cualquier otro trabajo
+    for trabajo in pendientes:
+        corregir_hoja(trabajo)
 
-            if seleccionadas:
-                presentado = True
-            else:
-                continue
+    escribir_estado(lote, "done")
+    return job_id
 
-            n_correctas = len(correctas)
-            n_incorrectas = len(incorrectas)
 
-            valor_correcta = 1 / n_correctas if n_correctas else 0
-            valor_incorrecta = 1 / n_incorrectas if n_incorrectas else 0
+def resumen_lote(items) -> dict:
+    """
+    Métricas de todos los grupos juntos (calculate_metrics_logic sobre todos
+    los alumnos) y las de cada grupo por separado.
+    """
+    alumnos = []
+    grupos = []
+    for item in items:
+        if item["status"] != "done":
+            continue
+        sesion = storage.sesion(item["session_id"])
+        alumnos.extend(
+            {"nota": nota, "presentado": presentado}
+            for _, nota, presentado in cargar_notas(sesion).filas()
+        )
+        metrics = cargar_metrics(sesion)
+        metrics.pop("question_data", None)
+        grupos.append({"name": item["name"], "session_id": item["session_id"], **metrics})
 
-            for opcion in seleccionadas:
-                if opcion in correctas:
-                    puntaje_total += valor_correcta
-                elif opcion in incorrectas:
-                    puntaje_total -= valor_incorrecta
+    return {"global": calculate_metrics_logic(alumnos), "groups": grupos}
 
-        nota_final = round(max(0, puntaje_total), 2)
-        notas.append(nota_final)
 
-        preview.append({
-            "dni": dni_alumno,
-            "nota": nota_final,
-            "presentado": presentado
-        })
+@app.get("/lote/{job_id}")
+def get_lote(job_id: str):
+    return estado_lote(job_id)
 
-    metrics = calculate_metrics_logic(preview)
-    
-    # Calcular estadísticas por pregunta
-    question_stats = []
-    
-    total_alumnos = len(df_alumnos)
-    
-    for i in range(n_preguntas):
-        question_num = i + 1
-        correctas = list(respuestas_correctas.values())[i]
-        
-        # Estadísticas por pregunta (puntuación media)
-        total_answered = 0
-        total_score = 0.0
-        
-        # Estadísticas por opción: contar aciertos
-        # Acierto = (opción correcta Y marcada) O (opción incorrecta Y NO marcada)
-        option_aciertos = {opt: 0 for opt in OPCIONES_ACTUALES}
-        
-        for _, row in df_alumnos.iterrows():
-            seleccionadas = parse_respuesta(row.iloc[i + 1])
-            
-            # Calcular puntuación de esta pregunta para este alumno
-            if seleccionadas:
-                total_answered += 1
-                
-                incorrectas = OPCIONES_ACTUALES - correctas
-                n_correctas = len(correctas)
-                n_incorrectas = len(incorrectas)
-                valor_correcta = 1 / n_correctas if n_correctas else 0
-                valor_incorrecta = 1 / n_incorrectas if n_incorrectas else 0
-                
-                question_score = 0.0
-                for opcion in seleccionadas:
-                    if opcion in correctas:
-                        question_score += valor_correcta
-                    elif opcion in incorrectas:
-                        question_score -= valor_incorrecta
-                
-                total_score += max(0, question_score)
-            
-            # Calcular aciertos por opción para TODOS los alumnos
-            for opt in OPCIONES_ACTUALES:
-                esta_en_clave = opt in correctas
-                esta_marcada = opt in seleccionadas
-                acierto = (esta_en_clave and esta_marcada) or (not esta_en_clave and not esta_marcada)
-                if acierto:
-                    option_aciertos[opt] += 1
-        
-        avg_score = round(total_score / total_answered, 2) if total_answered > 0 else 0
-        
-        # Preparar datos de opciones con porcentaje de aciertos
-        option_data = {}
-        for opt in sorted(OPCIONES_ACTUALES):
-            aciertos = option_aciertos[opt]
-            porcentaje = round((aciertos / total_alumnos * 100), 1) if total_alumnos > 0 else 0
-            option_data[opt] = porcentaje
-        
-        question_stats.append({
-            "question": f"P{question_num}",
-            "avg_score": avg_score,
-            "total_answered": total_answered,
-            **option_data  # A, B, C, D, E como claves directas
+
+def estado_lote(job_id: str) -> dict:
+    """Estado de cada grupo del lote y, si ya ha terminado, el resumen."""
+    lote_sesion = storage.sesion(job_id)
+    try:
+        return orjson.loads(lote_sesion.leer("resumen.json"))
+    except FileNotFoundError:
+        pass
+    try:
+        lote = orjson.loads(lote_sesion.leer("lote.json"))
+    except FileNotFoundError:
+        # Libro de varias hojas que aún no se ha leído (o que no se pudo leer)
+        estado = leer_estado(lote_sesion)
+        if estado is None:
+            raise HTTPException(404, "Lote no encontrado")
+        return {"job_id": job_id, **estado, "items": []}
+
+    items = []
+    for item in lote["items"]:
+        estado = leer_estado(storage.sesion(item["session_id"])) or {
+            "status": "error", "detail": "Sesión no encontrada", "status_code": 404,
+        }
+        items.append({
+            **item,
+            "status": estado["status"],
+            "progress": estado.get("progress"),
+            "detail": estado.get("detail"),
+            **({"errores": estado["errores"]} if "errores" in estado else {}),
         })
-    
-    
-    df_corregido = df_alumnos.copy()
-    df_corregido["Nota"] = notas
 
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df_original.to_excel(writer, sheet_name="ORIGINAL", index=False)
-        df_corregido.to_excel(writer, sheet_name="CORREGIDO", index=False)
-        
-        # Nueva hoja de MÉTRICAS
-        metrics_data = [
-            ["Métrica", "Valor"],
-            ["Alumnos totales", metrics["alumnos_totales"]],
-            ["Presentados", metrics["presentados"]],
-            ["No presentados", metrics["no_presentados"]],
-            ["Nota media", metrics["media"]],
-            ["Nota máxima", metrics["max"]],
-            ["Nota mínima", metrics["min"]],
-            ["Aprobados", metrics["aprobados"]],
-            ["Suspensos", metrics["suspensos"]],
-            ["% Aprobados", f"{metrics['porcentaje_aprobados']}%"],
-        ]
-        df_metrics = pd.DataFrame(metrics_data[1:], columns=metrics_data[0])
-        df_metrics.to_excel(writer, sheet_name="MÉTRICAS", index=False)
-        
-        # Añadir gráficos de barras
-        workbook = writer.book
-        worksheet = writer.sheets["MÉTRICAS"]
-        from openpyxl.chart import BarChart, Reference
-        
-        # Preparar datos para los gráficos
-        # 1. Puntuación media por pregunta
-        question_chart_data = [["Pregunta", "Puntuación media"]]
-        for q_data in question_stats:
-            question_chart_data.append([q_data["question"], q_data["avg_score"]])
-        
-        # Escribir datos del gráfico de preguntas
-        start_row = len(df_metrics) + 4
-        for i, row_data in enumerate(question_chart_data):
-            for j, value in enumerate(row_data):
-                worksheet.cell(row=start_row + i, column=j + 1, value=value)
-        
-        # Crear gráfico de puntuación media por pregunta
-        chart1 = BarChart()
-        chart1.type = "col"
-        chart1.style = 10
-        chart1.title = "Puntuación media por pregunta"
-        chart1.y_axis.title = "Puntuación"
-        chart1.x_axis.title = "Pregunta"
-        
-        data1 = Reference(worksheet, min_col=2, min_row=start_row, max_row=start_row + len(question_stats))
-        cats1 = Reference(worksheet, min_col=1, min_row=start_row + 1, max_row=start_row + len(question_stats))
-        chart1.add_data(data1, titles_from_data=True)
-        chart1.set_categories(cats1)
-        
-        worksheet.add_chart(chart1, "H2")
-        
-        # 2. Porcentaje de aciertos por opción
-        option_chart_data = [["Pregunta", "A", "B", "C", "D", "E"]]
-        for q_data in question_stats:
-            option_chart_data.append([
-                q_data["question"],
-                q_data.get("A", 0),
-                q_data.get("B", 0),
-                q_data.get("C", 0),
-                q_data.get("D", 0),
-                q_data.get("E", 0)
-            ])
-        
-        # Escribir datos del gráfico de opciones
-        start_row2 = start_row + len(question_chart_data) + 3
-        for i, row_data in enumerate(option_chart_data):
-            for j, value in enumerate(row_data):
-                worksheet.cell(row=start_row2 + i, column=j + 1, value=value)
-        
-        # Crear gráfico de porcentaje de aciertos por opción
-        chart2 = BarChart()
-        chart2.type = "col"
-        chart2.style = 11
-        chart2.title = "Porcentaje de aciertos por opción (%)"
-        chart2.y_axis.title = "% Aciertos"
-        chart2.x_axis.title = "Pregunta"
-        chart2.grouping = "clustered"
-        
-        data2 = Reference(worksheet, min_col=2, min_row=start_row2, max_row=start_row2 + len(question_stats), max_col=6)
-        cats2 = Reference(worksheet, min_col=1, min_row=start_row2 + 1, max_row=start_row2 + len(question_stats))
-        chart2.add_data(data2, titles_from_data=True)
-        chart2.set_categories(cats2)
-        
-        worksheet.add_chart(chart2, "H18")
-
-    excel_bytes = output.getvalue()
-    
-    # Guardar preview
-    with open(session_path / "preview.json", "w", encoding="utf-8") as f:
-        json.dump(preview, f, ensure_ascii=False)
+    terminados = [item["status"] for item in items if item["status"] in ("done", "error")]
+    if len(terminados) < len(items):
+        return {"job_id": job_id, "status": "running", "items": items}
 
-    # Guardar métricas completas
-    metrics_full = metrics.copy()
-    metrics_full["question_data"] = question_stats
-    metrics_full["n_opciones"] = n_opciones
+    if all(status == "done" for status in terminados):
+        status = "done"
+    elif any(status == "done" for status in terminados):
+        status = "partial"
+    else:
+        status = "error"
 
-    with open(session_path / "metrics.json", "w", encoding="utf-8") as f:
-        json.dump(metrics_full, f, ensure_ascii=False)
+    # Terminado: el resumen ya no cambia, se guarda para las consultas siguientes
+    resultado = {"job_id": job_id, "status": status, "items": items, "summary": resumen_lote(items)}
+    lote_sesion.escribir("resumen.json", orjson.dumps(resultado))
+    return resultado
 
-    # Guardar Excel
-    with open(session_path / "examen.xlsx", "wb") as f:
-        f.write(excel_bytes)
 
-    
-    return {"session_id": session_id}
+def leer_estado(sesion):
+    """Contenido de status.json de la sesión, o None si no existe la sesión."""
+    try:
+        return orjson.loads(sesion.leer("status.json"))
+    except FileNotFoundError:
+        pass
+
+    # Sesiones creadas antes de existir status.json
+    if sesion.contiene("metrics.json"):
+        return {"status": "done", "stage": None, "stages": ETAPAS_CORRECCION,
+                "stages_completed": ETAPAS_CORRECCION, "progress": 100}
+    return None
+
+
+def generar_excel_lote(job_id: str):
+    """
+    Construye examen.xlsx del lote: hojas CORREGIDO y MÉTRICAS de cada grupo
+    corregido. Si los grupos son hojas de un mismo libro, este se lee una vez.
+    Bloqueante: se ejecuta en el pool de trabajadores.
+    """
+    lote_sesion = storage.sesion(job_id)
+    if lote_sesion.contiene("examen.xlsx"):
+        return
+
+    lote = orjson.loads(lote_sesion.leer("lote.json"))
+    items = [
+        item for item in lote["items"]
+        if (leer_estado(storage.sesion(item["session_id"])) or {}).get("status") == "done"
+    ]
+
+    with telemetry.span("excel_load"):
+        if lote.get("workbook"):
+            import pandas as pd
+
+            hojas = pd.read_excel(
+                io.BytesIO(lote_sesion.leer("original.xlsx")),
+                sheet_name=[item["name"] for item in items],
+            )
+            originales = [hojas[item["name"]] for item in items]
+        else:
+            originales = [
+                leer_tabla(storage.sesion(item["session_id"]).leer("original.xlsx"))
+                for item in items
+            ]
+
+    grupos = []
+    for item, df_original in zip(items, originales):
+        sesion = storage.sesion(item["session_id"])
+        grupos.append((
+            item["name"], df_original.iloc[1:], cargar_notas(sesion).notas.tolist(), cargar_metrics(sesion),
+        ))
+
+    lote_sesion.escribir("examen.xlsx", construir_excel_grupos(grupos))
+
+
+@app.get("/lote/{job_id}/download")
+async def download_excel_lote(job_id: str, request: Request):
+    respuesta = respuesta_excel_cacheado(request, job_id)
+    if respuesta is not None:
+        return respuesta
+
+    lote_sesion = storage.sesion(job_id)
+    if not await asyncio.to_thread(lote_sesion.contiene, "examen.xlsx"):
+        estado = await asyncio.to_thread(estado_lote, job_id)
+        if estado["status"] == "error":
+            raise HTTPException(404, "Ningún grupo del lote se ha podido corregir")
+        if estado["status"] not in ("done", "partial"):
+            raise HTTPException(409, "El lote todavía se está corrigiendo")
+        await run_in_worker(generar_excel_lote, job_id)
+
+    return await respuesta_excel(request, job_id, lote_sesion)
+
+
+@app.get("/status/{session_id}")
+def get_status(session_id: str):
+    estado = leer_estado(storage.sesion(session_id))
+    if estado is None:
+        raise HTTPException(404, "Sesión no encontrada")
+    return estado
+
+def validar_contenido(contenido: bytes, n_preguntas: int, n_opciones: int, cache_key: str, filename=None):
+    """
+    Lee y valida el Excel subido y guarda el resultado para /corregir.
+    Devuelve el upload_token y la clave interpretada. Bloqueante: se ejecuta
+    en el pool de trabajadores.
+    """
+    try:
+        # VALIDACIÓN CENTRALIZADA (una sola pasada por el archivo; si hay errores se
+        # informan todos a la vez, hasta MAX_ERRORES_DETALLADOS, con su celda)
+        examen = leer_examen(contenido, n_preguntas, n_opciones)
+    except ErrorLecturaExcel:
+        raise HTTPException(400, MENSAJE_ARCHIVO_ILEGIBLE)
+
+    clave_respuestas = {
+        f"P{i + 1}": [letra for bit, letra in enumerate(LETRAS_POSIBLES[:n_opciones]) if int(mascara) & (1 << bit)]
+        for i, mascara in enumerate(examen.clave)
+    }
+    with telemetry.span("save"):
+        token = guardar_subida(storage, contenido, examen, {
+            "n_opciones": n_opciones,
+            "n_preguntas": n_preguntas,
+            "cache_key": cache_key,
+            "clave": clave_respuestas,
+            "filename": filename,
+        })
+    validacion = {"upload_token": token, "clave": clave_respuestas}
+    result_cache.put_validation(cache_key, validacion)
+    return validacion
+
+
+def validacion_en_cache(clave: str):
+    """Resultado de /validate guardado para este contenido, si su upload_token sigue vigente."""
+    validacion = result_cache.get_validation(clave)
+    if validacion is not None:
+        try:
+            leer_meta(storage, validacion["upload_token"])
+        except HTTPException:
+            return None
+    return validacion
+
 
 @app.post("/validate")
 async def validar_examen(
@@ -480,26 +1185,33 @@ async def validar_examen(
     n_opciones: int = Form(5),
     n_preguntas: int = Form(10)
 ):
+    """
+    Valida el archivo y devuelve un upload_token de corta duración: /corregir
+    acepta ese token en lugar de volver a subir el archivo.
+    """
     logger.info(f"Validación previa del archivo: {file.filename} con {n_opciones} opciones y {n_preguntas} preguntas")
 
     try:
-        if not (5 <= n_preguntas <= 20):
-            raise HTTPException(400, "El número de preguntas debe estar entre 5 y 20")
+        validar_configuracion(n_opciones, n_preguntas)
 
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            raise HTTPException(400, "El archivo debe ser un Excel (.xlsx o .xls)")
+        if not file.filename.lower().endswith(EXTENSIONES_ADMITIDAS):
+            raise HTTPException(400, MENSAJE_EXTENSION)
 
-        try:
-            df = pd.read_excel(file.file)
-        except Exception:
-            raise HTTPException(400, "No se pudo leer el archivo Excel")
+        contenido = await leer_subida(file, "/validate")
 
-        # VALIDACIÓN CENTRALIZADA
-        validate_excel_logic(df, n_preguntas, n_opciones)
+        clave = await asyncio.to_thread(clave_contenido, contenido, n_opciones, n_preguntas)
+        validacion = await asyncio.to_thread(validacion_en_cache, clave)
+        if validacion is None:
+            validacion = await run_in_worker(
+                validar_contenido, contenido, n_preguntas, n_opciones, clave, file.filename
+            )
 
         return {
             "status": "ok",
-            "message": "El archivo es válido y puede corregirse"
+            "message": "El archivo es válido y puede corregirse",
+            "upload_token": validacion["upload_token"],
+            "expires_in": UPLOAD_TOKEN_TTL_SECONDS,
+            "clave": validacion["clave"],
         }
 
     except HTTPException as e:
@@ -509,38 +1221,134 @@ async def validar_examen(
         raise HTTPException(500, "Error inesperado durante la validación")
 
 
+def puede_generar_excel(sesion) -> bool:
+    return sesion.contiene("original.xlsx") and tiene_resultados(sesion)
+
+
+def generar_excel_sesion(session_id: str):
+    """
+    Construye examen.xlsx a partir del archivo original y de los resultados
+    guardados, y lo deja en la sesión para las descargas siguientes.
+    Bloqueante: se ejecuta en el pool de trabajadores.
+    """
+    sesion = storage.sesion(session_id)
+    if sesion.contiene("examen.xlsx"):
+        return
+
+    metrics = cargar_metrics(sesion)
+    with telemetry.span("excel_load"):
+        df_original = leer_tabla(sesion.leer("original.xlsx"), metrics.get("hoja", 0))
+    df_alumnos = df_original.iloc[1:].copy()
+    notas = cargar_notas(sesion).notas.tolist()
+
+    excel_bytes = construir_excel(df_original, df_alumnos, notas, metrics, metrics.get("question_data", []))
+
+    # Escritura atómica por si dos descargas lo generan a la vez
+    sesion.escribir("examen.xlsx", excel_bytes)
+
 
 @app.get("/download/{session_id}")
-def download_excel(session_id: str):
-    path = SESSIONS_DIR / session_id / "examen.xlsx"
-    if not path.exists():
-        raise HTTPException(404, "Excel no encontrado")
-
-    return StreamingResponse(
-        open(path, "rb"),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=examen_corregido.xlsx"}
-    )
+async def download_excel(session_id: str, request: Request):
+    respuesta = respuesta_excel_cacheado(request, session_id)
+    if respuesta is not None:
+        return respuesta
 
-@app.get("/export-pdf/{session_id}")
-async def export_pdf(session_id: str):
-    session_path = SESSIONS_DIR / session_id
+    sesion = storage.sesion(session_id)
+    if not await asyncio.to_thread(sesion.contiene, "examen.xlsx"):
+        if not await asyncio.to_thread(puede_generar_excel, sesion):
+            raise HTTPException(404, "Excel no encontrado")
+        await run_in_worker(generar_excel_sesion, session_id)
+
+    return await respuesta_excel(request, session_id, sesion)
+
+
+MEDIA_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def respuesta_excel_cacheado(request: Request, session_id: str):
+    """Respuesta con el examen.xlsx guardado en la caché de sesiones, o None."""
+    etag = session_cache.get(session_id, "excel_etag")
+    if etag is None:
+        return None
+    excel_bytes = session_cache.get(session_id, "excel")
+    if excel_bytes is None:
+        return None
+    return respuesta_bytes(request, excel_bytes, MEDIA_TYPE_XLSX, "examen_corregido.xlsx", etag)
+
+
+async def respuesta_excel(request: Request, session_id: str, sesion):
+    """Respuesta con el examen.xlsx de la sesión, con Range y ETag (ver transferencias)."""
+    respuesta = await respuesta_archivo(request, sesion, "examen.xlsx", MEDIA_TYPE_XLSX, "examen_corregido.xlsx")
+
+    # Los Excel pequeños se quedan en memoria para las descargas siguientes
+    if respuesta.status_code == 200 and int(respuesta.headers["content-length"]) <= session_cache.max_blob_bytes:
+        excel_bytes = await asyncio.to_thread(sesion.leer, "examen.xlsx")
+        session_cache.put_blob(session_id, "excel", excel_bytes)
+        session_cache.put(session_id, "excel_etag", respuesta.headers["etag"])
+        return respuesta_bytes(request, excel_bytes, MEDIA_TYPE_XLSX, "examen_corregido.xlsx", respuesta.headers["etag"])
+
+    return respuesta
+
+def tablas_calificaciones(filas, filas_por_pagina: int):
+    """
+    Tabla DNI/Nota del informe. Si filas_por_pagina > 0 y no cabe en una sola
+    página, se divide en tablas de ese tamaño, cada una en su página y con la
+    cabecera repetida. Maquetar muchas tablas pequeñas es lineal; partir una
+    tabla gigante página a página no lo es.
+    """
+    from reportlab.lib import colors
+    from reportlab.platypus import PageBreak, Table, TableStyle
+
+    estilo = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+    cabecera = ["DNI", "Nota"]
+
+    if filas_por_pagina <= 0 or len(filas) <= filas_por_pagina:
+        bloques = [filas]
+    else:
+        bloques = [filas[i:i + filas_por_pagina] for i in range(0, len(filas), filas_por_pagina)]
 
-    preview_path = session_path / "preview.json"
-    metrics_path = session_path / "metrics.json"
+    elements = []
+    for n_bloque, bloque in enumerate(bloques):
+        if n_bloque > 0:
+            elements.append(PageBreak())
+        data = [cabecera]
+        for dni, nota, _ in bloque:
+            data.append([dni, f"{nota:.2f}"])
+        t = Table(data, hAlign='CENTER', repeatRows=1)
+        t.setStyle(estilo)
+        elements.append(t)
+    return elements
+
+
+def generar_pdf(sesion, destino: Path):
+    """
+    Construye el informe PDF de una sesión y lo escribe en destino, sin pasar
+    por un buffer en memoria. Bloqueante: se ejecuta en el pool de trabajadores.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
 
-    if not preview_path.exists() or not metrics_path.exists():
-        raise HTTPException(404, "Datos no encontrados para esta sesión")
+    from charts import grafico_aciertos_opcion, grafico_puntuacion_media
 
-    preview = json.loads(preview_path.read_text(encoding="utf-8"))
-    metrics = json.loads(metrics_path.read_text(encoding="utf-8"))
+    inicio = time.perf_counter()
+    filas = cargar_notas(sesion).filas()
+    metrics = cargar_metrics(sesion)
     question_data = metrics.get("question_data", [])
 
-    if not preview:
+    if not filas:
         raise HTTPException(400, "No hay datos para exportar")
 
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    doc = SimpleDocTemplate(str(destino), pagesize=letter)
     styles = getSampleStyleSheet()
     elements = []
 
@@ -550,23 +1358,9 @@ async def export_pdf(session_id: str):
     )
     elements.append(Spacer(1, 12))
     
-    # ===== TABLA DE ALUMNOS =====    
-    data = [["DNI", "Nota"]]
-    for row in preview:
-        data.append([row["dni"], f"{row['nota']:.2f}"])
-    
-    t = Table(data, hAlign='CENTER')
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(t)
-    
+    # ===== TABLA DE ALUMNOS =====
+    elements.extend(tablas_calificaciones(filas, PDF_TABLE_ROWS_PER_PAGE))
+
     # SALTO DE PÁGINA
     elements.append(PageBreak())
     
@@ -604,80 +1398,189 @@ async def export_pdf(session_id: str):
 
     # ===== GRÁFICOS EN EL PDF =====
     if question_data:
-        # 1. Gráfico de Puntuación Media
-        plt.figure(figsize=(6, 4))
-        questions = [q["question"] for q in question_data]
-        avg_scores = [q["avg_score"] for q in question_data]
-        
-        plt.bar(questions, avg_scores, color='#45B7D1')
-        plt.title("Puntuación media por pregunta")
-        plt.ylim(0, 1.1)
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-        
-        img_buffer1 = io.BytesIO()
-        plt.savefig(img_buffer1, format='png', bbox_inches='tight')
-        img_buffer1.seek(0)
-        plt.close()
-        
-        elements.append(Image(img_buffer1, width=400, height=250))
-        elements.append(Spacer(1, 20))
-        
-        # 2. Gráfico de Aciertos por Opción (Solo si hay datos frescos)
-        plt.figure(figsize=(8, 5))
-        x = range(len(questions))
-        width = 0.15
-        
-        # Obtener qué opciones existen realmente (A, B, C, D, E)
-        OPCIONES = ["A", "B", "C", "D", "E"]
-        colors_list = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8']
-        
-        for idx, opt in enumerate(OPCIONES):
-            # Solo pintar si al menos una pregunta tiene esta opción (evita errores si n_opciones < 5)
-            vals = [q.get(opt, 0) for q in question_data]
-            if any(v > 0 for v in vals):
-                plt.bar([p + (idx * width) for p in x], vals, width, label=opt, color=colors_list[idx])
-        
-        plt.title("Porcentaje de aciertos por opción (%)")
-        plt.xticks([p + 2 * width for p in x], questions)
-        plt.ylim(0, 105)
-        plt.legend()
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-        
-        img_buffer2 = io.BytesIO()
-        plt.savefig(img_buffer2, format='png', bbox_inches='tight')
-        img_buffer2.seek(0)
-        plt.close()
-        
-        elements.append(Image(img_buffer2, width=450, height=280))
+        with telemetry.span("pdf_charts"):
+            # 1. Gráfico de Puntuación Media
+            elements.append(Image(grafico_puntuacion_media(question_data), width=400, height=250))
+            elements.append(Spacer(1, 20))
+
+            # 2. Gráfico de Aciertos por Opción
+            elements.append(Image(grafico_aciertos_opcion(question_data), width=450, height=280))
 
     doc.build(elements)
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": "attachment; filename=reporte_examen.pdf"
-        }
-    )
+    telemetry.observar("stage_seconds", time.perf_counter() - inicio, "pdf")
+
+
+def etag_sesion(sesion) -> str:
+    """ETag del informe: cambia solo si cambian los resultados guardados."""
+    digest = hashlib.sha256()
+    firma_resultados(sesion, digest)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def _pdf_vigente(sesion, etag: str) -> bool:
+    try:
+        return sesion.contiene("reporte.pdf") and sesion.leer("reporte.etag").decode() == etag
+    except FileNotFoundError:
+        return False
+
+
+def generar_pdf_sesion(session_id: str, etag: str):
+    """
+    Deja reporte.pdf en la sesión, generándolo solo si no existe o si se
+    generó con otros resultados (ETag distinto). Bloqueante: se ejecuta en el
+    pool de trabajadores.
+    """
+    sesion = storage.sesion(session_id)
+    if _pdf_vigente(sesion, etag):
+        return
+
+    # Se genera en un temporal y se guarda entero, por si dos peticiones lo
+    # generan a la vez
+    fd, tmp_name = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    tmp_pdf = Path(tmp_name)
+    try:
+        generar_pdf(sesion, tmp_pdf)
+        sesion.escribir_archivo("reporte.pdf", tmp_pdf, mover=True)
+    finally:
+        tmp_pdf.unlink(missing_ok=True)
+    sesion.escribir("reporte.etag", etag.encode())
+
+
+@app.get("/export-pdf/{session_id}")
+async def export_pdf(session_id: str, request: Request):
+    sesion = storage.sesion(session_id)
+
+    etag = session_cache.get(session_id, "etag")
+    if etag is None:
+        if not await asyncio.to_thread(tiene_resultados, sesion):
+            raise HTTPException(404, "Datos no encontrados para esta sesión")
+        etag = await asyncio.to_thread(etag_sesion, sesion)
+        session_cache.put(session_id, "etag", etag)
+    if coincide_etag(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    if not await asyncio.to_thread(_pdf_vigente, sesion, etag):
+        await run_in_worker(generar_pdf_sesion, session_id, etag)
+
+    return await respuesta_archivo(request, sesion, "reporte.pdf", "application/pdf", "reporte_examen.pdf", etag=etag)
 
 @app.get("/preview/{session_id}")
 def get_preview(session_id: str):
-    path = SESSIONS_DIR / session_id / "preview.json"
-    if not path.exists():
-        raise HTTPException(404, "Sesión no encontrada")
-    return json.loads(path.read_text(encoding="utf-8"))
+    contenido = session_cache.get(session_id, "preview")
+    if contenido is None:
+        sesion = storage.sesion(session_id)
+        if not tiene_resultados(sesion):
+            raise HTTPException(404, "Sesión no encontrada")
+        contenido = preview_json(sesion)
+        session_cache.put(session_id, "preview", contenido)
+    return Response(contenido, media_type="application/json")
 
 @app.get("/metrics/{session_id}")
 def get_metrics(session_id: str):
-    path = SESSIONS_DIR / session_id / "metrics.json"
-    if not path.exists():
-        raise HTTPException(404, "Sesión no encontrada")
-    return json.loads(path.read_text(encoding="utf-8"))
+    contenido = session_cache.get(session_id, "metrics")
+    if contenido is None:
+        sesion = storage.sesion(session_id)
+        if not tiene_resultados(sesion):
+            raise HTTPException(404, "Sesión no encontrada")
+        contenido = metrics_json(sesion)
+        session_cache.put(session_id, "metrics", contenido)
+    return Response(contenido, media_type="application/json")
+
+
+def _indice_analitico(authorization: str = Header(None)) -> AnalyticsIndex:
+    """Dependencia de las rutas /analytics: índice activado y ANALYTICS_API_KEY correcta."""
+    if analytics_index is None:
+        raise HTTPException(404, "El índice analítico está desactivado")
+    if authorization is None or not hmac.compare_digest(
+        authorization.encode("utf-8"), f"Bearer {ANALYTICS_API_KEY}".encode("utf-8")
+    ):
+        raise HTTPException(401, "Falta la clave del índice analítico o no es válida",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return analytics_index
+
+
+def _periodo(desde, hasta):
+    """desde/hasta (fechas ISO, AAAA-MM-DD o con hora) como timestamps."""
+    try:
+        return (
+            datetime.fromisoformat(desde).timestamp() if desde else None,
+            datetime.fromisoformat(hasta).timestamp() if hasta else None,
+        )
+    except ValueError:
+        raise HTTPException(400, "desde y hasta deben ser fechas ISO (AAAA-MM-DD)")
+
+
+@app.get("/analytics/exams")
+def get_analytics_exams(desde: str = None, hasta: str = None, grupo: str = None,
+                        indice: AnalyticsIndex = Depends(_indice_analitico)):
+    """Exámenes corregidos en el periodo (hasta excluido), opcionalmente de un grupo."""
+    inicio, fin = _periodo(desde, hasta)
+    return {"examenes": indice.examenes(inicio, fin, grupo)}
+
+
+@app.get("/analytics/questions")
+def get_analytics_questions(desde: str = None, hasta: str = None, grupo: str = None,
+                            indice: AnalyticsIndex = Depends(_indice_analitico)):
+    """Estadísticas de cada pregunta sumando todos los exámenes del periodo."""
+    inicio, fin = _periodo(desde, hasta)
+    return {"preguntas": indice.preguntas(inicio, fin, grupo)}
+
+
+@app.get("/analytics/questions/{question}")
+def get_analytics_question(question: str, desde: str = None, hasta: str = None, grupo: str = None,
+                           indice: AnalyticsIndex = Depends(_indice_analitico)):
+    """Una pregunta (P7...) en el conjunto del periodo y en cada examen."""
+    inicio, fin = _periodo(desde, hasta)
+    total = indice.preguntas(inicio, fin, grupo, question=question)
+    if not total:
+        raise HTTPException(404, f"No hay datos de la pregunta {question} en el periodo")
+    return {**total[0], "por_examen": indice.pregunta_por_examen(question, inicio, fin, grupo)}
+
+
+@app.get("/analytics/students/{dni}")
+def get_analytics_student(dni: str, indice: AnalyticsIndex = Depends(_indice_analitico)):
+    """Notas de un alumno en los exámenes cuyas sesiones no han caducado, por fecha."""
+    notas = indice.notas_alumno(dni)
+    if not notas:
+        raise HTTPException(404, f"No hay notas del DNI {dni}")
+    presentadas = [fila["nota"] for fila in notas if fila["presentado"]]
+    return {
+        "dni": dni,
+        "examenes": len(notas),
+        "media": round(sum(presentadas) / len(presentadas), 2) if presentadas else 0,
+        "notas": notas,
+    }
+
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return {"results": result_cache.stats(), "sessions": session_cache.stats()}
+
+@app.get("/sessions/gc/stats")
+def get_session_gc_stats():
+    return session_sweeper.stats()
+
+@app.get("/metrics")
+def get_prometheus_metrics():
+    """Métricas del servidor en formato Prometheus (ver telemetry)."""
+    workers = workers_status()
+    cache = session_cache.stats()
+    gc = session_sweeper.stats()
+    extra = [
+        *telemetry.gauge("gradepilot_worker_active_jobs", "Trabajos en ejecución o en cola en el pool.", workers["active_jobs"]),
+        *telemetry.gauge("gradepilot_worker_capacity", "Trabajos que admite el pool (trabajadores + cola).",
+                         workers["pool_size"] + workers["queue_size"]),
+        *telemetry.gauge("gradepilot_session_cache_hits_total", "Aciertos de la caché de sesiones.", cache["hits"], "counter"),
+        *telemetry.gauge("gradepilot_session_cache_misses_total", "Fallos de la caché de sesiones.", cache["misses"], "counter"),
+        *telemetry.gauge("gradepilot_session_cache_bytes", "Bytes ocupados por la caché de sesiones.", cache["bytes"]),
+        *telemetry.gauge("gradepilot_sessions_removed_total", "Sesiones caducadas borradas.", gc["sessions_removed"], "counter"),
+    ]
+    return Response(telemetry.exposicion(extra), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "workers": workers_status()}
 
 
 if __name__ == "__main__":
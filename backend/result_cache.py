@@ -0,0 +1,196 @@
+"""
+Caché de resultados direccionada por contenido.
+
+La clave es el SHA-256 del archivo subido junto con n_opciones y n_preguntas,
+de modo que volver a subir el mismo Excel con la misma configuración reutiliza
+la sesión ya corregida en lugar de repetir lectura, corrección y Excel.
+
+El índice vive en el almacén de sesiones (storage.py), con un JSON pequeño
+por clave (".results/<clave>.json"), para que lo compartan todos los
+trabajadores y réplicas que usen el mismo almacén. Los contadores de
+aciertos/fallos son del proceso actual.
+
+El orden de expulsión es el de la última escritura de cada entrada: al
+usarla se vuelve a escribir, como mucho una vez cada BARRIDO_SEGUNDOS.
+
+La expulsión no recorre el índice en cada escritura: se cuenta cuántas
+entradas hay y solo se recorre cuando se pasa de max_entries (y entonces se
+baja hasta un MARGEN_EXPULSION por debajo, para que el siguiente recorrido
+tarde en llegar) o cuando han pasado BARRIDO_SEGUNDOS desde el último. La
+cuenta es del proceso actual; el barrido periódico la corrige con las
+entradas que añaden los demás. Las entradas caducadas que aún no se han
+borrado se ignoran al leerlas.
+"""
+import hashlib
+import json
+import threading
+import time
+
+INDEX_PREFIX = ".results"
+# Fracción de max_entries que se deja libre al expulsar por número de entradas
+MARGEN_EXPULSION = 0.1
+# Máximo entre dos recorridos del índice (expulsión por antigüedad), y entre
+# dos marcas de uso de una misma entrada
+BARRIDO_SEGUNDOS = 300
+
+
+def clave_contenido(contenido: bytes, n_opciones: int, n_preguntas: int) -> str:
+    digest = hashlib.sha256(contenido).hexdigest()
+    return f"{digest}-{n_opciones}-{n_preguntas}"
+
+
+class ResultCache:
+    """
+    Índice clave de contenido -> sesión, con expulsión por antigüedad desde el
+    último uso y por número máximo de entradas (se expulsan primero las usadas
+    hace más tiempo).
+    """
+
+    def __init__(self, storage, max_entries: int, max_age_seconds: int):
+        self.storage = storage
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._barrido = threading.Lock()
+        # Entradas en el índice (None: aún sin contar) y hora del último recorrido
+        self._n_entradas = None
+        self._ultimo_barrido = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry_key(self, clave: str) -> str:
+        return f"{INDEX_PREFIX}/{clave}.json"
+
+    def _leer(self, clave: str):
+        key = self._entry_key(clave)
+        info = self.storage.info(key)
+        if info is None:
+            return None
+        try:
+            entrada = json.loads(self.storage.leer(key))
+        except (OSError, ValueError):
+            return None
+
+        ultimo_uso = info[1]
+        if time.time() - ultimo_uso > self.max_age_seconds:
+            self._borrar(key)
+            return None
+
+        session_id = entrada.get("session_id")
+        # La sesión pudo borrarse por la limpieza de sesiones antiguas
+        if session_id and not self.storage.sesion(session_id).contiene("metrics.json"):
+            entrada.pop("session_id")
+            if not entrada.get("validation"):
+                self._borrar(key)
+                return None
+
+        # Marcar como usada recientemente (orden de expulsión)
+        if time.time() - ultimo_uso > BARRIDO_SEGUNDOS:
+            try:
+                self.storage.escribir(key, json.dumps(entrada).encode("utf-8"))
+            except OSError:
+                pass
+        return entrada
+
+    def _borrar(self, key: str):
+        self.storage.borrar(key)
+        with self._lock:
+            self.evictions += 1
+            if self._n_entradas:
+                self._n_entradas -= 1
+
+    def _contar(self, acierto: bool):
+        with self._lock:
+            if acierto:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_session(self, clave: str):
+        """session_id de una corrección ya hecha con este contenido, o None."""
+        entrada = self._leer(clave)
+        session_id = entrada.get("session_id") if entrada else None
+        self._contar(session_id is not None)
+        return session_id
+
+    def get_validation(self, clave: str):
+        """Resultado guardado de /validate para este contenido, o None."""
+        entrada = self._leer(clave)
+        validacion = entrada.get("validation") if entrada else None
+        self._contar(validacion is not None)
+        return validacion
+
+    def _guardar(self, clave: str, **campos):
+        key = self._entry_key(clave)
+        nueva = False
+        try:
+            entrada = json.loads(self.storage.leer(key))
+        except (OSError, ValueError):
+            entrada = {"created_at": time.time()}
+            nueva = True
+        entrada.update(campos)
+        self.storage.escribir(key, json.dumps(entrada).encode("utf-8"))
+
+        with self._lock:
+            if nueva and self._n_entradas is not None:
+                self._n_entradas += 1
+            barrer = (
+                self._n_entradas is None
+                or self._n_entradas > self.max_entries
+                or time.monotonic() - self._ultimo_barrido > BARRIDO_SEGUNDOS
+            )
+        if barrer:
+            self._expulsar()
+
+    def put_session(self, clave: str, session_id: str):
+        self._guardar(clave, session_id=session_id)
+
+    def put_validation(self, clave: str, validacion: dict):
+        self._guardar(clave, validation=validacion)
+
+    def _expulsar(self):
+        """Recorre el índice y borra las entradas caducadas y las sobrantes."""
+        # Un solo recorrido a la vez; si ya hay uno en marcha, basta con ese
+        if not self._barrido.acquire(blocking=False):
+            return
+        try:
+            self._recorrer_indice()
+        finally:
+            self._barrido.release()
+
+    def _recorrer_indice(self):
+        ahora = time.time()
+        entradas = []
+        archivos, _ = self.storage.listar(f"{INDEX_PREFIX}/")
+        for nombre, _, modificado in archivos:
+            if not nombre.endswith(".json"):
+                continue
+            key = f"{INDEX_PREFIX}/{nombre}"
+            if ahora - modificado > self.max_age_seconds:
+                self._borrar(key)
+            else:
+                entradas.append((modificado, key))
+
+        if len(entradas) > self.max_entries:
+            conservar = int(self.max_entries * (1 - MARGEN_EXPULSION))
+            entradas.sort()
+            for _, key in entradas[:len(entradas) - conservar]:
+                self._borrar(key)
+            entradas = entradas[len(entradas) - conservar:]
+
+        with self._lock:
+            self._n_entradas = len(entradas)
+            self._ultimo_barrido = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 3) if total else 0,
+                "max_entries": self.max_entries,
+                "max_age_seconds": self.max_age_seconds,
+            }
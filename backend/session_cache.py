@@ -0,0 +1,94 @@
+"""
+Caché en memoria de las sesiones consultadas recientemente.
+
+Tras cada corrección la interfaz pide /preview y /metrics, y al recargar la
+página los vuelve a pedir. Aquí se guardan, por sesión, las respuestas ya
+serializadas (preview, métricas, ETag del informe y, si es pequeño, el Excel
+corregido) para no volver a leerlas de disco.
+
+Límites:
+- Tamaño total en bytes: al superarlo se expulsan las entradas usadas hace
+  más tiempo.
+- TTL: una entrada caduca a los ttl_seconds de guardarse.
+
+Es una caché por proceso: la limpieza de sesiones la invalida al borrar una
+sesión, y un acierto no consulta el almacén (get no bloquea el bucle de
+eventos). Si la sesión la borra otro proceso, aquí sigue sirviéndose como
+mucho ttl_seconds; la limpieza solo borra sesiones sin modificar desde hace
+mucho más tiempo.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class SessionCache:
+    def __init__(self, max_bytes: int, ttl_seconds: int, max_blob_bytes: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_blob_bytes = max_blob_bytes
+        self._lock = threading.Lock()
+        # (session_id, nombre) -> (guardado_en, valor); el orden es el de uso
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _quitar(self, clave):
+        _, valor = self._entradas.pop(clave)
+        self._bytes -= len(valor)
+
+    def get(self, session_id: str, nombre: str):
+        """Valor guardado (bytes o str) o None."""
+        clave = (session_id, nombre)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and time.time() - entrada[0] > self.ttl_seconds:
+                self._quitar(clave)
+                self.evictions += 1
+                entrada = None
+            if entrada is None:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return entrada[1]
+
+    def put(self, session_id: str, nombre: str, valor):
+        if len(valor) > self.max_bytes:
+            return
+        clave = (session_id, nombre)
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            self._entradas[clave] = (time.time(), valor)
+            self._bytes += len(valor)
+            while self._bytes > self.max_bytes:
+                self._quitar(next(iter(self._entradas)))
+                self.evictions += 1
+
+    def put_blob(self, session_id: str, nombre: str, valor: bytes):
+        """Como put, pero solo si el archivo es pequeño (max_blob_bytes)."""
+        if len(valor) <= self.max_blob_bytes:
+            self.put(session_id, nombre, valor)
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            for clave in [clave for clave in self._entradas if clave[0] == session_id]:
+                self._quitar(clave)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 3) if total else 0,
+                "entries": len(self._entradas),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "max_blob_bytes": self.max_blob_bytes,
+            }
@@ -0,0 +1,160 @@
+"""
+Limpieza incremental de sesiones antiguas.
+
+Recorrer todo SESSIONS_DIR en cada arranque no escala con cientos de miles de
+sesiones. En su lugar se mantiene un índice por antigüedad, guardado en el
+propio almacén de sesiones (storage.py) como marcas vacías:
+
+    .expiry/<hora>/<session_id>
+
+donde <hora> es el instante de creación o última modificación dividido entre
+bucket_seconds. Cada pasada (tick) solo abre los cubos más antiguos que el
+límite de retención y procesa como mucho batch_size sesiones, de modo que el
+coste por pasada está acotado sea cual sea el número de sesiones.
+
+La antigüedad de una sesión sigue siendo la fecha de su última modificación:
+si una sesión del índice se ha modificado después (por ejemplo, al generar el
+Excel o el PDF), se vuelve a indexar en su cubo nuevo en lugar de borrarla.
+
+Las sesiones creadas antes de existir el índice (en disco local, directamente
+bajo SESSIONS_DIR) se indexan y se mueven a su subdirectorio poco a poco en
+las primeras pasadas, también en lotes de batch_size.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger("corrector")
+
+INDEX_PREFIX = ".expiry"
+BOOTSTRAP_DONE_KEY = f"{INDEX_PREFIX}/.bootstrap_done"
+
+
+class SessionSweeper:
+    def __init__(self, storage, max_age_seconds: int, batch_size: int,
+                 bucket_seconds: int = 3600, on_removed=None):
+        self.storage = storage
+        self.max_age_seconds = max_age_seconds
+        self.batch_size = batch_size
+        self.bucket_seconds = bucket_seconds
+        self.on_removed = on_removed
+
+        self._lock = threading.Lock()
+        self._bootstrap = None
+        self.sessions_removed = 0
+        self.bytes_reclaimed = 0
+        self.ticks = 0
+        self.last_tick_at = None
+        self.last_tick_seconds = None
+        self.last_tick_removed = 0
+
+    # ===== ÍNDICE =====
+
+    def _bucket(self, instante: float) -> int:
+        return int(instante // self.bucket_seconds)
+
+    def registrar(self, session_id: str, instante: float = None):
+        """Añade una sesión al índice (por defecto, con la hora actual)."""
+        if instante is None:
+            instante = time.time()
+        self.storage.escribir(f"{INDEX_PREFIX}/{self._bucket(instante)}/{session_id}", b"")
+
+    def _indexar_existentes(self, limite: int) -> int:
+        """Indexa hasta `limite` sesiones anteriores al índice. Devuelve cuántas."""
+        if self.storage.info(BOOTSTRAP_DONE_KEY) is not None:
+            return 0
+        if self._bootstrap is None:
+            self._bootstrap = self.storage.sesiones_heredadas()
+
+        indexadas = 0
+        for session_id, ultima_modificacion in self._bootstrap:
+            self.registrar(session_id, ultima_modificacion)
+            indexadas += 1
+            if indexadas >= limite:
+                return indexadas
+
+        self._bootstrap = None
+        self.storage.escribir(BOOTSTRAP_DONE_KEY, b"")
+        logger.info("Índice de caducidad de sesiones completado")
+        return indexadas
+
+    # ===== LIMPIEZA =====
+
+    def _borrar_sesion(self, session_id: str) -> int:
+        liberados = self.storage.borrar_sesion(session_id)
+        if self.on_removed is not None:
+            self.on_removed(session_id)
+        return liberados
+
+    def tick(self) -> int:
+        """
+        Una pasada acotada: borra las sesiones caducadas de los cubos más
+        antiguos. Devuelve el número de sesiones examinadas (si es igual a
+        batch_size, probablemente queda trabajo pendiente).
+        """
+        with self._lock:
+            inicio = time.perf_counter()
+            ahora = time.time()
+            limite = ahora - self.max_age_seconds
+            examinadas = self._indexar_existentes(self.batch_size)
+            borradas = 0
+            bytes_liberados = 0
+
+            _, carpetas = self.storage.listar(f"{INDEX_PREFIX}/")
+            buckets = sorted(int(nombre) for nombre in carpetas if nombre.isdigit())
+            for bucket in buckets:
+                if bucket * self.bucket_seconds >= limite or examinadas >= self.batch_size:
+                    break
+                prefijo_bucket = f"{INDEX_PREFIX}/{bucket}/"
+                marcas, _ = self.storage.listar(prefijo_bucket)
+
+                for session_id, _, _ in marcas:
+                    if examinadas >= self.batch_size:
+                        break
+                    examinadas += 1
+                    marca = prefijo_bucket + session_id
+                    try:
+                        ultima_modificacion = self.storage.ultima_modificacion(session_id)
+                        if ultima_modificacion is None:
+                            # Ya borrada por otro proceso o a mano
+                            self.storage.borrar(marca)
+                            continue
+
+                        if ultima_modificacion > limite:
+                            if self._bucket(ultima_modificacion) != bucket:
+                                self.registrar(session_id, ultima_modificacion)
+                                self.storage.borrar(marca)
+                            continue
+
+                        bytes_liberados += self._borrar_sesion(session_id)
+                        borradas += 1
+                        self.storage.borrar(marca)
+                    except Exception as e:
+                        logger.warning(f"No se pudo limpiar la sesión {session_id}: {e}")
+
+                self.storage.borrar_carpeta_vacia(prefijo_bucket)
+
+            self.ticks += 1
+            self.sessions_removed += borradas
+            self.bytes_reclaimed += bytes_liberados
+            self.last_tick_at = ahora
+            self.last_tick_seconds = round(time.perf_counter() - inicio, 4)
+            self.last_tick_removed = borradas
+
+        if borradas:
+            logger.info(f"Limpieza de sesiones antiguas: {borradas} sesiones eliminadas ({bytes_liberados} bytes)")
+        return examinadas
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions_removed": self.sessions_removed,
+                "bytes_reclaimed": self.bytes_reclaimed,
+                "ticks": self.ticks,
+                "last_tick_at": self.last_tick_at,
+                "last_tick_seconds": self.last_tick_seconds,
+                "last_tick_removed": self.last_tick_removed,
+                "index_complete": self.storage.info(BOOTSTRAP_DONE_KEY) is not None,
+                "max_age_seconds": self.max_age_seconds,
+                "batch_size": self.batch_size,
+            }
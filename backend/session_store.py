@@ -0,0 +1,146 @@
+"""
+Resultados guardados de una sesión.
+
+- grades.npz: notas por columnas (DNI en UTF-8, nota en centésimas como
+  int32 y presentado como bool). Ocupa una fracción del antiguo preview.json
+  y se carga sin parsear JSON.
+- metrics.json: métricas serializadas con orjson. /metrics lo sirve tal cual,
+  sin volver a parsearlo.
+
+Las notas siempre se redondean a dos decimales, así que guardarlas en
+centésimas y dividir entre 100 al leer devuelve exactamente el mismo float.
+
+Las funciones reciben una Sesion (storage.py), así que sirven para cualquier
+almacén de sesiones.
+
+Migración: las sesiones antiguas (preview.json) se convierten al formato
+nuevo la primera vez que se accede a ellas. También pueden migrarse todas de
+una vez con:
+
+    python session_store.py [directorio_de_sesiones]
+"""
+import io
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import orjson
+
+from storage import Sesion, crear_storage
+
+GRADES_FILE = "grades.npz"
+METRICS_FILE = "metrics.json"
+LEGACY_PREVIEW_FILE = "preview.json"
+
+
+@dataclass
+class Notas:
+    dnis: list                # DNI saneados, en orden de fila
+    notas: np.ndarray         # float64
+    presentados: np.ndarray   # bool
+
+    def __len__(self):
+        return len(self.dnis)
+
+    def filas(self):
+        """Lista de tuplas (dni, nota, presentado)."""
+        return list(zip(self.dnis, self.notas.tolist(), self.presentados.tolist()))
+
+
+def _guardar_notas(sesion: Sesion, dnis, notas, presentados):
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        dni=np.array([dni.encode("utf-8") for dni in dnis], dtype=np.bytes_),
+        centesimas=np.rint(np.asarray(notas, dtype=np.float64) * 100).astype(np.int32),
+        presentado=np.asarray(presentados, dtype=bool),
+    )
+    sesion.escribir(GRADES_FILE, buffer.getvalue())
+
+
+def guardar_resultados(sesion: Sesion, dnis, notas, presentados, metrics: dict):
+    """Guarda las notas y las métricas de una corrección."""
+    _guardar_notas(sesion, dnis, notas, presentados)
+    sesion.escribir(METRICS_FILE, orjson.dumps(metrics))
+
+
+def tiene_resultados(sesion: Sesion) -> bool:
+    return sesion.contiene(METRICS_FILE) and (
+        sesion.contiene(GRADES_FILE) or sesion.contiene(LEGACY_PREVIEW_FILE)
+    )
+
+
+def migrar_sesion(sesion: Sesion) -> bool:
+    """
+    Convierte una sesión con preview.json al formato actual. Devuelve True si
+    había algo que migrar.
+    """
+    if sesion.contiene(GRADES_FILE) or not sesion.contiene(LEGACY_PREVIEW_FILE):
+        return False
+
+    preview = orjson.loads(sesion.leer(LEGACY_PREVIEW_FILE))
+    _guardar_notas(
+        sesion,
+        [str(row["dni"]) for row in preview],
+        [row["nota"] for row in preview],
+        [row["presentado"] for row in preview],
+    )
+    if sesion.contiene(METRICS_FILE):
+        # Reescribe con orjson el JSON del módulo json (con espacios)
+        sesion.escribir(METRICS_FILE, orjson.dumps(orjson.loads(sesion.leer(METRICS_FILE))))
+    sesion.borrar(LEGACY_PREVIEW_FILE)
+    return True
+
+
+def migrar_sesiones(storage) -> int:
+    migradas = 0
+    for session_id in storage.sesiones():
+        if migrar_sesion(storage.sesion(session_id)):
+            migradas += 1
+    return migradas
+
+
+def cargar_notas(sesion: Sesion) -> Notas:
+    migrar_sesion(sesion)
+    with np.load(io.BytesIO(sesion.leer(GRADES_FILE))) as datos:
+        return Notas(
+            dnis=[dni.decode("utf-8") for dni in datos["dni"].tolist()],
+            notas=datos["centesimas"] / 100,
+            presentados=datos["presentado"],
+        )
+
+
+def cargar_metrics(sesion: Sesion) -> dict:
+    return orjson.loads(metrics_json(sesion))
+
+
+def metrics_json(sesion: Sesion) -> bytes:
+    """metrics.json tal como está guardado, listo para enviarlo."""
+    migrar_sesion(sesion)
+    return sesion.leer(METRICS_FILE)
+
+
+def preview_json(sesion: Sesion) -> bytes:
+    """Respuesta de /preview: lista de {dni, nota, presentado} en JSON."""
+    notas = cargar_notas(sesion)
+    # orjson serializa dicts en C: es más rápido que componer el JSON a mano,
+    # fila a fila o por columnas (benchmarks/bench_preview.py)
+    return orjson.dumps([
+        {"dni": dni, "nota": nota, "presentado": presentado}
+        for dni, nota, presentado in notas.filas()
+    ])
+
+
+def firma_resultados(sesion: Sesion, digest):
+    """Añade a digest (hashlib) el contenido de los resultados guardados."""
+    migrar_sesion(sesion)
+    digest.update(sesion.leer(METRICS_FILE))
+    digest.update(sesion.leer(GRADES_FILE))
+
+
+if __name__ == "__main__":
+    directorio = Path(sys.argv[1] if len(sys.argv) > 1 else "sessions")
+    storage = crear_storage(os.getenv("SESSION_STORAGE", "local"), directorio)
+    print(f"Sesiones migradas: {migrar_sesiones(storage)}")
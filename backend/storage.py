@@ -0,0 +1,518 @@
+"""
+Almacenamiento de los archivos de sesión.
+
+Todos los endpoints que leen o escriben archivos de una sesión (status.json,
+original.xlsx, grades.npz, metrics.json, examen.xlsx, reporte.pdf...) pasan
+por aquí, a través de un objeto Sesion, en lugar de construir rutas a mano.
+
+Implementaciones (variable de entorno SESSION_STORAGE):
+- "local" (por defecto): sistema de archivos, con las sesiones repartidas en
+  subdirectorios por hash (SESSIONS_DIR/ab/cd/<session_id>/), para que ningún
+  directorio acumule cientos de miles de entradas. Las sesiones antiguas
+  (SESSIONS_DIR/<session_id>/) se siguen encontrando y la limpieza de
+  sesiones las mueve a su subdirectorio.
+- "object": almacén de objetos compatible con S3 (boto3, dependencia
+  opcional). SESSION_STORAGE_BUCKET, SESSION_STORAGE_PREFIX y
+  SESSION_STORAGE_ENDPOINT_URL (MinIO, etc.). Permite varias réplicas del
+  backend detrás de un balanceador.
+- "object-local": la misma implementación de almacén de objetos sobre un
+  cliente local que imita la parte usada de la API de S3, guardando cada
+  objeto como un archivo bajo SESSIONS_DIR. Sirve para probarla sin S3.
+
+Las claves son rutas con "/" relativas a la raíz del almacén. Además de las
+sesiones, aquí se guardan el índice de la limpieza de sesiones (".expiry/..."),
+las subidas validadas (".uploads/...", ver uploads.py) y el índice de la caché
+de resultados (".results/...", ver result_cache.py), de modo que todas las
+réplicas que comparten el almacén ven lo mismo.
+"""
+import hashlib
+import io
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+def _validar_session_id(session_id: str):
+    # Solo UUID: evita que un session_id manipulado salga de la sesión
+    try:
+        uuid.UUID(session_id)
+    except (ValueError, TypeError, AttributeError):
+        raise FileNotFoundError(f"Sesión no válida: {session_id!r}")
+
+
+def prefijo_sharded(session_id: str) -> str:
+    digest = hashlib.sha1(session_id.encode("ascii")).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}/{session_id}"
+
+
+class Sesion:
+    """Archivos de una sesión concreta dentro de un almacén."""
+
+    def __init__(self, storage, session_id: str):
+        self.storage = storage
+        self.session_id = session_id
+
+    def _clave(self, nombre: str) -> str:
+        return f"{self.storage.prefijo_sesion(self.session_id)}/{nombre}"
+
+    def leer(self, nombre: str) -> bytes:
+        """Contenido del archivo; FileNotFoundError si no existe."""
+        return self.storage.leer(self._clave(nombre))
+
+    def escribir(self, nombre: str, datos: bytes):
+        """Escritura atómica: un lector nunca ve el archivo a medias."""
+        self.storage.escribir(self._clave(nombre), datos)
+
+    def escribir_archivo(self, nombre: str, origen: Path, mover: bool = False):
+        """Guarda un archivo local (moviéndolo si mover=True)."""
+        self.storage.escribir_archivo(self._clave(nombre), origen, mover)
+
+    def borrar(self, nombre: str):
+        self.storage.borrar(self._clave(nombre))
+
+    def contiene(self, nombre: str) -> bool:
+        try:
+            return self.storage.info(self._clave(nombre)) is not None
+        except FileNotFoundError:
+            return False
+
+    def info(self, nombre: str):
+        """(tamaño, última modificación) o None si no existe."""
+        return self.storage.info(self._clave(nombre))
+
+    def tamano(self, nombre: str) -> int:
+        info = self.storage.info(self._clave(nombre))
+        if info is None:
+            raise FileNotFoundError(nombre)
+        return info[0]
+
+    def abrir(self, nombre: str):
+        """Archivo binario abierto para leer en streaming."""
+        return self.storage.abrir(self._clave(nombre))
+
+    def ruta_local(self, nombre: str):
+        """Ruta en disco si el almacén es local (para FileResponse), o None."""
+        return self.storage.ruta_local(self._clave(nombre))
+
+
+class SessionStorage:
+    """
+    Interfaz común. Las subclases implementan las operaciones por clave;
+    las operaciones por sesión se construyen sobre ellas.
+    """
+
+    # ===== OPERACIONES POR CLAVE =====
+
+    def leer(self, clave: str) -> bytes:
+        raise NotImplementedError
+
+    def escribir(self, clave: str, datos: bytes):
+        raise NotImplementedError
+
+    def escribir_archivo(self, clave: str, origen: Path, mover: bool = False):
+        raise NotImplementedError
+
+    def abrir(self, clave: str):
+        raise NotImplementedError
+
+    def info(self, clave: str):
+        """(tamaño, última modificación) o None si no existe."""
+        raise NotImplementedError
+
+    def borrar(self, clave: str):
+        raise NotImplementedError
+
+    def listar(self, prefijo: str):
+        """(archivos, subcarpetas) directamente bajo prefijo ("a/b/")."""
+        raise NotImplementedError
+
+    def ruta_local(self, clave: str):
+        return None
+
+    def borrar_carpeta_vacia(self, prefijo: str):
+        """Los almacenes de objetos no tienen carpetas: por defecto no hace nada."""
+
+    # ===== OPERACIONES POR SESIÓN =====
+
+    def prefijo_sesion(self, session_id: str) -> str:
+        _validar_session_id(session_id)
+        return prefijo_sharded(session_id)
+
+    def sesion(self, session_id: str) -> Sesion:
+        return Sesion(self, session_id)
+
+    def crear_sesion(self, session_id: str) -> Sesion:
+        return self.sesion(session_id)
+
+    def existe(self, session_id: str) -> bool:
+        return self.ultima_modificacion(session_id) is not None
+
+    def ultima_modificacion(self, session_id: str):
+        """Fecha de la última escritura en la sesión, o None si no existe."""
+        try:
+            prefijo = self.prefijo_sesion(session_id)
+        except FileNotFoundError:
+            return None
+        archivos, _ = self.listar(prefijo + "/")
+        if not archivos:
+            return None
+        return max(mtime for _, _, mtime in archivos)
+
+    def borrar_sesion(self, session_id: str) -> int:
+        """Borra la sesión entera. Devuelve los bytes liberados."""
+        prefijo = self.prefijo_sesion(session_id)
+        archivos, _ = self.listar(prefijo + "/")
+        for nombre, _, _ in archivos:
+            self.borrar(f"{prefijo}/{nombre}")
+        return sum(tamano for _, tamano, _ in archivos)
+
+    def sesiones(self):
+        """Todos los session_id (recorre el almacén entero: solo para mantenimiento)."""
+        _, nivel1 = self.listar("")
+        for a in nivel1:
+            if len(a) != 2:
+                continue
+            for b in self.listar(f"{a}/")[1]:
+                yield from self.listar(f"{a}/{b}/")[1]
+
+    def sesiones_heredadas(self):
+        """(session_id, última modificación) de sesiones anteriores al reparto por hash."""
+        return iter(())
+
+
+# ===== SISTEMA DE ARCHIVOS LOCAL =====
+
+class LocalShardedStorage(SessionStorage):
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _ruta(self, clave: str) -> Path:
+        return self.root / clave
+
+    def prefijo_sesion(self, session_id: str) -> str:
+        prefijo = super().prefijo_sesion(session_id)
+        # Sesión antigua, aún sin mover a su subdirectorio
+        if not (self.root / prefijo).is_dir() and (self.root / session_id).is_dir():
+            return session_id
+        return prefijo
+
+    def crear_sesion(self, session_id: str) -> Sesion:
+        (self.root / self.prefijo_sesion(session_id)).mkdir(parents=True)
+        return self.sesion(session_id)
+
+    def leer(self, clave: str) -> bytes:
+        return self._ruta(clave).read_bytes()
+
+    def escribir(self, clave: str, datos: bytes):
+        path = self._ruta(clave)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(datos)
+        os.replace(tmp_path, path)
+
+    def escribir_archivo(self, clave: str, origen: Path, mover: bool = False):
+        path = self._ruta(clave)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if mover:
+            try:
+                os.replace(origen, path)
+                return
+            except OSError:
+                pass  # otro sistema de archivos: se copia
+        else:
+            # Enlace duro si es el mismo sistema de archivos
+            try:
+                path.unlink(missing_ok=True)
+                os.link(origen, path)
+                return
+            except OSError:
+                pass
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        shutil.copyfile(origen, tmp_path)
+        os.replace(tmp_path, path)
+        if mover:
+            Path(origen).unlink(missing_ok=True)
+
+    def abrir(self, clave: str):
+        return open(self._ruta(clave), "rb")
+
+    def info(self, clave: str):
+        try:
+            st = self._ruta(clave).stat()
+        except FileNotFoundError:
+            return None
+        return st.st_size, st.st_mtime
+
+    def borrar(self, clave: str):
+        self._ruta(clave).unlink(missing_ok=True)
+
+    def listar(self, prefijo: str):
+        archivos, carpetas = [], []
+        try:
+            with os.scandir(self._ruta(prefijo)) as entradas:
+                for entry in entradas:
+                    try:
+                        if entry.is_dir():
+                            carpetas.append(entry.name)
+                        elif not entry.name.endswith(".tmp"):
+                            st = entry.stat()
+                            archivos.append((entry.name, st.st_size, st.st_mtime))
+                    except FileNotFoundError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        return archivos, carpetas
+
+    def ruta_local(self, clave: str):
+        return self._ruta(clave)
+
+    def borrar_carpeta_vacia(self, prefijo: str):
+        try:
+            self._ruta(prefijo).rmdir()
+        except OSError:
+            pass
+
+    def ultima_modificacion(self, session_id: str):
+        # La fecha del directorio cambia con cada archivo creado o reemplazado
+        try:
+            return (self.root / self.prefijo_sesion(session_id)).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def borrar_sesion(self, session_id: str) -> int:
+        session_path = self.root / self.prefijo_sesion(session_id)
+        liberados = 0
+        for raiz, _, archivos in os.walk(session_path):
+            for nombre in archivos:
+                try:
+                    liberados += os.stat(os.path.join(raiz, nombre)).st_size
+                except OSError:
+                    continue
+        shutil.rmtree(session_path, ignore_errors=True)
+        if session_path.exists():
+            raise OSError(f"no se pudo borrar {session_path}")
+        return liberados
+
+    def sesiones(self):
+        yield from super().sesiones()
+        for session_id, _ in self._planas():
+            yield session_id
+
+    def _planas(self):
+        with os.scandir(self.root) as entradas:
+            for entry in entradas:
+                if len(entry.name) != 36:
+                    continue
+                try:
+                    _validar_session_id(entry.name)
+                    if entry.is_dir():
+                        yield entry.name, entry.stat().st_mtime
+                except (FileNotFoundError, OSError):
+                    continue
+
+    def sesiones_heredadas(self):
+        """
+        Mueve cada sesión antigua a su subdirectorio según se recorre y
+        devuelve (session_id, última modificación). El renombrado conserva
+        la fecha de modificación del directorio.
+        """
+        for session_id, mtime in self._planas():
+            destino = self.root / prefijo_sharded(session_id)
+            try:
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(self.root / session_id, destino)
+            except OSError:
+                pass  # sigue accesible en su ruta antigua
+            yield session_id, mtime
+
+
+# ===== ALMACÉN DE OBJETOS (S3) =====
+
+def _no_existe(error) -> bool:
+    codigo = getattr(error, "response", {}).get("Error", {}).get("Code")
+    return codigo in ("NoSuchKey", "404", "NotFound")
+
+
+# metrics.json está en toda sesión corregida (las únicas que guarda la caché)
+# y status.json en las que están en marcha
+ARCHIVOS_TESTIGO = ("metrics.json", "status.json")
+
+
+class ObjectStoreStorage(SessionStorage):
+    """
+    Sobre cualquier cliente con la API de boto3 para S3 (put_object,
+    get_object, head_object, delete_object, list_objects_v2).
+    """
+
+    def __init__(self, client, bucket: str, prefix: str = ""):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def _key(self, clave: str) -> str:
+        return self.prefix + clave
+
+    def leer(self, clave: str) -> bytes:
+        try:
+            respuesta = self.client.get_object(Bucket=self.bucket, Key=self._key(clave))
+        except Exception as e:
+            if _no_existe(e):
+                raise FileNotFoundError(clave) from e
+            raise
+        return respuesta["Body"].read()
+
+    def escribir(self, clave: str, datos: bytes):
+        # PUT es atómico: el objeto aparece completo o no aparece
+        self.client.put_object(Bucket=self.bucket, Key=self._key(clave), Body=datos)
+
+    def escribir_archivo(self, clave: str, origen: Path, mover: bool = False):
+        with open(origen, "rb") as f:
+            self.client.put_object(Bucket=self.bucket, Key=self._key(clave), Body=f)
+        if mover:
+            Path(origen).unlink(missing_ok=True)
+
+    def abrir(self, clave: str):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(clave))["Body"]
+        except Exception as e:
+            if _no_existe(e):
+                raise FileNotFoundError(clave) from e
+            raise
+
+    def info(self, clave: str):
+        try:
+            respuesta = self.client.head_object(Bucket=self.bucket, Key=self._key(clave))
+        except Exception as e:
+            if _no_existe(e):
+                return None
+            raise
+        return respuesta["ContentLength"], respuesta["LastModified"].timestamp()
+
+    def borrar(self, clave: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(clave))
+
+    def existe(self, session_id: str) -> bool:
+        # HEAD de un archivo que toda sesión tiene, en lugar de un LIST. Solo
+        # si no está ninguno se lista la sesión, para las que aún no han
+        # escrito ninguno.
+        try:
+            prefijo = self.prefijo_sesion(session_id)
+        except FileNotFoundError:
+            return False
+        if any(self.info(f"{prefijo}/{nombre}") is not None for nombre in ARCHIVOS_TESTIGO):
+            return True
+        return super().existe(session_id)
+
+    def listar(self, prefijo: str):
+        base = self._key(prefijo)
+        archivos, carpetas = [], []
+        kwargs = {"Bucket": self.bucket, "Prefix": base, "Delimiter": "/"}
+        while True:
+            respuesta = self.client.list_objects_v2(**kwargs)
+            for obj in respuesta.get("Contents", []):
+                archivos.append((obj["Key"][len(base):], obj["Size"], obj["LastModified"].timestamp()))
+            for comun in respuesta.get("CommonPrefixes", []):
+                carpetas.append(comun["Prefix"][len(base):].rstrip("/"))
+            if not respuesta.get("IsTruncated"):
+                return archivos, carpetas
+            kwargs["ContinuationToken"] = respuesta["NextContinuationToken"]
+
+
+class ErrorObjetoLocal(Exception):
+    def __init__(self, codigo: str):
+        super().__init__(codigo)
+        self.response = {"Error": {"Code": codigo}}
+
+
+class LocalObjectStoreClient:
+    """
+    Sustituto local de un cliente S3 con la misma interfaz que usa
+    ObjectStoreStorage. Cada objeto es un archivo en root/<bucket>/<key>.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def put_object(self, Bucket, Key, Body):
+        datos = Body if isinstance(Body, (bytes, bytearray)) else Body.read()
+        path = self._path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(datos)
+        os.replace(tmp_path, path)
+        return {}
+
+    def get_object(self, Bucket, Key):
+        try:
+            return {"Body": io.BytesIO(self._path(Bucket, Key).read_bytes())}
+        except (FileNotFoundError, IsADirectoryError):
+            raise ErrorObjetoLocal("NoSuchKey")
+
+    def head_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        if not path.is_file():
+            raise ErrorObjetoLocal("404")
+        st = path.stat()
+        return {"ContentLength": st.st_size,
+                "LastModified": datetime.fromtimestamp(st.st_mtime, tz=timezone.utc)}
+
+    def delete_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        path.unlink(missing_ok=True)
+        # Sin objetos debajo, el "directorio" deja de existir
+        raiz = self.root / Bucket
+        for padre in path.parents:
+            if padre == raiz:
+                break
+            try:
+                padre.rmdir()
+            except OSError:
+                break
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", Delimiter="/", ContinuationToken=None):
+        # Solo prefijos de carpeta completos ("a/b/"), que es lo que se usa
+        contents, prefixes = [], []
+        try:
+            with os.scandir(self._path(Bucket, Prefix)) as entradas:
+                for entry in sorted(entradas, key=lambda e: e.name):
+                    if entry.is_dir():
+                        prefixes.append({"Prefix": f"{Prefix}{entry.name}/"})
+                    elif not entry.name.endswith(".tmp"):
+                        st = entry.stat()
+                        contents.append({
+                            "Key": Prefix + entry.name, "Size": st.st_size,
+                            "LastModified": datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+                        })
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        return {"Contents": contents, "CommonPrefixes": prefixes, "IsTruncated": False}
+
+
+def crear_storage(tipo: str, sessions_dir: Path) -> SessionStorage:
+    """Almacén configurado por SESSION_STORAGE (ver el docstring del módulo)."""
+    if tipo == "local":
+        return LocalShardedStorage(sessions_dir)
+
+    if tipo == "object-local":
+        sessions_dir.mkdir(parents=True, exist_ok=True)
+        return ObjectStoreStorage(LocalObjectStoreClient(sessions_dir), "sessions")
+
+    if tipo == "object":
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("SESSION_STORAGE=object necesita boto3 (pip install boto3)")
+        bucket = os.getenv("SESSION_STORAGE_BUCKET")
+        if not bucket:
+            raise RuntimeError("SESSION_STORAGE=object necesita SESSION_STORAGE_BUCKET")
+        client = boto3.client("s3", endpoint_url=os.getenv("SESSION_STORAGE_ENDPOINT_URL") or None)
+        return ObjectStoreStorage(client, bucket, os.getenv("SESSION_STORAGE_PREFIX", "sessions"))
+
+    raise RuntimeError(f"SESSION_STORAGE no válido: {tipo!r} (local, object u object-local)")
@@ -0,0 +1,188 @@
+"""
+Métricas de rendimiento del backend, expuestas en formato de texto de
+Prometheus en /metrics (distinto de /metrics/{session_id}, que son las
+métricas de un examen).
+
+Histogramas:
+- gradepilot_stage_seconds{stage}: duración de cada etapa del trabajo
+  (lectura del archivo, corrección, estadísticas, guardado, Excel, gráficos,
+  PDF...), medida con span().
+- gradepilot_upload_bytes{endpoint}: tamaño de los archivos subidos.
+- gradepilot_exam_students y gradepilot_exam_questions: tamaño de los
+  exámenes corregidos.
+
+En modo "process" el trabajo se ejecuta en otro proceso, cuyos histogramas
+nadie consulta. Por eso el pool envuelve cada trabajo con recoger(): lo que
+se mide dentro se guarda en una lista que vuelve con el resultado y se
+registra en el proceso principal con registrar(). En modo "thread" se hace
+igual, para que el perfil de la petición reciba también esas etapas.
+
+Perfil por petición: dentro de perfilar() las etapas medidas se acumulan
+además en una lista propia de la petición (la cabecera X-Profile, ver main).
+
+Los histogramas son por proceso: con varios procesos de uvicorn, Prometheus
+debe consultar cada uno (o usarse un solo proceso con WORKER_MODE=process).
+"""
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Medidas pendientes de registrar en el proceso principal (dentro del pool)
+_recolector = contextvars.ContextVar("recolector_medidas", default=None)
+# Etapas de la petición en curso, si pidió perfil
+_perfil = contextvars.ContextVar("perfil_peticion", default=None)
+
+
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, limites, etiqueta=None):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.limites = sorted(limites)
+        self.etiqueta = etiqueta
+        self._lock = threading.Lock()
+        # valor de la etiqueta -> (cuentas por intervalo, +Inf al final; suma)
+        self._series = {}
+
+    def observar(self, valor: float, etiqueta=None):
+        intervalo = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(etiqueta)
+            if serie is None:
+                serie = self._series[etiqueta] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][intervalo] += 1
+            serie[1] += valor
+
+    def _etiquetas(self, etiqueta, **extra) -> str:
+        pares = []
+        if self.etiqueta is not None:
+            pares.append((self.etiqueta, etiqueta))
+        pares.extend(extra.items())
+        if not pares:
+            return ""
+        return "{" + ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + "}"
+
+    def exponer(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = [(etiqueta, list(cuentas), suma) for etiqueta, (cuentas, suma) in self._series.items()]
+        for etiqueta, cuentas, suma in sorted(series, key=lambda serie: str(serie[0])):
+            acumulado = 0
+            for limite, cuenta in zip(self.limites + [math.inf], cuentas):
+                acumulado += cuenta
+                le = "+Inf" if limite == math.inf else _numero(limite)
+                lineas.append(f"{self.nombre}_bucket{self._etiquetas(etiqueta, le=le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{self._etiquetas(etiqueta)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{self._etiquetas(etiqueta)} {acumulado}")
+        return lineas
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+HISTOGRAMAS = {
+    "stage_seconds": Histograma(
+        "gradepilot_stage_seconds", "Duración de cada etapa del trabajo, en segundos.",
+        [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60], etiqueta="stage",
+    ),
+    "upload_bytes": Histograma(
+        "gradepilot_upload_bytes", "Tamaño de los archivos subidos, en bytes.",
+        [10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000, 100_000_000],
+        etiqueta="endpoint",
+    ),
+    "exam_students": Histograma(
+        "gradepilot_exam_students", "Alumnos por examen corregido.",
+        [10, 50, 100, 500, 1000, 5000, 10_000, 50_000, 100_000],
+    ),
+    "exam_questions": Histograma(
+        "gradepilot_exam_questions", "Preguntas por examen corregido.",
+        [10, 20, 50, 100, 200, 500],
+    ),
+}
+
+
+def observar(metrica: str, valor: float, etiqueta=None):
+    """Añade una observación al histograma (o la guarda si se está recogiendo)."""
+    medidas = _recolector.get()
+    if medidas is not None:
+        medidas.append((metrica, valor, etiqueta))
+    else:
+        registrar([(metrica, valor, etiqueta)])
+
+
+def registrar(medidas):
+    """Registra en este proceso las medidas devueltas por recoger()."""
+    perfil = _perfil.get()
+    for metrica, valor, etiqueta in medidas:
+        HISTOGRAMAS[metrica].observar(valor, etiqueta)
+        if perfil is not None and metrica == "stage_seconds":
+            perfil.append((etiqueta, valor))
+
+
+@contextmanager
+def span(etapa: str):
+    """Mide la duración del bloque como la etapa indicada."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar("stage_seconds", time.perf_counter() - inicio, etapa)
+
+
+@contextmanager
+def recoger():
+    """Guarda en una lista, en lugar de registrarlas, las medidas del bloque."""
+    medidas = []
+    token = _recolector.set(medidas)
+    try:
+        yield medidas
+    finally:
+        _recolector.reset(token)
+
+
+@contextmanager
+def perfilar():
+    """Acumula en una lista las etapas medidas en el bloque: [(etapa, segundos)]."""
+    etapas = []
+    token = _perfil.set(etapas)
+    try:
+        yield etapas
+    finally:
+        _perfil.reset(token)
+
+
+def server_timing(etapas, total: float) -> str:
+    """Cabecera Server-Timing con la duración (ms) de cada etapa, sumando repeticiones."""
+    por_etapa = {}
+    for etapa, segundos in etapas:
+        acumulado, veces = por_etapa.get(etapa, (0.0, 0))
+        por_etapa[etapa] = (acumulado + segundos, veces + 1)
+    partes = []
+    for etapa, (segundos, veces) in por_etapa.items():
+        parte = f"{etapa};dur={segundos * 1000:.1f}"
+        if veces > 1:
+            parte += f';desc="x{veces}"'
+        partes.append(parte)
+    partes.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(partes)
+
+
+def exposicion(extra_lineas=()) -> str:
+    """Texto para Prometheus con todos los histogramas y las líneas extra."""
+    lineas = []
+    for histograma in HISTOGRAMAS.values():
+        lineas.extend(histograma.exponer())
+    lineas.extend(extra_lineas)
+    return "\n".join(lineas) + "\n"
+
+
+def gauge(nombre: str, ayuda: str, valor, tipo: str = "gauge") -> list:
+    """Líneas de una métrica simple (gauge o counter) sin etiquetas."""
+    return [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}", f"{nombre} {_numero(valor)}"]
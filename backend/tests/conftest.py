@@ -0,0 +1,28 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+# Los módulos del backend son planos (import grading, import main...)
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture
+def cargar_main(tmp_path, monkeypatch):
+    """
+    Importa main de nuevo, en un directorio vacío y con las variables de
+    entorno dadas (la configuración se lee al importar).
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PREWARM_ON_STARTUP", "0")
+
+    def cargar(**entorno):
+        for nombre, valor in entorno.items():
+            monkeypatch.setenv(nombre, valor)
+        monkeypatch.delitem(sys.modules, "main", raising=False)
+        return importlib.import_module("main")
+
+    yield cargar
+    sys.modules.pop("main", None)
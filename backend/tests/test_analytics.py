@@ -0,0 +1,56 @@
+"""
+Rutas /analytics: desactivadas por defecto, con clave, sin session_id ni DNI
+en claro, y sin las notas de las sesiones que caducan.
+"""
+import sqlite3
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+PLANTILLA = Path(__file__).resolve().parents[2] / "plantillas" / "plantilla_correcta_5.xlsx"
+CLAVE = {"Authorization": "Bearer clave-api"}
+
+
+def corregir(cliente) -> str:
+    respuesta = cliente.post(
+        "/corregir",
+        files={"file": (PLANTILLA.name, PLANTILLA.read_bytes())},
+        data={"n_opciones": 5, "n_preguntas": 10},
+    )
+    assert respuesta.status_code == 200
+    return respuesta.json()["session_id"]
+
+
+def test_desactivado_por_defecto(cargar_main, monkeypatch):
+    monkeypatch.delenv("ANALYTICS_API_KEY", raising=False)
+    main = cargar_main()
+    assert main.analytics_index is None
+    with TestClient(main.app) as cliente:
+        assert cliente.get("/analytics/exams", headers=CLAVE).status_code == 404
+
+
+def test_clave_seudonimos_y_caducidad(cargar_main, tmp_path):
+    main = cargar_main(ANALYTICS_API_KEY="clave-api", ANALYTICS_DNI_KEY="clave-dni")
+    with TestClient(main.app) as cliente:
+        session_id = corregir(cliente)
+        dni = main.cargar_notas(main.storage.sesion(session_id)).dnis[0]
+
+        assert cliente.get("/analytics/exams").status_code == 401
+        assert cliente.get("/analytics/exams", headers={"Authorization": "Bearer otra"}).status_code == 401
+
+        examenes = cliente.get("/analytics/exams", headers=CLAVE).json()["examenes"]
+        assert len(examenes) == 1 and "session_id" not in examenes[0]
+        pregunta = cliente.get("/analytics/questions/P1", headers=CLAVE).json()
+        assert "session_id" not in pregunta["por_examen"][0]
+        alumno = cliente.get(f"/analytics/students/{dni}", headers=CLAVE).json()
+        assert alumno["examenes"] == 1 and "session_id" not in alumno["notas"][0]
+
+        # La base de datos no tiene el DNI en claro
+        with sqlite3.connect(tmp_path / "analytics" / "index.sqlite3") as conexion:
+            guardados = [fila[0] for fila in conexion.execute("SELECT dni_hmac FROM notas")]
+        assert guardados and dni not in guardados
+
+        # Al caducar la sesión se borran sus notas, no el resumen del examen
+        main.session_sweeper.on_removed(session_id)
+        assert cliente.get(f"/analytics/students/{dni}", headers=CLAVE).status_code == 404
+        assert len(cliente.get("/analytics/exams", headers=CLAVE).json()["examenes"]) == 1
@@ -0,0 +1,100 @@
+"""
+La corrección vectorizada (corregir_matriz, estadisticas_preguntas) tiene que
+dar exactamente lo mismo que la corrección original fila a fila con iterrows
+sobre las plantillas de ejemplo.
+"""
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from grading import corregir_matriz, estadisticas_preguntas, parse_respuesta
+from ingestion import leer_examen
+
+PLANTILLAS_DIR = Path(__file__).resolve().parents[2] / "plantillas"
+N_PREGUNTAS = 10
+PLANTILLAS = {
+    "plantilla_correcta_3.xlsx": 3,
+    "plantilla_correcta_4.xlsx": 4,
+    "plantilla_correcta_5.xlsx": 5,
+}
+
+
+def correccion_fila_a_fila(df_original, n_preguntas: int, n_opciones: int):
+    """La corrección y las estadísticas tal como estaban antes de vectorizarlas."""
+    opciones = set("ABCDE"[:n_opciones])
+    clave = [parse_respuesta(df_original.iloc[0, i + 1]) for i in range(n_preguntas)]
+    df_alumnos = df_original.iloc[1:]
+
+    notas, presentados = [], []
+    for _, row in df_alumnos.iterrows():
+        puntaje_total = 0.0
+        presentado = False
+        for i, correctas in enumerate(clave):
+            incorrectas = opciones - correctas
+            seleccionadas = parse_respuesta(row.iloc[i + 1])
+            if not seleccionadas:
+                continue
+            presentado = True
+            valor_correcta = 1 / len(correctas) if correctas else 0
+            valor_incorrecta = 1 / len(incorrectas) if incorrectas else 0
+            for opcion in seleccionadas:
+                if opcion in correctas:
+                    puntaje_total += valor_correcta
+                elif opcion in incorrectas:
+                    puntaje_total -= valor_incorrecta
+        notas.append(round(max(0, puntaje_total), 2))
+        presentados.append(presentado)
+
+    question_stats = []
+    total_alumnos = len(df_alumnos)
+    for i, correctas in enumerate(clave):
+        incorrectas = opciones - correctas
+        valor_correcta = 1 / len(correctas) if correctas else 0
+        valor_incorrecta = 1 / len(incorrectas) if incorrectas else 0
+        total_answered = 0
+        total_score = 0.0
+        option_aciertos = {opt: 0 for opt in opciones}
+        for _, row in df_alumnos.iterrows():
+            seleccionadas = parse_respuesta(row.iloc[i + 1])
+            if seleccionadas:
+                total_answered += 1
+                question_score = 0.0
+                for opcion in seleccionadas:
+                    if opcion in correctas:
+                        question_score += valor_correcta
+                    elif opcion in incorrectas:
+                        question_score -= valor_incorrecta
+                total_score += max(0, question_score)
+            for opt in opciones:
+                if (opt in correctas) == (opt in seleccionadas):
+                    option_aciertos[opt] += 1
+
+        question_stats.append({
+            "question": f"P{i + 1}",
+            "avg_score": round(total_score / total_answered, 2) if total_answered > 0 else 0,
+            "total_answered": total_answered,
+            **{
+                opt: round(option_aciertos[opt] / total_alumnos * 100, 1) if total_alumnos > 0 else 0
+                for opt in sorted(opciones)
+            },
+        })
+    return notas, presentados, question_stats
+
+
+@pytest.mark.parametrize("nombre, n_opciones", PLANTILLAS.items())
+def test_igual_que_la_correccion_fila_a_fila(nombre, n_opciones):
+    contenido = (PLANTILLAS_DIR / nombre).read_bytes()
+    esperado = correccion_fila_a_fila(pd.read_excel(PLANTILLAS_DIR / nombre), N_PREGUNTAS, n_opciones)
+
+    examen = leer_examen(contenido, N_PREGUNTAS, n_opciones)
+    notas, presentados, por_pregunta = corregir_matriz(
+        examen.mascaras, examen.respondidas, examen.clave, n_opciones
+    )
+    question_stats = estadisticas_preguntas(
+        examen.mascaras, examen.respondidas, examen.clave, por_pregunta, n_opciones
+    )
+
+    assert notas == esperado[0]
+    assert presentados == esperado[1]
+    assert question_stats == esperado[2]
@@ -0,0 +1,65 @@
+"""
+Lectura de exámenes en los formatos admitidos: un CSV o un Parquet con las
+mismas celdas que una plantilla .xlsx se leen igual que la plantilla.
+"""
+import csv
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+from openpyxl import load_workbook
+
+from ingestion import leer_examen
+
+PLANTILLAS_DIR = Path(__file__).resolve().parents[2] / "plantillas"
+N_PREGUNTAS = 10
+PLANTILLAS = {
+    "plantilla_correcta_3.xlsx": 3,
+    "plantilla_correcta_4.xlsx": 4,
+    "plantilla_correcta_5.xlsx": 5,
+}
+
+
+def celdas(xlsx: bytes):
+    libro = load_workbook(io.BytesIO(xlsx), read_only=True, data_only=True)
+    return [list(fila) for fila in libro.worksheets[0].iter_rows(values_only=True)]
+
+
+def como_csv(filas, delimitador=",") -> bytes:
+    salida = io.StringIO()
+    escritor = csv.writer(salida, delimiter=delimitador)
+    for fila in filas:
+        escritor.writerow(["" if valor is None else valor for valor in fila])
+    return salida.getvalue().encode("utf-8")
+
+
+def como_parquet(filas) -> bytes:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Solo las columnas con cabecera (las vacías del final de la hoja no)
+    cabecera, *datos = filas
+    columnas = {
+        str(nombre): [None if fila[i] is None else str(fila[i]) for fila in datos]
+        for i, nombre in enumerate(cabecera) if nombre is not None
+    }
+    salida = io.BytesIO()
+    pq.write_table(pa.table(columnas), salida)
+    return salida.getvalue()
+
+
+def assert_mismo_examen(a, b):
+    assert a.dnis == b.dnis
+    np.testing.assert_array_equal(a.clave, b.clave)
+    np.testing.assert_array_equal(a.mascaras, b.mascaras)
+    np.testing.assert_array_equal(a.respondidas, b.respondidas)
+
+
+@pytest.mark.parametrize("nombre, n_opciones", PLANTILLAS.items())
+@pytest.mark.parametrize("convertir", [como_csv, lambda filas: como_csv(filas, ";"), como_parquet],
+                         ids=["csv", "csv-punto-y-coma", "parquet"])
+def test_mismo_examen_que_el_xlsx(nombre, n_opciones, convertir):
+    xlsx = (PLANTILLAS_DIR / nombre).read_bytes()
+    esperado = leer_examen(xlsx, N_PREGUNTAS, n_opciones)
+    assert_mismo_examen(leer_examen(convertir(celdas(xlsx)), N_PREGUNTAS, n_opciones), esperado)
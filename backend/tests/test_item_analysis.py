@@ -0,0 +1,111 @@
+"""
+Análisis de ítems sobre matrices pequeñas con los resultados calculados a mano.
+
+Examen base: 2 opciones (A=1, B=2), clave A, B, A. Con dos opciones una
+correcta suma 1 y una incorrecta resta 1. El último alumno no responde nada
+y no cuenta.
+
+    alumno   respuestas   puntos        total   aciertos
+    1        A B A         1  1  1       3      1 1 1
+    2        A B B         1  1 -1       1      1 1 0
+    3        A A B         1 -1 -1      -1      1 0 0
+    4        B A B        -1 -1 -1      -3      0 0 0
+    5        - - -         (no presentado)
+"""
+import numpy as np
+import pytest
+
+from grading import corregir_matriz
+from item_analysis import analisis_items
+
+A, B = 1, 2
+N_OPCIONES = 2
+
+
+def analizar(mascaras, clave):
+    mascaras = np.array(mascaras, dtype=np.uint8)
+    clave = np.array(clave, dtype=np.uint8)
+    respondidas = mascaras != 0
+    _, _, por_pregunta = corregir_matriz(mascaras, respondidas, clave, N_OPCIONES)
+    return analisis_items(mascaras, respondidas, clave, por_pregunta, N_OPCIONES)
+
+
+@pytest.fixture
+def resultado():
+    return analizar(
+        [[A, B, A],
+         [A, B, B],
+         [A, A, B],
+         [B, A, B],
+         [0, 0, 0]],
+        [A, B, A],
+    )
+
+
+def test_dificultad_y_discriminacion(resultado):
+    items, _ = resultado
+    # Aciertos entre los 4 presentados
+    assert [item["difficulty"] for item in items] == [0.75, 0.5, 0.25]
+    # 27 % de 4 alumnos = 1: el mejor (alumno 1) acierta todo, el peor (4) nada
+    assert [item["discrimination"] for item in items] == [1.0, 1.0, 1.0]
+
+
+def test_biserial_puntual_con_el_resto_del_examen(resultado):
+    items, _ = resultado
+    # P1: acierto 1 1 1 0, resto 2 0 -2 -2 -> 1.5 / sqrt(0.75 · 11)
+    # P2: acierto 1 1 0 0, resto 2 0 0 -2  -> 2 / sqrt(1 · 8)
+    # P3: acierto 1 0 0 0, resto 2 2 0 -2  -> 1.5 / sqrt(0.75 · 11)
+    assert [item["point_biserial"] for item in items] == [0.522, 0.707, 0.522]
+
+
+def test_distractores(resultado):
+    items, _ = resultado
+    # Solo la opción que no está en la clave; la marcan el grupo inferior
+    assert items[0]["distractors"] == {"B": {"pct_selected": 25.0, "discrimination": -1.0}}
+    assert items[1]["distractors"] == {"A": {"pct_selected": 50.0, "discrimination": -1.0}}
+    assert items[2]["distractors"] == {"B": {"pct_selected": 75.0, "discrimination": -1.0}}
+
+
+def test_fiabilidad(resultado):
+    _, fiabilidad = resultado
+    # alfa: varianzas 0.75 + 1 + 0.75 = 2.5, total 5  -> 3/2 · (1 - 2.5/5)
+    # KR-20: pq 0.1875 + 0.25 + 0.1875 = 0.625, total 1.25 -> 3/2 · (1 - 0.625/1.25)
+    assert fiabilidad == {"alfa_cronbach": 0.75, "kr20": 0.75}
+
+
+def test_varianza_nula():
+    # Todos responden lo mismo: no hay nada que correlacionar
+    items, fiabilidad = analizar([[A, B, B]] * 4, [A, B, A])
+    assert [item["difficulty"] for item in items] == [1.0, 1.0, 0.0]
+    assert [item["discrimination"] for item in items] == [0.0, 0.0, 0.0]
+    assert [item["point_biserial"] for item in items] == [None, None, None]
+    assert fiabilidad == {"alfa_cronbach": None, "kr20": None}
+
+
+def test_un_solo_alumno():
+    items, fiabilidad = analizar([[A, A, A]], [A, B, A])
+    assert [item["difficulty"] for item in items] == [1.0, 0.0, 1.0]
+    assert all(item["discrimination"] is None and item["point_biserial"] is None for item in items)
+    assert items[1]["distractors"] == {"A": {"pct_selected": 100.0, "discrimination": None}}
+    assert fiabilidad == {"alfa_cronbach": None, "kr20": None}
+
+
+def test_pregunta_sin_respuestas():
+    # Nadie responde P3: dificultad 0, nadie marca el distractor
+    items, _ = analizar(
+        [[A, B, 0],
+         [A, A, 0],
+         [B, A, 0],
+         [B, B, 0]],
+        [A, B, A],
+    )
+    assert items[2]["difficulty"] == 0.0
+    assert items[2]["discrimination"] == 0.0
+    assert items[2]["point_biserial"] is None
+    assert items[2]["distractors"] == {"B": {"pct_selected": 0.0, "discrimination": 0.0}}
+
+
+def test_sin_presentados():
+    items, fiabilidad = analizar([[0, 0, 0]] * 3, [A, B, A])
+    assert all(item["difficulty"] is None and item["point_biserial"] is None for item in items)
+    assert fiabilidad == {"alfa_cronbach": None, "kr20": None}
@@ -0,0 +1,60 @@
+"""
+/corregir-lote con un .zip: cualquier daño del .zip, también en un miembro
+concreto, es un 400 y no un 500.
+"""
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+PLANTILLA = Path(__file__).resolve().parents[2] / "plantillas" / "plantilla_correcta_5.xlsx"
+
+
+def como_zip(compresion) -> bytes:
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, "w", compression=compresion) as zf:
+        zf.writestr("grupo1.xlsx", PLANTILLA.read_bytes())
+    return salida.getvalue()
+
+
+def danar_miembro(datos: bytes) -> bytes:
+    """Cambia unos bytes en mitad de los datos del primer miembro."""
+    with zipfile.ZipFile(io.BytesIO(datos)) as zf:
+        info = zf.infolist()[0]
+    # Cabecera local: 30 bytes más el nombre y el campo extra
+    inicio = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+    centro = inicio + info.compress_size // 2
+    datos = bytearray(datos)
+    datos[centro:centro + 8] = bytes(b ^ 0xFF for b in datos[centro:centro + 8])
+    return bytes(datos)
+
+
+def enviar(cliente, datos: bytes):
+    return cliente.post(
+        "/corregir-lote",
+        files=[("files", ("lote.zip", datos))],
+        data={"n_opciones": 5, "n_preguntas": 10},
+    )
+
+
+def test_zip_valido(cargar_main):
+    main = cargar_main()
+    with TestClient(main.app) as cliente:
+        respuesta = enviar(cliente, como_zip(zipfile.ZIP_DEFLATED))
+    assert respuesta.status_code == 202
+    assert [item["name"] for item in respuesta.json()["items"]] == ["grupo1.xlsx"]
+
+
+@pytest.mark.parametrize("datos", [
+    b"esto no es un zip",
+    danar_miembro(como_zip(zipfile.ZIP_STORED)),    # CRC que no cuadra
+    danar_miembro(como_zip(zipfile.ZIP_DEFLATED)),  # datos comprimidos corruptos
+], ids=["no-zip", "crc", "deflate"])
+def test_zip_danado(cargar_main, datos):
+    main = cargar_main()
+    with TestClient(main.app) as cliente:
+        respuesta = enviar(cliente, datos)
+    assert respuesta.status_code == 400
+    assert respuesta.json()["detail"] == "El archivo lote.zip no es un .zip válido"
@@ -0,0 +1,89 @@
+"""
+Caché de resultados: el índice vive en el almacén de sesiones (lo comparten
+todas las réplicas) y la expulsión lo mantiene por debajo de max_entries sin
+recorrerlo en cada escritura.
+"""
+import os
+import time
+
+import pytest
+
+import result_cache
+from result_cache import INDEX_PREFIX, ResultCache
+from storage import crear_storage
+
+
+@pytest.fixture(params=["local", "object-local"])
+def storage(request, tmp_path):
+    return crear_storage(request.param, tmp_path / "sessions")
+
+
+@pytest.fixture
+def cache(storage):
+    return ResultCache(storage, 20, 3600)
+
+
+def entradas(cache):
+    archivos, _ = cache.storage.listar(f"{INDEX_PREFIX}/")
+    return sorted(nombre.removesuffix(".json") for nombre, _, _ in archivos)
+
+
+def envejecer(storage, tmp_path, clave: str, segundos: float):
+    key = f"{INDEX_PREFIX}/{clave}.json"
+    # object-local: cada objeto es un archivo en SESSIONS_DIR/<bucket>/<key>
+    ruta = storage.ruta_local(key) or tmp_path / "sessions" / "sessions" / key
+    antes = time.time() - segundos
+    os.utime(ruta, (antes, antes))
+
+
+def test_compartido_entre_replicas(storage):
+    # Dos procesos con el mismo almacén: lo que guarda uno lo ve el otro
+    ResultCache(storage, 20, 3600).put_validation("clave", {"upload_token": "t"})
+    assert ResultCache(storage, 20, 3600).get_validation("clave") == {"upload_token": "t"}
+
+
+def test_expulsion_acotada_y_amortizada(cache, monkeypatch):
+    recorridos = []
+    recorrer = cache._recorrer_indice
+    monkeypatch.setattr(cache, "_recorrer_indice", lambda: recorridos.append(1) or recorrer())
+
+    for i in range(100):
+        cache.put_validation(f"clave{i:03d}", {"upload_token": str(i)})
+        assert len(entradas(cache)) <= cache.max_entries
+
+    # Se conservan las más recientes; el índice solo se recorre al pasarse
+    # de max_entries, y entonces baja un 10 % por debajo
+    assert entradas(cache)[-1] == "clave099"
+    assert len(recorridos) < 100 / 2
+    assert cache.stats()["evictions"] == 100 - len(entradas(cache))
+
+
+def test_reescribir_una_entrada_no_cuenta_como_nueva(cache, monkeypatch):
+    cache.put_validation("clave", {"upload_token": "t"})
+    recorridos = []
+    monkeypatch.setattr(cache, "_recorrer_indice", lambda: recorridos.append(1))
+    for _ in range(50):
+        cache.put_validation("clave", {"upload_token": "t"})
+    assert recorridos == []
+
+
+def test_barrido_periodico_de_caducadas(cache, tmp_path, monkeypatch):
+    cache.put_validation("vieja", {"upload_token": "t"})
+    envejecer(cache.storage, tmp_path, "vieja", 2 * cache.max_age_seconds)
+
+    cache.put_validation("nueva", {"upload_token": "t"})
+    assert entradas(cache) == ["nueva", "vieja"]
+
+    monkeypatch.setattr(result_cache, "BARRIDO_SEGUNDOS", 0)
+    cache.put_validation("otra", {"upload_token": "t"})
+    assert entradas(cache) == ["nueva", "otra"]
+
+
+def test_uso_reciente_retrasa_la_expulsion(cache, tmp_path):
+    cache.put_validation("usada", {"upload_token": "t"})
+    envejecer(cache.storage, tmp_path, "usada", cache.max_age_seconds / 2)
+    assert cache.get_validation("usada") is not None
+
+    # Al usarla se ha vuelto a marcar: ya no es de las más antiguas
+    archivos, _ = cache.storage.listar(f"{INDEX_PREFIX}/")
+    assert time.time() - archivos[0][2] < 60
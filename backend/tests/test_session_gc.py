@@ -0,0 +1,88 @@
+"""
+Limpieza incremental de sesiones (session_gc.SessionSweeper) sobre
+LocalShardedStorage, con las fechas de modificación fijadas a mano.
+"""
+import os
+import time
+import uuid
+
+import pytest
+
+from session_gc import BOOTSTRAP_DONE_KEY, INDEX_PREFIX, SessionSweeper
+from storage import LocalShardedStorage, prefijo_sharded
+
+HORA = 3600
+DIA = 24 * HORA
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalShardedStorage(tmp_path / "sessions")
+
+
+def nueva_sesion(storage, antiguedad: float) -> str:
+    session_id = str(uuid.uuid4())
+    storage.crear_sesion(session_id).escribir("metrics.json", b"{}")
+    instante = time.time() - antiguedad
+    os.utime(storage.root / storage.prefijo_sesion(session_id), (instante, instante))
+    return session_id
+
+
+def marcas(storage):
+    _, buckets = storage.listar(f"{INDEX_PREFIX}/")
+    return {
+        session_id: int(bucket)
+        for bucket in buckets
+        for session_id, _, _ in storage.listar(f"{INDEX_PREFIX}/{bucket}/")[0]
+    }
+
+
+def test_sesion_caducada_se_borra(storage):
+    borradas = []
+    sweeper = SessionSweeper(storage, max_age_seconds=DIA, batch_size=100, on_removed=borradas.append)
+    caducada = nueva_sesion(storage, 2 * DIA)
+    reciente = nueva_sesion(storage, HORA)
+    sweeper.registrar(caducada, time.time() - 2 * DIA)
+    sweeper.registrar(reciente, time.time() - HORA)
+
+    sweeper.tick()
+
+    assert not storage.existe(caducada)
+    assert storage.existe(reciente)
+    assert borradas == [caducada]
+    assert list(marcas(storage)) == [reciente]
+    assert sweeper.stats()["sessions_removed"] == 1
+
+
+def test_sesion_modificada_se_reindexa_y_se_conserva(storage):
+    sweeper = SessionSweeper(storage, max_age_seconds=DIA, batch_size=100)
+    session_id = nueva_sesion(storage, 2 * DIA)
+    sweeper.registrar(session_id, time.time() - 2 * DIA)
+
+    # Se genera el Excel después de indexarla: la sesión pasa a ser reciente
+    storage.sesion(session_id).escribir("notas.xlsx", b"xlsx")
+    sweeper.tick()
+
+    assert storage.existe(session_id)
+    ultima_modificacion = storage.ultima_modificacion(session_id)
+    assert marcas(storage) == {session_id: sweeper._bucket(ultima_modificacion)}
+    assert sweeper.stats()["sessions_removed"] == 0
+
+
+def test_sesion_heredada_se_migra_sin_borrarla(storage):
+    # Sesión de antes del índice: directamente bajo SESSIONS_DIR, sin marca
+    session_id = str(uuid.uuid4())
+    (storage.root / session_id).mkdir()
+    (storage.root / session_id / "metrics.json").write_bytes(b"{}")
+    instante = time.time() - HORA
+    os.utime(storage.root / session_id, (instante, instante))
+
+    sweeper = SessionSweeper(storage, max_age_seconds=DIA, batch_size=100)
+    sweeper.tick()
+
+    assert not (storage.root / session_id).exists()
+    assert (storage.root / prefijo_sharded(session_id) / "metrics.json").exists()
+    assert storage.sesion(session_id).leer("metrics.json") == b"{}"
+    assert marcas(storage) == {session_id: sweeper._bucket(instante)}
+    assert storage.info(BOOTSTRAP_DONE_KEY) is not None
+    assert sweeper.stats()["sessions_removed"] == 0
@@ -0,0 +1,118 @@
+"""
+ObjectStoreStorage sobre LocalObjectStoreClient (el sustituto local de S3):
+operaciones por clave y por sesión, y una corrección completa con
+SESSION_STORAGE=object-local.
+"""
+import io
+import uuid
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+
+from storage import LocalObjectStoreClient, ObjectStoreStorage
+
+PLANTILLA = Path(__file__).resolve().parents[2] / "plantillas" / "plantilla_correcta_5.xlsx"
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return ObjectStoreStorage(LocalObjectStoreClient(tmp_path), "sessions")
+
+
+def test_escribir_leer_listar_y_borrar(storage, tmp_path):
+    storage.escribir("a/b/uno.bin", b"123")
+    origen = tmp_path / "origen.bin"
+    origen.write_bytes(b"45678")
+    storage.escribir_archivo("a/b/dos.bin", origen, mover=True)
+
+    assert not origen.exists()
+    assert storage.leer("a/b/uno.bin") == b"123"
+    assert storage.abrir("a/b/dos.bin").read() == b"45678"
+    assert storage.info("a/b/dos.bin")[0] == 5
+    assert storage.info("a/b/no.bin") is None
+
+    archivos, carpetas = storage.listar("a/b/")
+    assert sorted((nombre, tamano) for nombre, tamano, _ in archivos) == [("dos.bin", 5), ("uno.bin", 3)]
+    assert carpetas == []
+    assert storage.listar("a/") == ([], ["b"])
+
+    storage.borrar("a/b/uno.bin")
+    with pytest.raises(FileNotFoundError):
+        storage.leer("a/b/uno.bin")
+    assert [nombre for nombre, _, _ in storage.listar("a/b/")[0]] == ["dos.bin"]
+
+
+def test_sesiones(storage):
+    session_id = str(uuid.uuid4())
+    sesion = storage.crear_sesion(session_id)
+    assert not storage.existe(session_id)
+
+    sesion.escribir("metrics.json", b"{}")
+    sesion.escribir("original.xlsx", b"x" * 10)
+    assert storage.existe(session_id)
+    assert sesion.contiene("original.xlsx")
+    assert list(storage.sesiones()) == [session_id]
+
+    assert storage.borrar_sesion(session_id) == 12
+    assert not storage.existe(session_id)
+    assert not sesion.contiene("metrics.json")
+    assert list(storage.sesiones()) == []
+
+
+def test_existe_sin_archivos_testigo(storage):
+    # Sesión que aún no ha escrito metrics.json ni status.json
+    session_id = str(uuid.uuid4())
+    storage.crear_sesion(session_id).escribir("original.xlsx", b"x")
+    assert storage.existe(session_id)
+    assert not storage.existe("../fuera")
+
+
+def test_corregir_y_descargar(cargar_main, tmp_path):
+    app_objetos = cargar_main(SESSION_STORAGE="object-local")
+    assert isinstance(app_objetos.storage, ObjectStoreStorage)
+
+    with TestClient(app_objetos.app) as cliente:
+        respuesta = cliente.post(
+            "/corregir",
+            files={"file": (PLANTILLA.name, PLANTILLA.read_bytes())},
+            data={"n_opciones": 5, "n_preguntas": 10},
+        )
+        assert respuesta.status_code == 200
+        session_id = respuesta.json()["session_id"]
+
+        descarga = cliente.get(f"/download/{session_id}")
+        assert descarga.status_code == 200
+        libro = load_workbook(io.BytesIO(descarga.content), read_only=True)
+        assert libro.sheetnames == ["ORIGINAL", "CORREGIDO", "MÉTRICAS"]
+
+    # Los archivos de la sesión son objetos del bucket local
+    assert app_objetos.storage.existe(session_id)
+    objetos = {ruta.name for ruta in (tmp_path / "sessions" / "sessions").rglob("*") if ruta.is_file()}
+    assert {"original.xlsx", "metrics.json", "status.json"} <= objetos
+
+
+def test_subidas_y_cache_en_el_almacen(cargar_main, tmp_path):
+    # Token de /validate y caché de resultados en el almacén compartido, no
+    # en el disco de la réplica: sirven en cualquier otra
+    app_objetos = cargar_main(SESSION_STORAGE="object-local")
+    with TestClient(app_objetos.app) as cliente:
+        validacion = cliente.post(
+            "/validate",
+            files={"file": (PLANTILLA.name, PLANTILLA.read_bytes())},
+            data={"n_opciones": 5, "n_preguntas": 10},
+        )
+        assert validacion.status_code == 200
+        token = validacion.json()["upload_token"]
+
+    bucket = tmp_path / "sessions" / "sessions"
+    assert {ruta.name for ruta in (bucket / ".uploads" / token).iterdir()} == {"meta.json", "examen.npz", "original.xlsx"}
+    assert len(list((bucket / ".results").iterdir())) == 1
+    assert sorted(ruta.name for ruta in tmp_path.iterdir()) == ["sessions"]
+
+    otra_replica = cargar_main(SESSION_STORAGE="object-local")
+    with TestClient(otra_replica.app) as cliente:
+        respuesta = cliente.post("/corregir", data={"upload_token": token})
+        assert respuesta.status_code == 200
+        assert otra_replica.storage.sesion(respuesta.json()["session_id"]).contiene("original.xlsx")
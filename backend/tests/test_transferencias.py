@@ -0,0 +1,123 @@
+"""
+Descargas con ETag y Range (respuesta_archivo) y límite de subidas
+(LimiteSubidas), sobre una aplicación mínima con una sesión local.
+"""
+import uuid
+
+import pytest
+from fastapi import FastAPI, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from storage import LocalShardedStorage
+from transferencias import LimiteSubidas, respuesta_archivo
+
+DATOS = bytes(range(256)) * 40  # 10240 bytes
+LIMITE = 1024
+
+
+@pytest.fixture
+def cliente(tmp_path):
+    storage = LocalShardedStorage(tmp_path / "sessions")
+    sesion = storage.crear_sesion(str(uuid.uuid4()))
+    sesion.escribir("examen.xlsx", DATOS)
+
+    app = FastAPI()
+    app.add_middleware(LimiteSubidas, max_bytes=LIMITE)
+
+    @app.get("/descargar")
+    async def descargar(request: Request):
+        return await respuesta_archivo(request, sesion, "examen.xlsx", "application/octet-stream", "examen.xlsx")
+
+    @app.post("/subir")
+    async def subir(file: UploadFile):
+        return {"bytes": len(await file.read())}
+
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+def test_archivo_entero(cliente):
+    respuesta = cliente.get("/descargar")
+    assert respuesta.status_code == 200
+    assert respuesta.content == DATOS
+    assert respuesta.headers["content-length"] == str(len(DATOS))
+    assert respuesta.headers["accept-ranges"] == "bytes"
+    assert respuesta.headers["etag"]
+
+
+@pytest.mark.parametrize("rango, inicio, fin", [
+    ("bytes=0-99", 0, 100),
+    ("bytes=10000-", 10000, 10240),
+    ("bytes=10000-99999", 10000, 10240),
+    ("bytes=-100", 10140, 10240),
+    ("bytes=-99999", 0, 10240),
+])
+def test_intervalo(cliente, rango, inicio, fin):
+    respuesta = cliente.get("/descargar", headers={"Range": rango})
+    assert respuesta.status_code == 206
+    assert respuesta.content == DATOS[inicio:fin]
+    assert respuesta.headers["content-range"] == f"bytes {inicio}-{fin - 1}/{len(DATOS)}"
+
+
+@pytest.mark.parametrize("rango", ["bytes=10240-", "bytes=20000-20010", "bytes=-0"])
+def test_intervalo_fuera_del_archivo(cliente, rango):
+    respuesta = cliente.get("/descargar", headers={"Range": rango})
+    assert respuesta.status_code == 416
+    assert respuesta.headers["content-range"] == f"bytes */{len(DATOS)}"
+
+
+@pytest.mark.parametrize("rango", ["bytes=0-9,20-29", "bytes=abc", "items=0-9", "bytes=50-10"])
+def test_varios_intervalos_o_mal_formado_envia_el_archivo_entero(cliente, rango):
+    respuesta = cliente.get("/descargar", headers={"Range": rango})
+    assert respuesta.status_code == 200
+    assert respuesta.content == DATOS
+
+
+def test_etag(cliente):
+    etag = cliente.get("/descargar").headers["etag"]
+
+    respuesta = cliente.get("/descargar", headers={"If-None-Match": etag})
+    assert respuesta.status_code == 304
+    assert respuesta.content == b""
+    assert cliente.get("/descargar", headers={"If-None-Match": f'W/{etag}, "otro"'}).status_code == 304
+    assert cliente.get("/descargar", headers={"If-None-Match": '"otro"'}).status_code == 200
+
+    # If-Range con otro ETag: el Range se ignora
+    assert cliente.get("/descargar", headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+    respuesta = cliente.get("/descargar", headers={"Range": "bytes=0-9", "If-Range": '"otro"'})
+    assert respuesta.status_code == 200
+    assert respuesta.content == DATOS
+
+
+def test_subida_dentro_del_limite(cliente):
+    respuesta = cliente.post("/subir", files={"file": ("a.xlsx", b"x" * 100)})
+    assert respuesta.status_code == 200
+    assert respuesta.json() == {"bytes": 100}
+
+
+def test_subida_con_content_length_excesivo(cliente):
+    respuesta = cliente.post("/subir", files={"file": ("a.xlsx", b"x" * 2 * LIMITE)})
+    assert respuesta.status_code == 413
+    assert respuesta.json()["detail"] == "El archivo supera el tamaño máximo permitido (1 KB)"
+
+
+def test_subida_por_trozos_sin_content_length(cliente):
+    frontera = "limite"
+    cuerpo = (
+        f"--{frontera}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="a.xlsx"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + b"x" * 2 * LIMITE + f"\r\n--{frontera}--\r\n".encode()
+
+    def trozos():
+        for i in range(0, len(cuerpo), 256):
+            yield cuerpo[i:i + 256]
+
+    respuesta = cliente.post(
+        "/subir",
+        content=trozos(),
+        headers={"Content-Type": f"multipart/form-data; boundary={frontera}"},
+    )
+    assert "content-length" not in respuesta.request.headers
+    assert respuesta.status_code == 413
+    assert respuesta.json()["detail"] == "El archivo supera el tamaño máximo permitido (1 KB)"
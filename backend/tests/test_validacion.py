@@ -0,0 +1,88 @@
+"""
+Errores de validación por celda (ingestion.ErroresValidacion): la celda de
+cada error, el recorte a MAX_ERRORES_DETALLADOS, el total y el cuerpo del 400
+que lee el frontend (detail, errores, total_errores).
+"""
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+
+from ingestion import MAX_ERRORES_DETALLADOS, ErroresValidacion, leer_examen
+
+N_PREGUNTAS = 5
+N_OPCIONES = 3
+CABECERA = ["DNI", "P1", "P2", "P3", "P4", "P5"]
+CLAVE = ["CLAVE", "A", "B", "C", "A", "B"]
+
+
+def como_xlsx(filas) -> bytes:
+    libro = Workbook()
+    for fila in filas:
+        libro.active.append(fila)
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def errores_de(filas) -> ErroresValidacion:
+    with pytest.raises(ErroresValidacion) as excinfo:
+        leer_examen(como_xlsx(filas), N_PREGUNTAS, N_OPCIONES)
+    assert excinfo.value.status_code == 400
+    return excinfo.value
+
+
+def test_celda_de_cada_error():
+    error = errores_de([
+        CABECERA,
+        ["CLAVE", "A", None, "C", "E", "B"],
+        ["111", "A", "B", "C", "A", "B"],
+        ["222", "A", "B", "D", "A", "B"],
+    ])
+    assert error.total == 4
+    # Primero los de todo el archivo, después los de la clave y los de los alumnos
+    assert [e["celda"] for e in error.errores] == [None, "C2", "E2", "D4"]
+    assert "la letra 'E'" in error.errores[0]["mensaje"]
+    assert error.errores[3]["mensaje"] == "La respuesta 'D' usa letras de más para un examen de 3 opciones."
+    assert error.detail.splitlines()[0] == "Se han encontrado 4 errores en el archivo:"
+    assert "- D4: La respuesta 'D' usa letras de más para un examen de 3 opciones." in error.detail.splitlines()
+
+
+def test_un_solo_error_es_el_detail():
+    error = errores_de([CABECERA, CLAVE])
+    assert error.total == 1
+    assert error.errores == [{"celda": None, "mensaje": error.detail}]
+
+
+def test_recorte_a_max_errores_detallados():
+    n_malas = MAX_ERRORES_DETALLADOS + 10
+    alumnos = [[str(i), "D", "B", "C", "A", "B"] for i in range(n_malas)]
+    error = errores_de([CABECERA, CLAVE, *alumnos])
+
+    # El error general de letras y una celda mala por alumno; solo se
+    # detallan los primeros, del resto se cuenta cuántos son
+    assert error.total == n_malas + 1
+    assert len(error.errores) == MAX_ERRORES_DETALLADOS
+    assert error.errores[0]["celda"] is None
+    assert [e["celda"] for e in error.errores[1:]] == [f"B{fila}" for fila in range(3, 2 + MAX_ERRORES_DETALLADOS)]
+    assert error.detail.splitlines()[0] == f"Se han encontrado {n_malas + 1} errores en el archivo:"
+    assert error.detail.splitlines()[-1] == "- ... y 11 más."
+
+
+def test_cuerpo_del_400(cargar_main):
+    main = cargar_main()
+    contenido = como_xlsx([CABECERA, ["CLAVE", "A", None, "C", "A", "B"], ["111", "A", "B", "D", "A", "B"]])
+    with TestClient(main.app) as cliente:
+        respuesta = cliente.post(
+            "/validate",
+            files={"file": ("examen.xlsx", contenido)},
+            data={"n_opciones": N_OPCIONES, "n_preguntas": N_PREGUNTAS},
+        )
+    assert respuesta.status_code == 400
+    cuerpo = respuesta.json()
+    assert set(cuerpo) == {"detail", "errores", "total_errores"}
+    assert isinstance(cuerpo["detail"], str)
+    assert cuerpo["total_errores"] == 3
+    assert [e["celda"] for e in cuerpo["errores"]] == [None, "C2", "D3"]
+    assert all(set(e) == {"celda", "mensaje"} for e in cuerpo["errores"])
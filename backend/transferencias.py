@@ -0,0 +1,247 @@
+"""
+Entrada y salida de archivos grandes por HTTP.
+
+Descargas (examen.xlsx, reporte.pdf): respuesta_archivo y respuesta_bytes
+envían un archivo de la sesión con Content-Length, ETag y Accept-Ranges, y
+atienden:
+- If-None-Match: 304 sin cuerpo si el cliente ya tiene esa versión.
+- Range (un solo intervalo, "bytes=inicio-fin", "bytes=inicio-" o
+  "bytes=-sufijo"): 206 con ese trozo, o 416 si queda fuera del archivo.
+  Varios intervalos o una cabecera mal formada se ignoran y se envía el
+  archivo entero, como permite el RFC 9110.
+- If-Range: el Range solo se aplica si el ETag coincide.
+Los archivos locales se leen por trozos sin bloquear el bucle de eventos, o
+se delegan en el servidor (extensión ASGI http.response.pathsend) si la
+admite. Los de un almacén de objetos se leen por trozos en un hilo. El
+archivo se cierra siempre al terminar, también si el cliente se desconecta.
+
+Subidas: LimiteSubidas es un middleware ASGI que rechaza con 413 las
+peticiones cuyo cuerpo supera max_bytes. Si la petición declara
+Content-Length se rechaza sin leer nada; si no, se cuentan los bytes según
+llegan y se corta al superar el límite, de modo que nunca se guarda en
+memoria ni en un temporal más de max_bytes.
+"""
+import hashlib
+import re
+
+import anyio
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+TAMANO_TROZO = 64 * 1024
+
+_RANGO = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def etag_archivo(clave: str, tamano: int, modificado: float) -> str:
+    """ETag de un archivo guardado: cambia si cambia su tamaño o su fecha."""
+    digest = hashlib.sha256(f"{clave}:{tamano}:{modificado!r}".encode("utf-8"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def coincide_etag(cabecera, etag: str) -> bool:
+    """Comparación débil de If-None-Match: lista de ETags o "*"."""
+    if not cabecera:
+        return False
+    if cabecera.strip() == "*":
+        return True
+    return any(valor.strip().removeprefix("W/") == etag for valor in cabecera.split(","))
+
+
+def intervalo_pedido(request, etag: str, tamano: int):
+    """
+    (inicio, fin) del Range de la petición, con fin exclusivo, o None si hay
+    que enviar el archivo entero. Lanza HTTPException(416) si el intervalo no
+    es satisfacible.
+    """
+    cabecera = request.headers.get("range")
+    if cabecera is None:
+        return None
+    si_rango = request.headers.get("if-range")
+    if si_rango is not None and si_rango.strip() != etag:
+        return None
+    coincidencia = _RANGO.fullmatch(cabecera.strip())
+    if coincidencia is None or coincidencia.groups() == ("", ""):
+        return None
+
+    inicio, fin = coincidencia.groups()
+    if inicio == "":
+        # Sufijo: los últimos N bytes
+        inicio, fin = max(tamano - int(fin), 0), tamano
+        if fin == inicio:
+            raise _no_satisfacible(tamano)
+        return inicio, fin
+    inicio = int(inicio)
+    fin = tamano if fin == "" else min(int(fin) + 1, tamano)
+    if inicio >= tamano:
+        raise _no_satisfacible(tamano)
+    if fin <= inicio:
+        return None
+    return inicio, fin
+
+
+def _no_satisfacible(tamano: int) -> HTTPException:
+    return HTTPException(
+        status_code=416,
+        detail="El intervalo pedido está fuera del archivo",
+        headers={"Content-Range": f"bytes */{tamano}"},
+    )
+
+
+def _cabeceras(etag: str, filename: str) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+
+
+def respuesta_bytes(request, datos: bytes, media_type: str, filename: str, etag: str) -> Response:
+    """Respuesta con un archivo ya leído en memoria (caché de sesiones)."""
+    headers = _cabeceras(etag, filename)
+    if coincide_etag(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    intervalo = intervalo_pedido(request, etag, len(datos))
+    if intervalo is None:
+        return Response(datos, media_type=media_type, headers=headers)
+    inicio, fin = intervalo
+    headers["Content-Range"] = f"bytes {inicio}-{fin - 1}/{len(datos)}"
+    return Response(datos[inicio:fin], status_code=206, media_type=media_type, headers=headers)
+
+
+async def respuesta_archivo(request, sesion, nombre: str, media_type: str, filename: str, etag=None) -> Response:
+    """
+    Respuesta con el archivo nombre de la sesión. Sin etag, se calcula a
+    partir del tamaño y la fecha del archivo.
+    """
+    info = await anyio.to_thread.run_sync(sesion.info, nombre)
+    if info is None:
+        raise HTTPException(404, "Archivo no encontrado")
+    tamano, modificado = info
+    if etag is None:
+        etag = etag_archivo(f"{sesion.session_id}/{nombre}", tamano, modificado)
+
+    headers = _cabeceras(etag, filename)
+    if coincide_etag(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    intervalo = intervalo_pedido(request, etag, tamano)
+    status_code = 200
+    inicio, fin = 0, tamano
+    if intervalo is not None:
+        inicio, fin = intervalo
+        status_code = 206
+        headers["Content-Range"] = f"bytes {inicio}-{fin - 1}/{tamano}"
+    headers["Content-Length"] = str(fin - inicio)
+    return RespuestaArchivo(sesion, nombre, inicio, fin, status_code, media_type, headers)
+
+
+class RespuestaArchivo(Response):
+    """Cuerpo leído por trozos de un archivo de la sesión, entre inicio y fin."""
+
+    def __init__(self, sesion, nombre: str, inicio: int, fin: int, status_code: int, media_type: str, headers):
+        self.sesion = sesion
+        self.nombre = nombre
+        self.inicio = inicio
+        self.fin = fin
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        ruta = self.sesion.ruta_local(self.nombre)
+        if ruta is not None:
+            if self.status_code == 200 and "http.response.pathsend" in scope.get("extensions", {}):
+                await send({"type": "http.response.pathsend", "path": str(ruta)})
+                return
+            async with await anyio.open_file(ruta, "rb") as archivo:
+                await archivo.seek(self.inicio)
+                await self._enviar(send, archivo.read)
+            return
+
+        archivo = await anyio.to_thread.run_sync(self.sesion.abrir, self.nombre)
+        try:
+            if self.inicio:
+                await anyio.to_thread.run_sync(_saltar, archivo, self.inicio)
+            await self._enviar(send, lambda n: anyio.to_thread.run_sync(archivo.read, n))
+        finally:
+            await anyio.to_thread.run_sync(archivo.close)
+
+    async def _enviar(self, send, leer):
+        pendiente = self.fin - self.inicio
+        while pendiente > 0:
+            trozo = await leer(min(TAMANO_TROZO, pendiente))
+            if not trozo:
+                break
+            pendiente -= len(trozo)
+            await send({"type": "http.response.body", "body": trozo, "more_body": pendiente > 0})
+        if pendiente > 0 or self.fin == self.inicio:
+            # Archivo más corto de lo esperado (o vacío): se cierra la respuesta
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _saltar(archivo, n_bytes: int):
+    """Avanza n_bytes en un flujo de lectura (seek si se puede)."""
+    if getattr(archivo, "seekable", lambda: False)():
+        archivo.seek(n_bytes)
+        return
+    while n_bytes > 0:
+        leido = archivo.read(min(TAMANO_TROZO, n_bytes))
+        if not leido:
+            return
+        n_bytes -= len(leido)
+
+
+def _tamano_legible(n_bytes: int) -> str:
+    """100 MB, 1.5 MB, 512 KB... (en KB por debajo de 1 MB)."""
+    if n_bytes < 2**20:
+        return f"{round(n_bytes / 2**10, 1):g} KB" if n_bytes >= 2**10 else f"{n_bytes} bytes"
+    return f"{round(n_bytes / 2**20, 1):g} MB"
+
+
+class LimiteSubidas:
+    """Middleware ASGI: 413 si el cuerpo de la petición supera max_bytes."""
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def _error(self) -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"El archivo supera el tamaño máximo permitido ({_tamano_legible(self.max_bytes)})",
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_bytes <= 0:
+            return await self.app(scope, receive, send)
+
+        for nombre, valor in scope["headers"]:
+            if nombre == b"content-length":
+                try:
+                    declarado = int(valor)
+                except ValueError:
+                    break
+                if declarado > self.max_bytes:
+                    error = self._error()
+                    respuesta = JSONResponse({"detail": error.detail}, status_code=413,
+                                             headers={"Connection": "close"})
+                    return await respuesta(scope, receive, send)
+                break
+
+        recibidos = 0
+
+        async def recibir_con_limite():
+            nonlocal recibidos
+            mensaje = await receive()
+            if mensaje["type"] == "http.request":
+                recibidos += len(mensaje.get("body", b""))
+                if recibidos > self.max_bytes:
+                    # FastAPI deja pasar las HTTPException que surgen al leer
+                    # el formulario: el cliente recibe el 413 tal cual
+                    raise self._error()
+            return mensaje
+
+        await self.app(scope, recibir_con_limite, send)
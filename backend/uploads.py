@@ -0,0 +1,119 @@
+"""
+Subidas ya validadas, referenciadas por un token de corta duración.
+
+/validate lee y valida el archivo y guarda aquí el resultado ya codificado
+(clave, DNI y máscaras de respuestas) junto con el archivo original. /corregir
+puede recibir después ese token en lugar de volver a subir el archivo, de modo
+que cada examen se sube y se lee una sola vez.
+
+Se guarda en el almacén de sesiones (storage.py), bajo las claves
+".uploads/<token>/...", para que el token valga en cualquier trabajador o
+réplica que comparta el almacén, no solo en la que atendió /validate.
+"""
+import io
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+from fastapi import HTTPException
+
+from ingestion import ExamenLeido
+
+UPLOADS_PREFIX = ".uploads"
+UPLOAD_TOKEN_TTL_SECONDS = int(os.getenv("UPLOAD_TOKEN_TTL_SECONDS", str(15 * 60)))
+# Las subidas caducadas se buscan como mucho una vez por este intervalo
+LIMPIEZA_SUBIDAS_SEGUNDOS = 60
+
+_limpieza_lock = threading.Lock()
+_ultima_limpieza = 0.0
+
+
+def _prefijo_subida(token: str) -> str:
+    # Evita que un token manipulado apunte fuera de UPLOADS_PREFIX
+    try:
+        uuid.UUID(token)
+    except ValueError:
+        raise HTTPException(404, "Token de subida no válido")
+    return f"{UPLOADS_PREFIX}/{token}"
+
+
+def guardar_subida(storage, contenido: bytes, examen: ExamenLeido, meta: dict) -> str:
+    """Guarda el archivo original y el examen codificado. Devuelve el token."""
+    limpiar_subidas_caducadas(storage)
+
+    token = str(uuid.uuid4())
+    prefijo = _prefijo_subida(token)
+
+    storage.escribir(f"{prefijo}/original.xlsx", contenido)
+    datos = io.BytesIO()
+    np.savez(
+        datos,
+        clave=examen.clave,
+        mascaras=examen.mascaras,
+        respondidas=examen.respondidas,
+    )
+    storage.escribir(f"{prefijo}/examen.npz", datos.getvalue())
+    # meta.json el último: una subida sin él no existe todavía
+    meta = dict(meta, dnis=examen.dnis, columnas=[str(c) for c in examen.columnas], created_at=time.time())
+    storage.escribir(f"{prefijo}/meta.json", json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+    return token
+
+
+def leer_meta(storage, token: str) -> dict:
+    """Metadatos de una subida vigente; 404 si no existe o ha caducado."""
+    prefijo = _prefijo_subida(token)
+    try:
+        meta = json.loads(storage.leer(f"{prefijo}/meta.json"))
+    except (OSError, ValueError):
+        raise HTTPException(404, "La subida ha caducado o no existe. Vuelve a subir el archivo.")
+
+    if time.time() - meta["created_at"] > UPLOAD_TOKEN_TTL_SECONDS:
+        _borrar_subida(storage, token)
+        raise HTTPException(404, "La subida ha caducado o no existe. Vuelve a subir el archivo.")
+    return meta
+
+
+def cargar_subida(storage, token: str):
+    """
+    (examen, meta, archivo original) de una subida vigente. El original es
+    su ruta si el almacén es local, o su contenido.
+    """
+    meta = leer_meta(storage, token)
+    prefijo = _prefijo_subida(token)
+    with np.load(io.BytesIO(storage.leer(f"{prefijo}/examen.npz"))) as datos:
+        examen = ExamenLeido(
+            columnas=meta["columnas"],
+            clave=datos["clave"],
+            dnis=meta["dnis"],
+            mascaras=datos["mascaras"],
+            respondidas=datos["respondidas"],
+        )
+    original = storage.ruta_local(f"{prefijo}/original.xlsx") or storage.leer(f"{prefijo}/original.xlsx")
+    return examen, meta, original
+
+
+def _borrar_subida(storage, token: str):
+    prefijo = f"{UPLOADS_PREFIX}/{token}"
+    for nombre in ("meta.json", "examen.npz", "original.xlsx"):
+        storage.borrar(f"{prefijo}/{nombre}")
+    storage.borrar_carpeta_vacia(prefijo)
+
+
+def limpiar_subidas_caducadas(storage):
+    """Borra las subidas caducadas (como mucho una vez cada LIMPIEZA_SUBIDAS_SEGUNDOS)."""
+    global _ultima_limpieza
+    with _limpieza_lock:
+        if time.monotonic() - _ultima_limpieza < LIMPIEZA_SUBIDAS_SEGUNDOS:
+            return
+        _ultima_limpieza = time.monotonic()
+
+    ahora = time.time()
+    _, tokens = storage.listar(f"{UPLOADS_PREFIX}/")
+    for token in tokens:
+        archivos, _ = storage.listar(f"{UPLOADS_PREFIX}/{token}/")
+        # Sin archivos, o a medio escribir desde hace más del TTL
+        if all(ahora - modificado > UPLOAD_TOKEN_TTL_SECONDS for _, _, modificado in archivos):
+            _borrar_subida(storage, token)
@@ -0,0 +1,167 @@
+"""
+Pool de trabajadores para el trabajo bloqueante (lectura de Excel, corrección,
+gráficos e informes PDF), de modo que el bucle de eventos de asyncio siga
+atendiendo peticiones como /health mientras se procesa un archivo grande.
+
+Configuración por variables de entorno:
+- WORKER_MODE: "thread" (por defecto) o "process".
+- WORKER_POOL_SIZE: número de trabajadores en paralelo.
+- WORKER_QUEUE_SIZE: trabajos que pueden esperar en cola además de los que
+  se están ejecutando. Por encima de ese límite se responde 503.
+- WORKER_RETRY_AFTER_SECONDS: valor de la cabecera Retry-After del 503.
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+import telemetry
+from logging_config import configurar_logs
+
+WORKER_MODE = os.getenv("WORKER_MODE", "thread").lower()
+WORKER_POOL_SIZE = max(1, int(os.getenv("WORKER_POOL_SIZE", str(os.cpu_count() or 2))))
+WORKER_QUEUE_SIZE = max(0, int(os.getenv("WORKER_QUEUE_SIZE", "16")))
+WORKER_RETRY_AFTER_SECONDS = int(os.getenv("WORKER_RETRY_AFTER_SECONDS", "5"))
+
+logger = logging.getLogger("corrector")
+
+_executor = None
+_executor_lock = threading.Lock()
+# Solo se modifica desde el hilo del bucle de eventos, no necesita lock
+_trabajos_activos = 0
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if WORKER_MODE == "process":
+                # Los procesos nuevos no heredan la configuración de logs si
+                # no se crean con fork
+                _executor = ProcessPoolExecutor(max_workers=WORKER_POOL_SIZE, initializer=configurar_logs)
+            else:
+                _executor = ThreadPoolExecutor(
+                    max_workers=WORKER_POOL_SIZE, thread_name_prefix="corrector"
+                )
+            logger.info(f"Pool de trabajadores iniciado: modo={WORKER_MODE}, tamaño={WORKER_POOL_SIZE}, cola={WORKER_QUEUE_SIZE}")
+        return _executor
+
+
+def shutdown_workers():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def workers_status():
+    return {
+        "mode": WORKER_MODE,
+        "pool_size": WORKER_POOL_SIZE,
+        "queue_size": WORKER_QUEUE_SIZE,
+        "active_jobs": _trabajos_activos,
+    }
+
+
+def _ejecutar(func, args, kwargs):
+    # HTTPException no se puede serializar con pickle; en modo "process" se
+    # devuelve como tupla y se reconstruye en el proceso principal. Las
+    # subclases que sí se serializan (ErroresValidacion) se devuelven tal cual.
+    # Las medidas de telemetría viajan con el resultado (ver telemetry).
+    with telemetry.recoger() as medidas:
+        try:
+            return ("ok", func(*args, **kwargs), medidas)
+        except HTTPException as e:
+            if type(e).__reduce__ is not HTTPException.__reduce__:
+                return ("exception", e, medidas)
+            return ("http_error", (e.status_code, e.detail, e.headers), medidas)
+
+
+def _pool_saturado() -> HTTPException:
+    """503 con Retry-After de cuando no caben más trabajos."""
+    return HTTPException(
+        status_code=503,
+        detail="El servidor está procesando demasiados exámenes en este momento. Inténtalo de nuevo en unos segundos.",
+        headers={"Retry-After": str(WORKER_RETRY_AFTER_SECONDS)},
+    )
+
+
+def _reservar_trabajo():
+    """Comprueba la capacidad y reserva un hueco en el pool, o lanza 503."""
+    global _trabajos_activos
+    if _trabajos_activos >= WORKER_POOL_SIZE + WORKER_QUEUE_SIZE:
+        logger.warning(f"Pool de trabajadores saturado ({_trabajos_activos} trabajos activos)")
+        raise _pool_saturado()
+    _trabajos_activos += 1
+
+
+def comprobar_capacidad(n_trabajos: int):
+    """Lanza 503 si no caben n_trabajos más (para encolar un lote entero o nada)."""
+    if _trabajos_activos + n_trabajos > WORKER_POOL_SIZE + WORKER_QUEUE_SIZE:
+        logger.warning(f"Pool de trabajadores sin hueco para {n_trabajos} trabajos ({_trabajos_activos} activos)")
+        raise _pool_saturado()
+
+
+def _liberar_trabajo(*_):
+    global _trabajos_activos
+    _trabajos_activos -= 1
+
+
+async def _ejecutar_en_pool(func, args, kwargs):
+    loop = asyncio.get_running_loop()
+    tipo, valor, medidas = await loop.run_in_executor(_get_executor(), _ejecutar, func, args, kwargs)
+    telemetry.registrar(medidas)
+
+    if tipo == "http_error":
+        status_code, detail, headers = valor
+        raise HTTPException(status_code=status_code, detail=detail, headers=headers)
+    if tipo == "exception":
+        raise valor
+    return valor
+
+
+async def run_in_worker(func, *args, **kwargs):
+    """
+    Ejecuta func(*args, **kwargs) en el pool y espera el resultado sin
+    bloquear el bucle de eventos.
+
+    Lanza HTTPException(503) con Retry-After si ya hay demasiados trabajos
+    en ejecución o en cola. En modo "process", func y sus argumentos deben
+    poder serializarse con pickle (funciones a nivel de módulo).
+    """
+    _reservar_trabajo()
+    try:
+        return await _ejecutar_en_pool(func, args, kwargs)
+    finally:
+        _liberar_trabajo()
+
+
+# Referencias a los trabajos lanzados en segundo plano para que el recolector
+# de basura no los elimine antes de terminar
+_trabajos_en_segundo_plano = set()
+
+
+def _fin_trabajo_en_segundo_plano(task):
+    _trabajos_en_segundo_plano.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Trabajo en segundo plano terminado con error: {task.exception()!r}")
+
+
+def start_in_worker(func, *args, **kwargs):
+    """
+    Encola func(*args, **kwargs) en el pool sin esperar al resultado.
+
+    La comprobación de capacidad es inmediata: lanza HTTPException(503) antes
+    de encolar nada si el pool está saturado. El propio trabajo es responsable
+    de dejar constancia de su resultado (por ejemplo, en el estado de sesión).
+    """
+    _reservar_trabajo()
+    task = asyncio.get_running_loop().create_task(_ejecutar_en_pool(func, args, kwargs))
+    task.add_done_callback(_liberar_trabajo)
+    task.add_done_callback(_fin_trabajo_en_segundo_plano)
+    _trabajos_en_segundo_plano.add(task)
+    return task
@@ -16,6 +16,13 @@ import { apiBase, validateExam, correctExam, getPreview, getMetrics } from "./se
 
 const base = (import.meta.env.BASE_URL || "/gradepilot/").replace(/\/?$/, "/");
 
+// Límites del examen (los mismos que comprueba el backend)
+const MIN_PREGUNTAS = 5;
+const MAX_PREGUNTAS = 500;
+const OPCIONES_DISPONIBLES = [2, 3, 4, 5, 6, 7, 8];
+const LETRAS = ["A", "B", "C", "D", "E", "F", "G", "H"];
+const COLORES_OPCIONES = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F', '#BB8FCE', '#82E0AA'];
+
 function App() {
   const [file, setFile] = useState(null);
   const [loading, setLoading] = useState(false);
@@ -33,6 +40,8 @@ function App() {
   const [history, setHistory] = useState([]);
   const [session_id, setSessionId] = useState(null);
   const [validated, setValidated] = useState(false);
+  // Token de /validate: permite corregir sin volver a subir el archivo
+  const [subida, setSubida] = useState(null);
   const [showWelcome, setShowWelcome] = useState(true);
 
   useEffect(() => {
@@ -90,12 +99,15 @@ function App() {
     formData.append("n_preguntas", nPreguntas);
 
     try {
-      await validateExam(formData);
+      const data = await validateExam(formData);
       toast.success("Archivo valido. Puedes corregir el examen.");
       setValidated(true);
+      setSubida({ token: data.upload_token, file, nOpciones, nPreguntas });
     } catch (err) {
-      toast.error(err.message);
+      // Con varios errores, detail trae uno por línea
+      toast.error(err.message, { style: { whiteSpace: "pre-line" } });
       setValidated(false);
+      setSubida(null);
     }
   };
 
@@ -115,7 +127,28 @@ function App() {
     setSuccess(false);
 
     try {
-      const data = await correctExam(formData);
+      let data;
+      const tokenVigente =
+        subida &&
+        subida.file === file &&
+        subida.nOpciones === nOpciones &&
+        subida.nPreguntas === nPreguntas;
+
+      if (tokenVigente) {
+        // El archivo ya se subió y se leyó en la validación
+        const tokenData = new FormData();
+        tokenData.append("upload_token", subida.token);
+        try {
+          data = await correctExam(tokenData);
+        } catch (err) {
+          // Token caducado: se vuelve a enviar el archivo
+          if (err.status !== 404) throw err;
+          data = await correctExam(formData);
+        }
+        setSubida(null);
+      } else {
+        data = await correctExam(formData);
+      }
       const newSessionId = data.session_id;
       setSessionId(newSessionId);
 
@@ -145,7 +178,7 @@ function App() {
       setSuccess(true);
     } catch (err) {
       console.error("Error en corrección:", err);
-      toast.error(err.message || "Hubo un fallo al corregir el archivo");
+      toast.error(err.message || "Hubo un fallo al corregir el archivo", { style: { whiteSpace: "pre-line" } });
     } finally {
       setLoading(false);
     }
@@ -407,15 +440,14 @@ function App() {
                             />
                             <Legend />
                             {
-                              ["A", "B", "C", "D", "E"]
+                              LETRAS
                                 .slice(0, metrics.n_opciones || 5)
                                 .map((opt, idx) => {
-                                  const colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8'];
                                   return (
                                     <Bar
                                       key={opt}
                                       dataKey={opt}
-                                      fill={colors[idx]}
+                                      fill={COLORES_OPCIONES[idx]}
                                       name={opt}
                                       radius={[8, 8, 0, 0]}
                                     />
@@ -567,7 +599,7 @@ function App() {
                 <input
                   ref={fileInputRef}
                   type="file"
-                  accept=".xlsx"
+                  accept=".xlsx,.xls,.csv,.parquet,.arrow,.feather"
                   disabled={loading}
                   onChange={(e) => {
                     setFile(e.target.files[0]);
@@ -596,26 +628,34 @@ function App() {
                   <button
                     className="control-btn"
                     onClick={() => {
-                      updateNPreguntas(Math.max(5, nPreguntas - 1));
+                      updateNPreguntas(Math.max(MIN_PREGUNTAS, nPreguntas - 1));
                     }}
-                    disabled={nPreguntas <= 5}
+                    disabled={nPreguntas <= MIN_PREGUNTAS}
                   >
                     -
                   </button>
-                  <div
+                  <input
+                    type="number"
+                    min={MIN_PREGUNTAS}
+                    max={MAX_PREGUNTAS}
+                    value={nPreguntas}
+                    onChange={(e) => {
+                      const valor = parseInt(e.target.value, 10);
+                      if (!Number.isNaN(valor)) {
+                        updateNPreguntas(Math.min(MAX_PREGUNTAS, Math.max(MIN_PREGUNTAS, valor)));
+                      }
+                    }}
                     className={`number-display 
                       ${bumpPreguntas ? "bump" : ""} 
-                      ${nPreguntas <= 5 || nPreguntas >= 20 ? "disabled" : ""}
+                      ${nPreguntas <= MIN_PREGUNTAS || nPreguntas >= MAX_PREGUNTAS ? "disabled" : ""}
                     `}
-                  >
-                    {nPreguntas}
-                  </div>
+                  />
                   <button
                     className="control-btn"
                     onClick={() => {
-                      updateNPreguntas(Math.min(20, nPreguntas + 1));
+                      updateNPreguntas(Math.min(MAX_PREGUNTAS, nPreguntas + 1));
                     }}
-                    disabled={nPreguntas >= 20}
+                    disabled={nPreguntas >= MAX_PREGUNTAS}
                   >
                     +
                   </button>
@@ -626,7 +666,7 @@ function App() {
               <div className="options-selector">
                 <label>Número de opciones por pregunta:</label>
                 <div className="options-buttons">
-                  {[3, 4, 5].map((num) => (
+                  {OPCIONES_DISPONIBLES.map((num) => (
                     <button
                       key={num}
                       className={`opt-btn ${nOpciones === num ? "active" : ""}`}
@@ -4,7 +4,17 @@ export const apiBase = (import.meta.env.VITE_API_URL || `${base}/api`).replace(/
 async function ensureJson(res, fallbackMsg) {
     if (!res.ok) {
         const text = await res.text();
-        throw new Error(text || fallbackMsg);
+        let body = null;
+        try {
+            body = JSON.parse(text);
+        } catch {
+            // Respuesta que no es JSON: se muestra el texto tal cual
+        }
+        const err = new Error((body && typeof body.detail === "string" && body.detail) || text || fallbackMsg);
+        err.status = res.status;
+        // Errores de validación, uno por celda: [{ celda, mensaje }]
+        err.errores = (body && body.errores) || [];
+        throw err;
     }
 
     const ct = res.headers.get("content-type") || "";